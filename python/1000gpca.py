@@ -10,14 +10,6 @@ import sys
 import gzip
 import argparse
 err = []
-try:
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    mpl.rc("font", family="Arial")
-    mpl.rc("xtick", labelsize=8)  # set X axis ticksize
-    mpl.rc("ytick", labelsize=8)  # set Y axis ticksize
-except ImportError:
-    err.append("matplotlib")
 try:
     import numpy as np
 except ImportError:
@@ -26,31 +18,22 @@ try:
     import pandas as pd
 except ImportError:
     err.append("pandas")
-try:
-    from sklearn.decomposition import PCA
-except ImportError:
-    err.append("scikit-learn")
-try:
-    from palettable.colorbrewer.sequential import Blues_9    # Europe
-    from palettable.colorbrewer.sequential import Greens_9   # East Asia
-    from palettable.colorbrewer.sequential import Purples_9  # South Asia
-    from palettable.colorbrewer.sequential import Reds_9     # Americas
-    from palettable.colorbrewer.sequential import YlOrBr_9   # Sub-Saharan Africa
-except ImportError:
-    err.append("palettable")
 try:
     assert len(err) == 0
 except AssertionError:
     for error in err:
         print("Please install {}".format(error))
     sys.exit()
+from vcf_kernels import HET, HOM_ALT, OTHER, get_decoder, read_samples, \
+    is_biallelic_snp
+from vcf_sampling import iter_sampled_lines
+from vcf_filters import ADMIXED_POPULATIONS
+from plot_utils import load_pyplot, population_colors
 
 
-def tf_variants(input_list):
-    """Get a list of variant calls and transform them to feature list"""
-    feature_map = {"0|0": 0, "1|0": 1, "0|1": 1, "1|1": 2}
-    return np.asarray([feature_map[item] if item in feature_map else 3
-                       for item in input_list])
+def tf_variants(input_codes):
+    """Get an array of decoded variant calls and transform them to feature list"""
+    return np.minimum(input_codes, OTHER)    # 0|0: 0, 1|0 or 0|1: 1, 1|1: 2, other: 3
 
 
 def standardize_features(input_list, mean_vec, std_vec):
@@ -61,13 +44,88 @@ def standardize_features(input_list, mean_vec, std_vec):
     except AssertionError:
         return np.asarray(input_list)
     else:
-        return np.asarray(([(input_list[i] - mean_vec) / std_vec
-                            for i in range(len(input_list))]))
+        return (np.asarray(input_list) - mean_vec) / std_vec
 
 
 def get_valid_data(row_list, indices_to_keep_list):
     """From a row of variant call data, return specific entries for further processing"""
-    return np.asarray([row_list[entry] for entry in indices_to_keep_list])
+    return np.asarray(row_list)[indices_to_keep_list]
+
+
+def get_pca_model(site_ids, mean_row_vector, std_row_vector, pca):
+    """
+    Collect everything needed to place new genomes on the fitted principal components:
+    per-site IDs (POS_REF_ALT), feature means and standard deviations used for
+    standardization, and PCA centering vector, loadings and explained variance.
+    """
+    return {"site_ids": np.asarray(site_ids),
+            "site_mean": np.ravel(mean_row_vector),
+            "site_std": np.ravel(std_row_vector),
+            "pca_mean": pca.mean_,
+            "loadings": pca.components_,
+            "explained_variance_ratio": pca.explained_variance_ratio_}
+
+
+def project_samples(vcf_file, model, genomes_to_project, decode, block_size=10000):
+    """
+    Stream a VCF file and compute principal component coordinates for genomes which were
+    not part of the PCA fit. Genotypes of each model site are standardized with the
+    stored per-site mean and standard deviation, and coordinates are accumulated as a
+    blockwise matrix product with the stored loadings.
+
+    :type model: dict
+    :param model: PCA model as returned by get_pca_model() or loaded from .npz file.
+
+    :type genomes_to_project: list
+    :param genomes_to_project: Sample IDs to place on the reference axes.
+
+    :return: Tuple of (sample IDs, coordinate array of shape (samples, components)).
+
+    :raises ValueError: If the model lists a site more than once.
+    """
+    site_index = {site: i for i, site in enumerate(model["site_ids"].tolist())}
+    try:
+        assert len(site_index) == len(model["site_ids"])
+    except AssertionError:
+        raise ValueError("PCA model lists {} site(s) more than once".
+                         format(len(model["site_ids"]) - len(site_index)))
+    projected = np.zeros(len(site_index), dtype=bool)
+    valid = (model["site_mean"] != 0) & (model["site_std"] != 0)
+    center = np.where(valid, model["site_mean"], 0)
+    scale = np.where(valid, model["site_std"], 1)
+    loadings = model["loadings"].T    # sites x components
+    with gzip.open(vcf_file, "rb") as vcff:
+        genome_order = read_samples(vcff)
+        n_samples = len(genome_order)
+        to_project = set(genomes_to_project)
+        project_idx = [i for i, genome in enumerate(genome_order) if genome in to_project]
+        coords = np.zeros((len(project_idx), loadings.shape[1]))
+        block = np.empty((block_size, len(project_idx)), dtype=np.int8)
+        block_sites = []
+        for line in vcff:
+            fields = line.split(b"\t", 5)
+            if not is_biallelic_snp(fields[3], fields[4]):
+                continue
+            site = site_index.get(b"_".join([fields[1], fields[3], fields[4]]).decode())
+            if site is None or projected[site]:
+                continue    # not a model site, or a repeated record of one
+            projected[site] = True
+            block[len(block_sites)] = tf_variants(decode(line, n_samples)[project_idx])
+            block_sites.append(site)
+            if len(block_sites) == block_size:
+                coords += project_block(block, block_sites, center, scale, model, loadings)
+                block_sites = []
+        if block_sites:
+            coords += project_block(block[:len(block_sites)], block_sites, center, scale,
+                                    model, loadings)
+    return get_valid_data(genome_order, project_idx), coords
+
+
+def project_block(block, block_sites, center, scale, model, loadings):
+    """Standardize a (sites, samples) block of features and project it on the loadings."""
+    features = ((block - center[block_sites, None]) / scale[block_sites, None] -
+                model["pca_mean"][block_sites, None])
+    return features.T @ loadings[block_sites]
 
 
 def handle_program_options():
@@ -81,6 +139,26 @@ def handle_program_options():
                         help="Save the plot as sn SVG file.")
     parser.add_argument("-o", "--output_file",
                         help="Save consolidated data to this tab-separated file")
+    parser.add_argument("-m", "--model_file",
+                        help="Save the fitted PCA model (per-site means, standard "
+                        "deviations and loadings) to this NumPy .npz file.")
+    parser.add_argument("-lm", "--load_model",
+                        help="Load a PCA model saved with --model_file instead of fitting"
+                        " PCA on the VCF file. Use with --projection_file.")
+    parser.add_argument("-pj", "--projection_file",
+                        help="Project the discarded (admixed) population genomes onto the"
+                        " fitted principal components and save their coordinates to this"
+                        " tab-separated file. Requires --chr21_vcf_file.")
+    parser.add_argument("-k", "--kernel", choices=["auto", "numba", "numpy"],
+                        default="auto",
+                        help="Genotype decoding backend. Default 'auto' uses Numba when "
+                        "installed and NumPy otherwise.")
+    parser.add_argument("-sf", "--sample_fraction", type=float,
+                        help="Preview mode. Fit PCA on sites from this fraction (0-1] of "
+                        "randomly sampled BGZF blocks (or sites, for plain gzip files) "
+                        "instead of all sites.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for --sample_fraction.")
     return parser.parse_args()
 
 
@@ -96,7 +174,7 @@ def main():
                 md_data[line[0]] = line[1]
 
     # Discard these population samples
-    discarded_pop = tuple(["GIH", "CEU", "PEL", "MXL", "CLM", "PUR", "ASW", "ACB"])
+    discarded_pop = ADMIXED_POPULATIONS
     discarded_genomes = [genome for genome, pop in md_data.items()
                          if pop in discarded_pop]
 
@@ -105,31 +183,45 @@ def main():
     mean_row_vector = []
     std_row_vector = []
     feature_data_std = []
-    if args.chr21_vcf_file:
+    site_ids = []
+    seen_sites = set()
+    n_repeated = 0
+    decode = get_decoder(args.kernel)
+    if args.chr21_vcf_file and not args.load_model:
         with gzip.open(args.chr21_vcf_file, "rb") as vcff:
+            if args.sample_fraction:
+                vcff = (line for unit, line in
+                        iter_sampled_lines(args.chr21_vcf_file, args.sample_fraction,
+                                           args.seed))
             for a, line in enumerate(vcff):
                 try:
-                    line = line.decode()
-                    assert line.startswith("#CHROM")
-                except Exception:
+                    assert line.startswith(b"#CHROM")
+                except AssertionError:
                     try:
-                        assert line.startswith("21")
-                    except Exception:
+                        assert line.startswith(b"21")
+                    except AssertionError:
                         continue
                     else:
-                        line = line.strip().split("\t")
+                        fields = line.split(b"\t", 5)
                         try:
-                            assert line[3] in ["A", "T", "C", "G"]
-                            assert line[4] in ["A", "T", "C", "G"]
-                            common_var = (2 * (line[9:].count("1|1")) +
-                                          line[9:].count("1|0") + line[9:].count("0|1")) \
-                                          / 2 * len(line[9:])
+                            assert fields[3] in [b"A", b"T", b"C", b"G"]
+                            assert fields[4] in [b"A", b"T", b"C", b"G"]
+                            calls = decode(line, n_samples)
+                            common_var = (2 * np.count_nonzero(calls == HOM_ALT) +
+                                          np.count_nonzero(calls == HET)) \
+                                          / 2 * calls.size
                             assert common_var > 0.05
+                            site_id = b"_".join([fields[1], fields[3],
+                                                 fields[4]]).decode()
+                            if site_id in seen_sites:
+                                n_repeated += 1    # keep the first record of a site
+                                continue
                         except AssertionError:
                             continue
                         else:
-                            valid_data = get_valid_data(line[9:], genome_to_keep)
-                            tf_data = np.asarray(tf_variants(valid_data))
+                            seen_sites.add(site_id)
+                            valid_data = get_valid_data(calls, genome_to_keep)
+                            tf_data = tf_variants(valid_data)
                             feature_data.append(tf_data)
                             entry_mean = np.mean(tf_data, dtype=np.float64)
                             entry_std = np.std(tf_data, dtype=np.float64)
@@ -139,13 +231,23 @@ def main():
                                                                           entry_mean,
                                                                           entry_std))
                             feature_data_std.append(tf_features)
+                            site_ids.append(site_id)
                 else:
-                    line = line.strip().split("\t")
+                    line = line.decode().strip().split("\t")
+                    n_samples = len(line[9:])
                     genome_to_keep = [i for i, genome in enumerate(line[9:])
                                       if genome not in discarded_genomes]
                     genome_order = get_valid_data(line[9:], genome_to_keep)
 
+            if n_repeated:
+                print("Skipped {} repeated records of sites (POS_REF_ALT)".
+                      format(n_repeated))
+
             # Run dimensionality reduction using PCA
+            try:
+                from sklearn.decomposition import PCA
+            except ImportError:
+                sys.exit("Please install scikit-learn")
             try:
                 print("\nPCA starting...")
                 pca = PCA(n_components=2)
@@ -161,18 +263,38 @@ def main():
                         for i, entry in enumerate(pca_ft):
                             outf.write("{0}\t{1}\t{2}\n".format(genome_order[i], entry[0],
                                                                 entry[1]))
+                pca_model = get_pca_model(site_ids, mean_row_vector, std_row_vector, pca)
+                if args.model_file:
+                    np.savez(args.model_file, **pca_model)
                 print("Finished!\n")
 
+    # Place discarded population genomes on the reference principal components
+    if args.projection_file:
+        try:
+            assert args.chr21_vcf_file
+        except AssertionError:
+            sys.exit("Please supply --chr21_vcf_file parameter to project genomes.")
+        if args.load_model:
+            with np.load(args.load_model) as model_data:
+                pca_model = dict(model_data)
+        print("\nProjecting {} genomes...".format(len(discarded_genomes)))
+        try:
+            projected_genomes, projected_ft = project_samples(args.chr21_vcf_file,
+                                                              pca_model,
+                                                              discarded_genomes, decode)
+        except ValueError as ve:
+            sys.exit("Error with PCA model: {}".format(ve))
+        with open(args.projection_file, "w") as outf:
+            outf.write("genome\tPC1\tPC2\n")
+            for i, entry in enumerate(projected_ft):
+                outf.write("{0}\t{1}\t{2}\n".format(projected_genomes[i], entry[0],
+                                                    entry[1]))
+        print("Finished!\n")
+
     # Plot PCA
     if args.pca_in:
-        colors = Blues_9.hex_colors[4:] + Greens_9.hex_colors[4:] +\
-                 Purples_9.hex_colors[4:] + Reds_9.hex_colors[2:6] +\
-                 YlOrBr_9.hex_colors[2:]
-        x_order = tuple(["FIN", "GBR", "CEU", "IBS", "TSI", "CHS", "CDX", "CHB",
-                         "JPT", "KHV", "GIH", "STU", "PJL", "ITU", "BEB", "PEL",
-                         "MXL", "CLM", "PUR", "ASW", "ACB", "GWD", "YRI", "LWK",
-                         "ESN", "MSL"])
-        assigned_colors = {a: b for a, b in zip(x_order, colors)}
+        mpl, plt = load_pyplot(xtick=8, ytick=8)
+        assigned_colors = population_colors()
         for entry in discarded_pop:
             del assigned_colors[entry]
         pca_data = pd.read_csv(args.pca_in, sep="\t", header=None, skiprows=1,
@@ -190,10 +312,10 @@ def main():
                                 c=assigned_colors[md_data[entry[1]]])
             plt.xlabel("Principal Component 1 (2.0 %)", fontsize=10)
             plt.ylabel("Principal Component 2 (0.61 %)", fontsize=10)
-            legend_dict = {"Europe": Blues_9.hex_colors[4:][3],
-                           "East Asia": Greens_9.hex_colors[4:][3],
-                           "South Asia": Purples_9.hex_colors[4:][3],
-                           "Sub-Saharan Africa": YlOrBr_9.hex_colors[2:][4]}
+            legend_dict = {"Europe": assigned_colors["IBS"],
+                           "East Asia": assigned_colors["JPT"],
+                           "South Asia": assigned_colors["ITU"],
+                           "Sub-Saharan Africa": assigned_colors["LWK"]}
             l = [plt.scatter([], [], c=legend_dict[lab], s=50)
                  for lab in legend_dict.keys()]
             plt.legend(l, ["{}".format(lab) for lab in legend_dict.keys()],
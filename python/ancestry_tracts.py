@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""
+:Abstract: Read local ancestry tracts of 1000 Genomes Project genomes from haplotype .bed
+           files (chromosome, start, end, ancestry) into NumPy arrays, and look up the
+           ancestry of genome positions or segments with sorted, keyed searches over the
+           tracts of all genomes at once.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+from multiprocessing import Pool
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
+from vcf_kernels import parse_digits
+
+AUTOSOMES = 22
+
+
+def bed_columns(bed_file):
+    """
+    Read a tab-separated .bed file and locate its first four columns on all lines at once.
+
+    :return: Tuple of (file data, file data as numpy.uint8 array, column start offsets,
+             column end offsets, prefix count of non-digit bytes). Offset arrays have
+             shape (lines, 4), missing columns are empty.
+    """
+    with open(bed_file, "rb") as inf:
+        data = inf.read()
+    if data and not data.endswith(b"\n"):
+        data += b"\n"
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == 10)
+    starts = np.append(0, ends[:-1] + 1).astype(np.int64)
+    tabs = np.flatnonzero(buf == 9)
+    tab_line = np.searchsorted(ends, tabs)
+    first_tab = np.searchsorted(tab_line, np.arange(ends.size))
+    n_tabs = np.bincount(tab_line, minlength=ends.size)
+    padded_tabs = np.append(tabs, 0)
+    bounds = np.empty((ends.size, 5), dtype=np.int64)
+    bounds[:, 0] = starts - 1
+    for k in range(1, 5):
+        has_tab = n_tabs >= k
+        bounds[:, k] = np.where(has_tab,
+                                padded_tabs[np.where(has_tab, first_tab + k - 1, -1)],
+                                ends)
+    field_start = np.minimum(bounds[:, :4] + 1, ends[:, None])
+    field_end = bounds[:, 1:]
+    not_digit = np.cumsum(np.append(0, (buf < 48) | (buf > 57)))
+    return data, buf, field_start, field_end, not_digit
+
+
+def read_bed_arrays(bed_file):
+    """
+    Read autosomal ancestry tracts of a local ancestry .bed file into NumPy arrays.
+    Chromosome names may have a 'chr' prefix. Lines with non-autosomal chromosomes or
+    non-integer coordinates are skipped.
+
+    :return: Tuple of (chromosome, start, end, ancestry label) arrays, where labels are
+             fixed width byte strings as wide as the longest label of the file.
+    """
+    data, buf, field_start, field_end, not_digit = bed_columns(bed_file)
+    last = max(buf.size - 1, 0)
+    chrom_start = field_start[:, 0]
+    chr_prefix = field_end[:, 0] - chrom_start > 3
+    for k, char in enumerate(b"chr"):
+        chr_prefix &= buf[np.minimum(chrom_start + k, last)] == char
+    field_start[:, 0] += 3 * chr_prefix
+    valid = np.ones(field_start.shape[0], dtype=bool)
+    for k in range(3):
+        valid &= ((not_digit[field_end[:, k]] == not_digit[field_start[:, k]]) &
+                  (field_end[:, k] > field_start[:, k]) &
+                  (field_end[:, k] - field_start[:, k] <= 12))
+    fs, fe = field_start[valid], field_end[valid]
+    chrom = parse_digits(buf, fs[:, 0], fe[:, 0])
+    autosome = (chrom >= 1) & (chrom <= AUTOSOMES)
+    fs, fe, chrom = fs[autosome], fe[autosome], chrom[autosome]
+
+    # Gather ancestry labels into a byte string array as wide as the longest label
+    label_width = max(int((fe[:, 3] - fs[:, 3]).max()) if fe.shape[0] else 0, 1)
+    offsets = np.arange(label_width)
+    label_bytes = buf[np.minimum(fs[:, 3, None] + offsets, last)]
+    in_label = (offsets < (fe[:, 3] - fs[:, 3])[:, None]) & (label_bytes != 13)
+    labels = np.where(in_label, label_bytes, 0).astype(np.uint8)
+    labels = np.ascontiguousarray(labels).view("S{}".format(label_width)).ravel()
+    return (chrom, parse_digits(buf, fs[:, 1], fe[:, 1]),
+            parse_digits(buf, fs[:, 2], fe[:, 2]), labels)
+
+
+def sweep_ancestry(sample, hap, chrom, start, end, ancestry, n_samples, n_ancestries):
+    """
+    Merge the ancestry tracts of both haplotypes of all genomes with a single sorted
+    endpoint sweep. Tract endpoints are keyed by genome and chromosome, so that all
+    chromosomes of all genomes are swept at once.
+
+    :type sample: numpy.ndarray
+    :param sample: Genome index of each tract.
+
+    :type hap: numpy.ndarray
+    :param hap: Haplotype (0 for A, 1 for B) of each tract.
+
+    :type ancestry: numpy.ndarray
+    :param ancestry: Ancestry code (0 to n_ancestries - 1) of each tract.
+
+    :return: Tuple of (haploid, diploid) length arrays of shape (n_samples, AUTOSOMES + 1,
+             n_ancestries) and (n_samples, AUTOSOMES + 1, n_ancestries, n_ancestries).
+             haploid holds bp covered by each ancestry summed over both haplotypes.
+             diploid[..., a, b] holds bp where haplotype A has ancestry a and haplotype
+             B has ancestry b.
+    """
+    group = sample.astype(np.int64) * (AUTOSOMES + 1) + chrom
+    start_key = (group << 32) + start
+    end_key = (group << 32) + end
+    points = np.unique(np.concatenate([start_key, end_key]))
+    seg_start, seg_end = points[:-1], points[1:]
+    same_group = (seg_start >> 32) == (seg_end >> 32)
+    seg_start, seg_end = seg_start[same_group], seg_end[same_group]
+    seg_group = seg_start >> 32
+    seg_len = seg_end - seg_start
+
+    # Ancestry of each haplotype on every elementary segment, -1 if not covered
+    index = haplotype_index(group * 2 + hap, start, end)
+    seg_ancestry = []
+    for h in (0, 1):
+        tract = find_tracts(index, seg_group * 2 + h, seg_start - (seg_group << 32))
+        seg_ancestry.append(np.where(tract >= 0, ancestry[tract], -1))
+
+    n_groups = n_samples * (AUTOSOMES + 1)
+    haploid = np.zeros(n_groups * n_ancestries)
+    for anc in seg_ancestry:
+        covered = anc >= 0
+        haploid += np.bincount(seg_group[covered] * n_ancestries + anc[covered],
+                               weights=seg_len[covered], minlength=haploid.size)
+    both = (seg_ancestry[0] >= 0) & (seg_ancestry[1] >= 0)
+    state = (seg_group[both] * n_ancestries + seg_ancestry[0][both]) * n_ancestries + \
+        seg_ancestry[1][both]
+    diploid = np.bincount(state, weights=seg_len[both],
+                          minlength=n_groups * n_ancestries ** 2)
+    return (haploid.reshape(n_samples, AUTOSOMES + 1, n_ancestries),
+            diploid.reshape(n_samples, AUTOSOMES + 1, n_ancestries, n_ancestries))
+
+
+def load_tracts(bed_pairs, processes=1):
+    """
+    Read the autosomal ancestry tracts of many genomes into one set of arrays.
+
+    :type bed_pairs: list
+    :param bed_pairs: Tuples of (haplotype A .bed file, haplotype B .bed file), one per
+                      genome.
+
+    :type processes: int
+    :param processes: Number of .bed files parsed in parallel.
+
+    :return: Tuple of (tracts, ancestries). tracts is a dict of sample (index into
+             bed_pairs), hap (0 for A, 1 for B), chrom, start, end and ancestry arrays
+             with one entry per tract. ancestry holds indices into the sorted list of
+             ancestry labels ancestries.
+    """
+    bed_files = [bed_file for pair in bed_pairs for bed_file in pair]
+    if processes > 1:
+        pool = Pool(processes)
+        try:
+            arrays = pool.map(read_bed_arrays, bed_files, chunksize=8)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        arrays = [read_bed_arrays(bed_file) for bed_file in bed_files]
+    n_tracts = [a[0].size for a in arrays]
+    tracts = {"sample": np.repeat(np.arange(len(bed_files)) // 2, n_tracts),
+              "hap": np.repeat(np.arange(len(bed_files)) % 2, n_tracts)}
+    for k, name in enumerate(("chrom", "start", "end")):
+        tracts[name] = np.concatenate([a[k] for a in arrays] + [np.zeros(0, np.int64)])
+    no_labels = np.zeros(0, dtype="S1")
+    labels = np.concatenate([a[3] for a in arrays] + [no_labels])
+    ancestries, ancestry = np.unique(labels, return_inverse=True)
+    tracts["ancestry"] = ancestry.ravel()
+    return tracts, [label.decode() for label in ancestries]
+
+
+def haplotype_index(lane, start, end):
+    """
+    Sort the tracts of many haplotypes (lanes) of one chromosome for lookups with
+    find_tracts(). Tracts are keyed by lane and start coordinate.
+
+    :type lane: numpy.ndarray
+    :param lane: Haplotype index of each tract, e.g. 2 * sample + hap.
+
+    :return: Tuple of (start keys, end keys, tract order). Keys are sorted by start key
+             and tract order maps them back to the input tracts.
+    """
+    lane = lane.astype(np.int64)
+    order = np.argsort((lane << 32) + start, kind="stable")
+    return (lane[order] << 32) + start[order], (lane[order] << 32) + end[order], order
+
+
+def find_tracts(index, lane, pos):
+    """
+    Find the tract containing each (haplotype, position) query in one vectorized
+    search over sorted tract start keys. Overlapping tracts resolve to the one with the
+    largest start coordinate.
+
+    :type index: tuple
+    :param index: Tract index returned by haplotype_index().
+
+    :type lane: numpy.ndarray
+    :param lane: Haplotype index of each query.
+
+    :type pos: numpy.ndarray
+    :param pos: 0-based coordinate of each query (tracts are 0-based, half-open).
+
+    :return: Index of the containing tract (into the arrays given to haplotype_index())
+             of each query, -1 where no tract contains the position.
+    """
+    start_key, end_key, order = index
+    query = (lane.astype(np.int64) << 32) + pos
+    idx = np.searchsorted(start_key, query, "right") - 1
+    if not start_key.size:
+        return np.full(query.size, -1, dtype=np.int64)
+    safe = np.maximum(idx, 0)
+    return np.where((idx >= 0) & (end_key[safe] > query), order[safe], -1)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+:Abstract: Minimal reader for BGZF (blocked gzip) files such as bgzipped VCF files of
+           1000 Genomes Project. Supports listing block offsets without decompressing,
+           random access to single blocks and reading lines together with their BGZF
+           virtual offsets (compressed block offset << 16 | offset within block). Blocks
+           can be decompressed and compressed in a thread pool, since zlib releases the
+           GIL.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import zlib
+import struct
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+MAX_BLOCK_DATA = 0xff00    # uncompressed bytes per block, as written by bgzip
+
+
+def is_bgzf(file_path):
+    """Check if a file starts with a BGZF block header (gzip member with 'BC' subfield)."""
+    with open(file_path, "rb") as inf:
+        header = inf.read(18)
+    return (len(header) == 18 and header[:4] == b"\x1f\x8b\x08\x04" and
+            header[12:14] == b"BC")
+
+
+def _read_header(fh):
+    """
+    Read a BGZF block header at the current file position.
+
+    :return: Tuple of (header length, total block size) or None at end of file.
+    """
+    header = fh.read(12)
+    if len(header) < 12:
+        return None
+    try:
+        assert header[:4] == b"\x1f\x8b\x08\x04"
+    except AssertionError:
+        raise ValueError("Invalid BGZF block header at offset {}".
+                         format(fh.tell() - len(header)))
+    xlen = struct.unpack("<H", header[10:12])[0]
+    extra = fh.read(xlen)
+    i = 0
+    while i + 4 <= xlen:
+        sub_len = struct.unpack("<H", extra[i + 2:i + 4])[0]
+        if extra[i:i + 2] == b"BC":
+            return 12 + xlen, struct.unpack("<H", extra[i + 4:i + 6])[0] + 1
+        i += 4 + sub_len
+    raise ValueError("BGZF block without BC subfield at offset {}".
+                     format(fh.tell() - xlen - 12))
+
+
+def _read_raw_block(fh):
+    """Read the deflate stream of the BGZF block at the current file position, or None."""
+    header = _read_header(fh)
+    if header is None:
+        return None
+    header_len, block_size = header
+    cdata = fh.read(block_size - header_len - 8)
+    fh.read(8)    # CRC32 and ISIZE
+    return cdata
+
+
+def _inflate(cdata):
+    return zlib.decompress(cdata, -15)
+
+
+def read_block(fh, offset=None):
+    """
+    Read and decompress one BGZF block.
+
+    :type fh: file object
+    :param fh: BGZF file opened in binary mode.
+
+    :type offset: int
+    :param offset: Compressed offset of the block. Default is the current file position.
+
+    :return: Decompressed block data, or None at end of file.
+    """
+    if offset is not None:
+        fh.seek(offset)
+    cdata = _read_raw_block(fh)
+    return None if cdata is None else _inflate(cdata)
+
+
+def _ordered_map(func, items, threads):
+    """
+    Like ThreadPool.imap, but reads at most a few items ahead of the results consumed, to
+    bound memory use when items are produced faster than they are processed.
+    """
+    if threads <= 1:
+        for item in items:
+            yield func(item)
+        return
+    pool = ThreadPool(threads)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= 4 * threads:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+
+
+def iter_blocks(fh, threads=1):
+    """
+    Yield decompressed data of all blocks from the current file position onwards, in
+    order. Blocks are decompressed in a pool of threads.
+    """
+    raw_blocks = iter(lambda: _read_raw_block(fh), None)
+    for data in _ordered_map(_inflate, raw_blocks, threads):
+        yield data
+
+
+def compress_block(data, level=6):
+    """
+    Compress up to MAX_BLOCK_DATA bytes into a complete BGZF block.
+
+    :type level: int
+    :param level: zlib compression level (0-9).
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    if len(cdata) > 0x10000 - 26:    # incompressible data, store it instead
+        compressor = zlib.compressobj(0, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+    header = struct.pack("<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2,
+                         len(cdata) + 25)
+    return header + cdata + struct.pack("<2I", zlib.crc32(data) & 0xffffffff, len(data))
+
+
+def write_blocks(outf, payloads, threads=1, level=6):
+    """
+    Compress data into BGZF blocks in a pool of threads and write the blocks in order,
+    followed by the BGZF EOF marker.
+
+    :type outf: file object
+    :param outf: Output file opened in binary mode.
+
+    :type payloads: iterable
+    :param payloads: Uncompressed data of each block, at most MAX_BLOCK_DATA bytes.
+
+    :return: List of compressed offsets of all written blocks and the EOF marker.
+    """
+    offsets = []
+    offset = outf.tell()
+    for block in _ordered_map(lambda data: compress_block(data, level), payloads,
+                              threads):
+        offsets.append(offset)
+        outf.write(block)
+        offset += len(block)
+    offsets.append(offset)
+    outf.write(BGZF_EOF)
+    return offsets
+
+
+def split_blocks(chunks):
+    """
+    Re-split a stream of byte strings into payloads of exactly MAX_BLOCK_DATA bytes (the
+    last payload may be shorter), so that uncompressed offset u of the stream lies in
+    block u // MAX_BLOCK_DATA at offset u % MAX_BLOCK_DATA.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        if len(buf) >= MAX_BLOCK_DATA:
+            full = len(buf) - len(buf) % MAX_BLOCK_DATA
+            for start in range(0, full, MAX_BLOCK_DATA):
+                yield bytes(buf[start:start + MAX_BLOCK_DATA])
+            del buf[:full]
+    if buf:
+        yield bytes(buf)
+
+
+def block_offsets(fh):
+    """
+    List compressed offsets of all non-empty blocks by reading block headers only.
+
+    :type fh: file object
+    :param fh: BGZF file opened in binary mode.
+    """
+    offsets = []
+    offset = 0
+    while True:
+        fh.seek(offset)
+        header = _read_header(fh)
+        if header is None:
+            break
+        block_size = header[1]
+        fh.seek(offset + block_size - 4)
+        if struct.unpack("<I", fh.read(4))[0] > 0:    # ISIZE, 0 for the EOF marker
+            offsets.append(offset)
+        offset += block_size
+    return offsets
+
+
+def iter_lines(fh, virtual_offset=0):
+    """
+    Yield lines of a BGZF file starting at a virtual offset.
+
+    :type fh: file object
+    :param fh: BGZF file opened in binary mode.
+
+    :type virtual_offset: int
+    :param virtual_offset: Virtual offset of the first line to read. Default is start of
+                           file.
+
+    :return: Yields tuples of (virtual offset of the line start, line bytes)
+    """
+    fh.seek(virtual_offset >> 16)
+    start = virtual_offset & 0xFFFF
+    pending = b""
+    pending_offset = None
+    while True:
+        block_offset = fh.tell()
+        data = read_block(fh)
+        if data is None:
+            break
+        while True:
+            end = data.find(b"\n", start)
+            if end == -1:
+                if start < len(data):
+                    if not pending:
+                        pending_offset = (block_offset << 16) | start
+                    pending += data[start:]
+                break
+            if pending:
+                yield pending_offset, pending + data[start:end + 1]
+                pending = b""
+            else:
+                yield (block_offset << 16) | start, data[start:end + 1]
+            start = end + 1
+        start = 0
+    if pending:
+        yield pending_offset, pending
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+:Abstract: Check that scripts used for counting runs of 1000 Genomes Project start fast.
+           Each script is imported in a fresh interpreter, its import time is measured
+           and the plotting and machine learning packages it loaded are listed. These
+           packages must only be imported when a plot or fit is requested.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+# Scripts run on the cluster for counting, and packages they must not load at startup
+COMPUTE_SCRIPTS = ("1000gpca", "count_ancestry_variants", "count_ChrX_variants",
+                   "count_singletons", "count_variant_sites", "count_variants",
+                   "export_vcf_subset", "haploid_local_ancestry_inference", "ibs_matrix",
+                   "merge_hap_htz_counts", "runs_of_homozygosity")
+HEAVY_PACKAGES = ("matplotlib", "palettable", "sklearn", "seaborn")
+
+_PROBE = """
+import sys, time, importlib
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(time.perf_counter() - start)
+print(",".join(p for p in sys.argv[2:] if p in sys.modules))
+"""
+
+
+def import_profile(script, script_dir):
+    """
+    Import a script in a fresh Python interpreter.
+
+    :return: Tuple of (import time in seconds, list of heavy packages loaded)
+    """
+    out = subprocess.run([sys.executable, "-c", _PROBE, script] + list(HEAVY_PACKAGES),
+                         cwd=script_dir, capture_output=True, text=True)
+    try:
+        assert out.returncode == 0
+    except AssertionError:
+        sys.exit("Error importing {}\n{}".format(script, out.stderr))
+    seconds, loaded = out.stdout.split("\n")[:2]
+    return float(seconds), [p for p in loaded.split(",") if p]
+
+
+def handle_program_options():
+    parser = argparse.ArgumentParser(description="Check import time of counting scripts "
+                                     "and that they do not load plotting or machine "
+                                     "learning packages at startup.")
+    parser.add_argument("scripts", nargs="*", default=COMPUTE_SCRIPTS,
+                        help="Script names (without .py) to check. Default is all "
+                        "counting scripts.")
+    parser.add_argument("-t", "--max_seconds", type=float, default=2.0,
+                        help="Maximum import time of a script in seconds. Default is 2.")
+    return parser.parse_args()
+
+
+def main():
+    args = handle_program_options()
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    failed = 0
+    for script in args.scripts:
+        seconds, loaded = import_profile(script, script_dir)
+        ok = not loaded and seconds <= args.max_seconds
+        failed += not ok
+        print("{:<36}{:>8.2f} s  {}{}".format(script, seconds, "OK" if ok else "FAIL",
+                                             "  loads " + ", ".join(loaded) if loaded
+                                             else ""))
+    if failed:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
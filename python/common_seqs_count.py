@@ -11,19 +11,14 @@ Author: Akshay Paropkari
 
 import os
 import sys
-import subprocess as sp
-from collections import Counter
 import argparse
-try:
-    import shlex
-except ImportError as ie:
-    sys.exit('Please install {} module before executing this script.'
-             .format(ie))
+from fastq_utils import prefix_sketch
 
 
-def count_common_seqs(bc, tc, fo):
+def count_common_seqs(bc, tc, fo, sketch_size=1000):
     '''
-    Count the most common sequences found in your fastq files.
+    Count the most common sequences found in your fastq files, with reads streamed
+    through a fixed size Misra-Gries sketch.
 
     :type bc: int
     :param bc: Number of bases from start to include in count results.
@@ -31,25 +26,22 @@ def count_common_seqs(bc, tc, fo):
     :param tc: Number of most common count results to include in output.
     :type fo: str
     :param fo: Name of the fastq file being processed.
-    '''
-
-    # Get list of reads
-    with open(fo, 'r') as fastq:
-        seq = [line.strip()[:bc]
-               for line in fastq.readlines()[1::4]]
+    :type sketch_size: int
+    :param sketch_size: Number of sequences tracked by the sketch.
 
-    # Get read count from fastq file
-    qcs = 'count_seqs.py -i {}'.format(fo)
-    kwargs = shlex.split(qcs)
-    out = sp.check_output(kwargs)
-    read_count = out.split(':')[0]
+    :return: List of (read count, sequence, sequence count, percent in reads, count
+             error, percent error). The sequence count is a lower bound, and the true
+             count is at most the sequence count plus the count error.
+    '''
+    cnt, read_count, error = prefix_sketch(fo, bc, max(sketch_size, tc))
 
     # Count of most common sequence
     result = []
-    cnt = Counter(seq)
     for item in cnt.most_common(tc):
         seq_pct = 100*(item[1]/float(read_count))
-        result.append((read_count, item[0], item[1], seq_pct))
+        err_pct = 100*(error/float(read_count))
+        result.append((read_count, item[0].decode(), item[1], seq_pct, error,
+                       err_pct))
     return result
 
 
@@ -66,6 +58,11 @@ def prog_options():
                         help='Number of most common count results to '
                              'include in output. Default is top 20 most '
                              'common ("-nb" bases long) sequences.')
+    parser.add_argument('-k', '--sketch_size', type=int, default=1000,
+                        help='Number of sequences tracked while counting. Memory '
+                             'use is fixed by this number, not by the number of '
+                             'reads. Counts are exact if a file has fewer distinct '
+                             'sequences. Default is 1000.')
     parser.add_argument('out_fnh',
                         help='Output file path to save most common count '
                               'results.')
@@ -76,28 +73,32 @@ def main():
     args = prog_options()
 
     # Iterate through all directories and access their files
-    for root, dirs, files in os.walk(args.sample_dir):
-        if root != args.sample_dir:
-            os.chdir(root)
-            print root[24:27]
+    with open(args.out_fnh, 'w') as outf:
+        for root, dirs, files in os.walk(args.sample_dir):
+            if root != args.sample_dir:
+                print(root)
 
     # Get relevant file name
-            for file in files:
-                if file.endswith('.fastq'):
-                    trim_out = file
+                trim_out = None
+                for file in files:
+                    if file.endswith('.fastq'):
+                        trim_out = file
+                if trim_out is None:
+                    continue
 
     # Option to get counts of adapters in FLASh output merged file
-            most_common_seqs = count_common_seqs(args.base_counts,
-                                                 args.top_common_count,
-                                                 trim_out)
-            with open(args.out_fnh, 'w') as outf:
+                most_common_seqs = count_common_seqs(args.base_counts,
+                                                     args.top_common_count,
+                                                     os.path.join(root, trim_out),
+                                                     args.sketch_size)
                 outf.write('{}\n'.format(trim_out))
                 outf.write('Read Count\tCommon Sequence\t'
-                           'Common Sequence Counts\tPercent in reads')
+                           'Common Sequence Counts\tPercent in reads\t'
+                           'Count Error\tPercent Error\n')
                 for d in most_common_seqs:
-                    outf.write('{}\t{}\t{}\t{}'
-                               .format(d[0], d[1], d[2], d[3]))
-            return
+                    outf.write('{}\t{}\t{}\t{}\t{}\t{}\n'
+                               .format(d[0], d[1], d[2], d[3], d[4], d[5]))
+    return
 
 if __name__ == '__main__':
     sys.exit(main())
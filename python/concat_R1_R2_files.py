@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+:Abstract: Concatenate the lane gzip files of every sample listed in a sample sheet into
+           one R1 and one R2 gzip file per sample, computing the MD5 (and optionally
+           BLAKE2b) checksum of each output while it is written, so every byte is read
+           only once. Concatenated gzip members are a valid gzip file. R1 and R2 files
+           are concatenated in parallel. Replaces shell/concat_R1_R2_files.sh.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import os
+import re
+import sys
+import hashlib
+import argparse
+from multiprocessing import Pool
+
+GZIP_MAGIC = b"\x1f\x8b"
+LANE_FILE = re.compile(r"_L\d{3}_(R[12])_001\.fastq\.gz$")
+
+
+def prog_options():
+    parser = argparse.ArgumentParser(
+                description="Concatenate all lane R1 fastq gzip files and all lane R2 "
+                            "fastq gzip files of each sample in a sample sheet, and save "
+                            "the MD5 checksum of every concatenated file. Checksums are "
+                            "computed while the files are written, without reading the "
+                            "concatenated files again.")
+    parser.add_argument("input_dir",
+                        help="Directory containing lane fastq gzip files, named as "
+                             "<sample>_L001_R1_001.fastq.gz.")
+    parser.add_argument("sample_sheet",
+                        help="Tab-separated file with a header line and one sample per "
+                             "line: the sample part of lane file names (e.g. Sample1_S1)"
+                             " and the output filename (e.g. Sample1).")
+    parser.add_argument("-o", "--output_dir", default=None,
+                        help="Directory to save concatenated files and checksums in. "
+                             "Default is input_dir.")
+    parser.add_argument("-b", "--blake2", action="store_true",
+                        help="Also compute BLAKE2b checksums, saved in "
+                             "<name>_blake2b.txt.")
+    parser.add_argument("-p", "--processes", type=int, default=2,
+                        help="Number of files concatenated in parallel. Default is 2 (R1 "
+                             "and R2 of a sample at once).")
+    parser.add_argument("-c", "--block_size", type=int, default=1 << 22,
+                        help="Number of bytes read at a time. Default is 4 MB.")
+    return parser.parse_args()
+
+
+def concat_files(job):
+    """
+    Concatenate gzip files into one file, computing its checksums on the way.
+
+    :type job: tuple
+    :param job: Tuple of (output file, list of input gzip files, block size, compute
+                BLAKE2b checksum)
+
+    :return: Tuple of (output file, dict of hex digests by checksum name)
+    """
+    output_file, input_files, block_size, blake2 = job
+    hashes = {"MD5": hashlib.md5()}
+    if blake2:
+        hashes["BLAKE2b"] = hashlib.blake2b()
+    with open(output_file, "wb") as fo:
+        for input_file in input_files:
+            with open(input_file, "rb") as fi:
+                block = fi.read(block_size)
+                try:
+                    assert block[:2] == GZIP_MAGIC
+                except AssertionError:
+                    raise ValueError("{} is not a gzip file".format(input_file))
+                while block:
+                    fo.write(block)
+                    for h in hashes.values():
+                        h.update(block)
+                    block = fi.read(block_size)
+    return output_file, {name: h.hexdigest() for name, h in hashes.items()}
+
+
+def main():
+    args = prog_options()
+    output_dir = args.output_dir or args.input_dir
+
+    try:
+        with open(args.sample_sheet) as sf:
+            samples = [line.rstrip("\n").split("\t")[:2] for line in sf.readlines()[1:]
+                       if line.strip()]
+        assert samples and all(len(sample) == 2 for sample in samples)
+    except IOError as ioe:
+        sys.exit("\nError with the sample sheet: {}\n".format(ioe))
+    except AssertionError:
+        sys.exit("\nSample sheet must list samples, each with an output filename.\n")
+    names = [name for _, name in samples]
+    try:
+        assert len(set(names)) == len(names)
+    except AssertionError:
+        sys.exit("\nOutput filenames must be unique in the sample sheet, found repeated:"
+                 " {}\n".format(" ".join(sorted(set(name for name in names
+                                                    if names.count(name) > 1)))))
+
+    try:
+        assert os.path.isdir(output_dir)
+    except AssertionError:
+        print("\nCreating output directory...\n")
+        os.makedirs(output_dir)
+
+    # Collect lane files of every sample, in lane order
+    lane_files = sorted(f for f in os.listdir(args.input_dir) if LANE_FILE.search(f))
+    jobs = []
+    for sample, name in samples:
+        for read in ("R1", "R2"):
+            inputs = [os.path.join(args.input_dir, f) for f in lane_files
+                      if LANE_FILE.sub("", f) == sample and
+                      LANE_FILE.search(f).group(1) == read]
+            try:
+                assert inputs
+            except AssertionError:
+                sys.exit("\nNo {} lane files found for {}\n".format(read, sample))
+            print("{}\nConcatenating {} to {}_{}.fastq.gz".format(
+                  read, " ".join(os.path.basename(f) for f in inputs), name, read))
+            jobs.append((os.path.join(output_dir, "{}_{}.fastq.gz".format(name, read)),
+                         inputs, args.block_size, args.blake2))
+
+    pool = Pool(args.processes)
+    try:
+        results = dict(pool.imap(concat_files, jobs))
+    except (IOError, OSError, ValueError) as err:
+        sys.exit("\n{}".format(err))
+    finally:
+        pool.close()
+        pool.join()
+
+    # Save checksums in the format of BSD md5, one file per sample and checksum
+    for sample, name in samples:
+        for checksum in sorted(results[jobs[0][0]]):
+            checksum_file = os.path.join(output_dir, "{}_{}.txt".format(
+                            name, "md5" if checksum == "MD5" else checksum.lower()))
+            with open(checksum_file, "w") as fo:
+                for read in ("R1", "R2"):
+                    output_file = os.path.join(output_dir,
+                                               "{}_{}.fastq.gz".format(name, read))
+                    fo.write("{} ({}) = {}\n".format(checksum,
+                                                     os.path.basename(output_file),
+                                                     results[output_file][checksum]))
+            print("Saved {}".format(checksum_file))
+    return
+
+
+if __name__ == "__main__":
+    sys.exit(main())
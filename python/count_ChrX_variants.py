@@ -11,21 +11,9 @@ import argparse
 from collections import defaultdict
 err = []
 try:
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    mpl.rc("font", family="Arial")
-    mpl.rc("xtick", labelsize=11)  # set X axis ticksize
-    mpl.rc("ytick", labelsize=11)  # set Y axis ticksize
+    import numpy as np
 except ImportError:
-    err.append("matplotlib")
-try:
-    from palettable.colorbrewer.sequential import Blues_9    # Europe
-    from palettable.colorbrewer.sequential import Greens_9   # East Asia
-    from palettable.colorbrewer.sequential import Purples_9  # South Asia
-    from palettable.colorbrewer.sequential import Reds_9     # Americas
-    from palettable.colorbrewer.sequential import YlOrBr_9   # Sub-Saharan Africa
-except ImportError:
-    err.append("palettable")
+    err.append("numpy")
 try:
     import pandas as pd
 except ImportError:
@@ -35,6 +23,23 @@ try:
 except AssertionError:
     for error in err:
         sys.exit("Please install {}".format(error))
+from vcf_kernels import HET, get_decoder, read_samples, is_biallelic_snp
+from vcf_sampling import count_sampled
+from vcf_checkpoint import iter_checkpointed_lines
+from plot_utils import load_pyplot, plot_style, strip_plot
+from result_io import OUTPUT_FORMATS, output_path, read_results, write_results
+
+
+def get_htz_calls(line, decode, n_samples):
+    """Return heterozygous (1|0 or 0|1) calls of a biallelic ChrX VCF record, or None."""
+    try:
+        assert line.startswith(b"X")
+        fields = line.split(b"\t", 5)
+        assert is_biallelic_snp(fields[3], fields[4])
+    except Exception:
+        return None
+    else:
+        return decode(line, n_samples) == HET
 
 
 def handle_program_options():
@@ -47,9 +52,34 @@ def handle_program_options():
     parser.add_argument("-s", "--savefile",
                         help="Save the plot as an SVG file. Provide file path and file "
                         "name with extension.")
+    parser.add_argument("-k", "--kernel", choices=["auto", "numba", "numpy"],
+                        default="auto",
+                        help="Genotype decoding backend. Default 'auto' uses Numba when "
+                        "installed and NumPy otherwise.")
+    parser.add_argument("-sf", "--sample_fraction", type=float,
+                        help="Preview mode. Estimate variant counts from this fraction "
+                        "(0-1] of randomly sampled BGZF blocks (or sites, for plain gzip "
+                        "files). Estimates are scaled to the whole file and standard "
+                        "errors are saved in 'variant counts se' column.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for --sample_fraction.")
+    parser.add_argument("-cp", "--checkpoint",
+                        help="Periodically save counts and the current position in the VCF"
+                        " file to this checkpoint file.")
+    parser.add_argument("-ce", "--checkpoint_every", type=int, default=100000,
+                        help="Number of VCF lines read between checkpoints. Default is "
+                        "100000.")
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="Continue from the last checkpoint saved in --checkpoint "
+                        "file, if it exists.")
     parser.add_argument("-o", "--output_file",
                         help="Save consolidated data a tab-separated file. Provide file "
-                        "path and file name with extension.")
+                        "path and file name with extension. Use a .parquet or .feather "
+                        "extension to save a typed, columnar file instead.")
+    parser.add_argument("-of", "--output_format", choices=OUTPUT_FORMATS,
+                        help="File format of --output_file: 'txt' (tab-separated), "
+                        "'parquet' or 'feather' (typed, columnar), replacing its "
+                        "extension. Default is given by the --output_file extension.")
     return parser.parse_args()
 
 
@@ -64,35 +94,36 @@ def main():
                 line = line.split()
                 md_data[line[0]] = line[1]
 
-    variants = ["1|0", "0|1"]
-
     # Get variant site data for all genomes
+    try:
+        assert not (args.sample_fraction and args.checkpoint)
+    except AssertionError:
+        sys.exit("--checkpoint can not be used with --sample_fraction.")
     if args.chr21_vcf_file:
-        with gzip.open(args.chr21_vcf_file, "rb") as vcff:
-            for line in vcff:
+        decode = get_decoder(args.kernel)
+        if args.sample_fraction:
+            genome_order, counts, std_err = count_sampled(
+                args.chr21_vcf_file, args.sample_fraction,
+                lambda line, linenum, n_samples: get_htz_calls(line, decode, n_samples),
+                args.seed)
+        else:
+            with gzip.open(args.chr21_vcf_file, "rb") as vcff:
+                genome_order = read_samples(vcff)
+            counters = {"counts": np.zeros(len(genome_order), dtype=np.int64),
+                        "skipped": np.zeros(1, dtype=np.int64)}
+            for i, line in iter_checkpointed_lines(args.chr21_vcf_file, counters,
+                                                   args.checkpoint,
+                                                   args.checkpoint_every, args.resume):
+                res = get_htz_calls(line, decode, len(genome_order))
                 try:
-                    line = line.decode()
-                    assert line.startswith("#CHROM")
-                except Exception:
-                    try:
-                        assert line.startswith("X")
-                        line = line.strip().split("\t")
-                        assert line[3] in ["A", "T", "C", "G"]
-                        assert line[4] in ["A", "T", "C", "G"]
-                    except Exception:
-                        continue
-                    else:
-                        for i, entry in enumerate(line[9:]):
-                            try:
-                                assert entry in variants
-                            except Exception:
-                                continue
-                            else:
-                                variant_data[genome_order[i]] += 1
+                    assert res is not None
+                except AssertionError:
+                    counters["skipped"] += 1
                 else:
-                    line = line.strip().split("\t")
-                    genome_order = line[9:]
-                    variant_data = {col: 0 for col in genome_order}
+                    counters["counts"] += res
+            counts = counters["counts"]
+            print("Skipped {} lines".format(counters["skipped"][0]))
+        variant_data = dict(zip(genome_order, counts.tolist()))
 
         # Consolidate data
         all_data = defaultdict(list)
@@ -100,35 +131,27 @@ def main():
             all_data[sample] = [md_data[sample], variant_data[sample]]
         all_data_df = pd.DataFrame.from_dict(all_data, orient="index")
         all_data_df.columns = ["population", "variant counts"]
+        if args.sample_fraction:
+            all_data_df["variant counts se"] = all_data_df.index.map(
+                dict(zip(genome_order, std_err.tolist())))
         if args.output_file:
-            all_data_df.to_csv(args.output_file, sep="\t")
+            all_data_df.index.name = "sample"
+            write_results(all_data_df.reset_index(),
+                          output_path(args.output_file, args.output_format))
 
     # The code above is run on MERCED, and below is using output of variant counts and
     # plotting the data.
 
     # Plot variant calls
     if args.main_file:
-        colors = Blues_9.hex_colors[4:] + Greens_9.hex_colors[4:] +\
-                 Purples_9.hex_colors[4:] + Reds_9.hex_colors[2:6] +\
-                 YlOrBr_9.hex_colors[2:]
-        x_order = tuple(["FIN", "GBR", "CEU", "IBS", "TSI", "CHS", "CDX", "CHB",
-                         "JPT", "KHV", "GIH", "STU", "PJL", "ITU", "BEB", "PEL",
-                         "MXL", "CLM", "PUR", "ASW", "ACB", "GWD", "YRI", "LWK",
-                         "ESN", "MSL"])
-        assigned_colors = {a: b for a, b in zip(x_order, colors)}
-        count_data_df = pd.read_csv(args.main_file, sep="\t", index_col=0)
+        mpl, plt = load_pyplot()
+        count_data_df = read_results(args.main_file, ["population", "variant counts"])
         admixed_pop = ["CEU", "GIH", "PEL", "MXL", "CLM", "PUR", "ASW", "ACB"]
         count_subset_df = count_data_df.query("population in {}".format(admixed_pop))
-        count_subset_df = count_subset_df.sort_values(by=["population", "variant counts"])
-        x_order = count_subset_df.groupby(["population"]).mean().sort_values(by="variant counts")
-        with mpl.style.context("seaborn-white"):
+        with mpl.style.context(plot_style("seaborn-white")):
             plt.figure(figsize=(7, 5))
-            for entry in x_order.itertuples():
-                plt.scatter(entry[0], entry[1], marker="_", s=300,
-                            c="k")
-            for entry in count_subset_df.itertuples():
-                plt.scatter(entry[1], entry[2], marker=".",
-                            c=assigned_colors[entry[1]], edgecolors="face")
+            strip_plot(plt.gca(), count_subset_df["population"],
+                       count_subset_df["variant counts"], edgecolors="face")
             plt.xlabel("Admixed Populations", fontsize=12)
             plt.ylabel("Number of Variant Sites", fontsize=12)
             plt.tight_layout()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+:Abstract: Count variants per ancestry background for a chromosome of 1000 Genomes
+           Project. Haplotype alleles are decoded in blocks of sites and every ALT allele
+           is assigned to the local ancestry tract of its haplotype with one vectorized
+           searchsorted over the sorted tracts of all genomes. Non-reference alleles and
+           heterozygous sites per ancestry are counted for all genomes in a single pass
+           over the VCF file.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import os
+import sys
+import gzip
+import argparse
+from re import findall
+from time import strftime
+err = []
+try:
+    import numpy as np
+except ImportError:
+    err.append("numpy")
+try:
+    import pandas as pd
+except ImportError:
+    err.append("pandas")
+try:
+    assert len(err) == 0
+except AssertionError:
+    for error in err:
+        sys.exit("Please install {}".format(error))
+from vcf_kernels import read_samples, iter_allele_blocks
+from ancestry_tracts import load_tracts, haplotype_index, find_tracts
+from result_io import OUTPUT_FORMATS, output_path, write_results
+
+
+def find_bed_pairs(bed_dirs, genome_order):
+    """
+    Pair haplotype A and B .bed files of genomes in the VCF file. Files must follow the
+    naming convention Sample1_A_final.bed, Sample1_B_final.bed, ...
+
+    :return: Tuple of (list of (A .bed file, B .bed file), VCF column index of each
+             genome with .bed files)
+    """
+    column = {genome: i for i, genome in enumerate(genome_order)}
+    bed_pairs = []
+    columns = []
+    for bed_dir in bed_dirs:
+        files = sorted(f for f in os.listdir(bed_dir) if f.endswith(".bed"))
+        for fnh1, fnh2 in zip(files[0::2], files[1::2]):
+            try:
+                assert fnh1.split("_")[0] == fnh2.split("_")[0]
+            except AssertionError:
+                sys.exit("ERROR! Files are not for same genome: {} {}".format(fnh1, fnh2))
+            genome = fnh1.split("_")[0]
+            if genome in column:
+                bed_pairs.append((os.path.join(bed_dir, fnh1),
+                                  os.path.join(bed_dir, fnh2)))
+                columns.append(column[genome])
+    return bed_pairs, np.asarray(columns, dtype=np.int64)
+
+
+def count_ancestry_variants(vcff, n_samples, lane, start, end, ancestry, n_ancestries,
+                            block_size):
+    """
+    Count ALT alleles and heterozygous sites of every sample per ancestry of the tract
+    containing each allele. Alleles outside all tracts are counted as ancestry
+    n_ancestries.
+
+    :type lane: numpy.ndarray
+    :param lane: Haplotype index (2 * VCF column + 0 for A or 1 for B) of each tract.
+
+    :type start: numpy.ndarray
+    :param start: Start coordinate (0-based) of each tract.
+
+    :type end: numpy.ndarray
+    :param end: End coordinate (exclusive) of each tract.
+
+    :type ancestry: numpy.ndarray
+    :param ancestry: Ancestry code (0 to n_ancestries - 1) of each tract.
+
+    :return: Tuple of (alt_counts, het_counts, number of sites), count arrays have shape
+             (n_samples, n_ancestries + 1). A heterozygous site is assigned to the
+             ancestry of the haplotype carrying the ALT allele.
+    """
+    index = haplotype_index(lane, start, end)
+    bins = n_samples * (n_ancestries + 1)
+    alt_counts = np.zeros(bins, dtype=np.int64)
+    het_counts = np.zeros(bins, dtype=np.int64)
+    n_sites = 0
+    for positions, alleles in iter_allele_blocks(vcff, n_samples, block_size):
+        het = (alleles.sum(axis=2) == 1) & (alleles.min(axis=2) == 0)
+        sites, samples, haps = np.nonzero(alleles == 1)
+        tract = find_tracts(index, 2 * samples + haps, positions[sites] - 1)
+        anc = np.where(tract >= 0, ancestry[tract], n_ancestries)
+        key = samples * (n_ancestries + 1) + anc
+        alt_counts += np.bincount(key, minlength=bins)
+        het_counts += np.bincount(key[het[sites, samples]], minlength=bins)
+        n_sites += positions.size
+        print("{}: Processed {} sites".format(strftime("%d %b %Y %H:%M:%S"), n_sites))
+    return (alt_counts.reshape(n_samples, n_ancestries + 1),
+            het_counts.reshape(n_samples, n_ancestries + 1), n_sites)
+
+
+def handle_program_options():
+    parser = argparse.ArgumentParser(description="Count non-reference alleles and "
+                                     "heterozygous sites per local ancestry for a "
+                                     "chromosome of 1000 genome project.")
+    parser.add_argument("-vcf", "--vcf_file", required=True,
+                        help="Path to input VCF file of one chromosome. [REQUIRED]")
+    parser.add_argument("-bed", "--bed_dir", nargs="+", required=True,
+                        help="Folder(s) of local ancestry .bed files, named as "
+                        "Sample1_A_final.bed, Sample1_B_final.bed, ... [REQUIRED]")
+    parser.add_argument("-c", "--chromosome", type=int,
+                        help="Chromosome number of the VCF file. Default is the number in"
+                        " the VCF file name, e.g. ALL.chr21.phase3...vcf.gz")
+    parser.add_argument("-md", "--map_fp",
+                        help="Metadata mapping file corresponding to VCF file. If "
+                        "supplied, population, super population and gender columns are "
+                        "added to the output.")
+    parser.add_argument("-b", "--block_size", type=int, default=10000,
+                        help="Number of sites decoded per block. Default is 10000.")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Number of .bed files parsed in parallel. Default is 1.")
+    parser.add_argument("-o", "--output_file", required=True,
+                        help="Save counts per genome to this file. Columns hold ALT "
+                        "allele counts (e.g. 'AFR_alt'), heterozygous sites ('AFR_het') "
+                        "and tract length in bp summed over both haplotypes ('AFR_bp') "
+                        "per ancestry. Use a .parquet or .feather extension to save a "
+                        "typed, columnar file instead of a tab-separated file. "
+                        "[REQUIRED]")
+    parser.add_argument("-of", "--output_format", choices=OUTPUT_FORMATS,
+                        help="File format of --output_file: 'txt' (tab-separated), "
+                        "'parquet' or 'feather' (typed, columnar), replacing its "
+                        "extension. Default is given by the --output_file extension.")
+    return parser.parse_args()
+
+
+def main():
+    args = handle_program_options()
+
+    if args.chromosome is None:
+        try:
+            args.chromosome = int(findall(r"(\d+)", args.vcf_file.split(".")[1])[0])
+        except IndexError:
+            sys.exit("Please supply --chromosome for {}".format(args.vcf_file))
+
+    with gzip.open(args.vcf_file, "rb") as vcff:
+        genome_order = read_samples(vcff)
+        n_samples = len(genome_order)
+
+        # Ancestry tracts of this chromosome, keyed by VCF column and haplotype
+        bed_pairs, columns = find_bed_pairs(args.bed_dir, genome_order)
+        try:
+            assert len(bed_pairs) > 0
+        except AssertionError:
+            sys.exit("No .bed files found for genomes in {}".format(args.vcf_file))
+        print("{}: Reading ancestry tracts of {} genomes".
+              format(strftime("%d %b %Y %H:%M:%S"), len(bed_pairs)))
+        tracts, ancestries = load_tracts(bed_pairs, args.processes)
+        on_chrom = tracts["chrom"] == args.chromosome
+        sample = columns[tracts["sample"][on_chrom]]
+        lane = 2 * sample + tracts["hap"][on_chrom]
+        start = tracts["start"][on_chrom]
+        end = tracts["end"][on_chrom]
+        ancestry = tracts["ancestry"][on_chrom]
+        alt_counts, het_counts, n_sites = count_ancestry_variants(
+            vcff, n_samples, lane, start, end, ancestry, len(ancestries),
+            args.block_size)
+    try:
+        assert n_sites > 0
+    except AssertionError:
+        sys.exit("No biallelic SNP sites found in VCF file.")
+
+    # Consolidate counts of genomes with ancestry tracts
+    tract_bp = np.bincount(sample * len(ancestries) + ancestry, weights=end - start,
+                           minlength=n_samples * len(ancestries))
+    tract_bp = tract_bp.reshape(n_samples, len(ancestries))[columns]
+    results = pd.DataFrame({"sample": np.asarray(genome_order)[columns]})
+    for k, anc in enumerate(ancestries + ["unassigned"]):
+        results[anc + "_alt"] = alt_counts[columns, k]
+        results[anc + "_het"] = het_counts[columns, k]
+        if k < len(ancestries):
+            results[anc + "_bp"] = tract_bp[:, k].astype(np.int64)
+    if args.map_fp:
+        md_data = pd.read_csv(args.map_fp, sep="\t", index_col=False,
+                              usecols=[0, 1, 2, 3])
+        results = pd.merge(md_data, results, on="sample")
+    write_results(results, output_path(args.output_file, args.output_format))
+    print("Finished!\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
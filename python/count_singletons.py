@@ -10,21 +10,9 @@ import gzip
 import argparse
 err = []
 try:
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    mpl.rc("font", family="Arial")
-    mpl.rc("xtick", labelsize=11)  # set X axis ticksize
-    mpl.rc("ytick", labelsize=11)  # set Y axis ticksize
+    import numpy as np
 except ImportError:
-    err.append("matplotlib")
-try:
-    from palettable.colorbrewer.sequential import Blues_9    # Europe
-    from palettable.colorbrewer.sequential import Greens_9   # East Asia
-    from palettable.colorbrewer.sequential import Purples_9  # South Asia
-    from palettable.colorbrewer.sequential import Reds_9     # Americas
-    from palettable.colorbrewer.sequential import YlOrBr_9   # Sub-Saharan Africa
-except ImportError:
-    err.append("palettable")
+    err.append("numpy")
 try:
     import pandas as pd
 except ImportError:
@@ -34,6 +22,30 @@ try:
 except AssertionError:
     for error in err:
         sys.exit("Please install {}".format(error))
+from vcf_kernels import HOM_REF, HET, get_decoder, read_samples, is_biallelic_snp
+from vcf_sampling import count_sampled
+from plot_utils import POPULATIONS, load_pyplot, strip_plot
+from result_io import OUTPUT_FORMATS, output_path, read_results, write_results
+
+
+def get_singletons(line, decode, n_samples):
+    """
+    Return the singleton carrier of a biallelic Chr21 VCF record, i.e. the only sample
+    with a 1|0 or 0|1 call while all other samples are 0|0, as a boolean array. Returns
+    None if the record is not a singleton.
+    """
+    try:
+        assert line.startswith(b"21")
+        fields = line.split(b"\t", 5)
+        assert is_biallelic_snp(fields[3], fields[4])
+        calls = decode(line, n_samples)
+        assert np.count_nonzero(calls == HOM_REF) == n_samples - 1
+        singleton = calls == HET
+        assert np.count_nonzero(singleton) == 1
+    except AssertionError:
+        return None
+    else:
+        return singleton
 
 
 def handle_program_options():
@@ -45,8 +57,25 @@ def handle_program_options():
     parser.add_argument("-mf", "--main_file", help="File of singleton counts.")
     parser.add_argument("-s", "--savefile",
                         help="Save the plot as sn SVG file.")
+    parser.add_argument("-k", "--kernel", choices=["auto", "numba", "numpy"],
+                        default="auto",
+                        help="Genotype decoding backend. Default 'auto' uses Numba when "
+                        "installed and NumPy otherwise.")
+    parser.add_argument("-sf", "--sample_fraction", type=float,
+                        help="Preview mode. Estimate singleton counts from this fraction "
+                        "(0-1] of randomly sampled BGZF blocks (or sites, for plain gzip "
+                        "files). Estimates are scaled to the whole file and standard "
+                        "errors are saved in 'singleton_count_se' column.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for --sample_fraction.")
     parser.add_argument("-o", "--output_file",
-                        help="Save consolidated data to this file")
+                        help="Save consolidated data to this file. Use a .parquet or "
+                        ".feather extension to save a typed, columnar file instead of a "
+                        "tab-separated file.")
+    parser.add_argument("-of", "--output_format", choices=OUTPUT_FORMATS,
+                        help="File format of --output_file: 'txt' (tab-separated), "
+                        "'parquet' or 'feather' (typed, columnar), replacing its "
+                        "extension. Default is given by the --output_file extension.")
     return parser.parse_args()
 
 
@@ -61,69 +90,52 @@ def main():
                 line = line.split()
                 md_data[line[0]] = line[1]
 
-    singletons = ["1|0", "0|1"]
-
     # Get singleton data for all genomes
     if args.chr21_vcf_file:
-        with gzip.open(args.chr21_vcf_file, "rb") as vcff:
-            for line in vcff.readlines():
-                try:
-                    line = line.decode()
-                    assert line.startswith("#CHROM")
-                except Exception:
+        decode = get_decoder(args.kernel)
+        if args.sample_fraction:
+            genome_order, counts, std_err = count_sampled(
+                args.chr21_vcf_file, args.sample_fraction,
+                lambda line, linenum, n_samples: get_singletons(line, decode, n_samples),
+                args.seed)
+            singleton_std_err = dict(zip(genome_order, std_err.tolist()))
+        else:
+            with gzip.open(args.chr21_vcf_file, "rb") as vcff:
+                genome_order = read_samples(vcff)
+                counts = np.zeros(len(genome_order), dtype=np.int64)
+                for line in vcff:
+                    res = get_singletons(line, decode, len(genome_order))
                     try:
-                        assert line.startswith("21")
-                    except Exception:
+                        assert res is not None
+                    except AssertionError:
                         continue
                     else:
-                        line = line.strip().split()
-                        for singleton in singletons:
-                            try:
-                                assert line[3] in ["A", "T", "C", "G"]
-                                assert line[4] in ["A", "T", "C", "G"]
-                                assert line[9:].count(singleton) == 1
-                                assert line[9:].count("0|0") == len(line[9:]) - 1
-                            except AssertionError:
-                                continue
-                            else:
-                                individual = line[9:].index(singleton)
-                                singleton_data[genome_order[individual]] += 1
-                else:
-                    line = line.strip().split()
-                    genome_order = line[9:]
-                    singleton_data = {col: 0 for col in genome_order}
+                        counts += res
+        singleton_data = dict(zip(genome_order, counts.tolist()))
 
     # Get normalized singleton data
     if args.output_file:
-        with open(args.output_file, "w") as outf:
-            outf.write("sampleID\tpopulation\tsingleton_count\n")
-            for sid in md_data.keys():
-                outf.write("{0}\t{1}\t{2}\n".format(sid, md_data[sid],
-                                                    singleton_data[sid]))
+        results = pd.DataFrame({"sampleID": list(md_data.keys()),
+                                "population": list(md_data.values())})
+        results["singleton_count"] = results["sampleID"].map(singleton_data)
+        if args.sample_fraction:
+            results["singleton_count_se"] = results["sampleID"].map(singleton_std_err)
+        write_results(results, output_path(args.output_file, args.output_format))
 
     # Plot the data
     if args.savefile:
         try:
-            singleton_counts = pd.read_csv(args.main_file, sep="\t", index_col=0)
+            singleton_counts = read_results(args.main_file,
+                                            ["population", "singleton_count"])
         except Exception:
             sys.exit("Error reading in singleton count file. Please check the --main_file"
                      " parameter.")
         else:
-            colors = Blues_9.hex_colors[4:] + Greens_9.hex_colors[4:] +\
-                     Purples_9.hex_colors[4:] + Reds_9.hex_colors[2:6] +\
-                     YlOrBr_9.hex_colors[2:]
-            x_order = tuple(["FIN", "GBR", "CEU", "IBS", "TSI", "CHS", "CDX", "CHB",
-                             "JPT", "KHV", "GIH", "STU", "PJL", "ITU", "BEB", "PEL",
-                             "MXL", "CLM", "PUR", "ASW", "ACB", "GWD", "YRI", "LWK",
-                             "ESN", "MSL"])
-            assigned_colors = {a:b for a, b in zip(x_order, colors)}
-            sorted_counts = singleton_counts.groupby("population").median().\
-                            reindex(x_order, axis=0)
+            plt = load_pyplot()[1]
             plt.figure(figsize=(20, 8))
-            for entry in sorted_counts.itertuples():
-                plt.scatter(entry[0], entry[1], marker="_", s=300, c="k")
-            for entry in singleton_counts.itertuples():
-                plt.scatter(entry[1], entry[2], marker="+", c=assigned_colors[entry[1]])
+            strip_plot(plt.gca(), singleton_counts["population"],
+                       singleton_counts["singleton_count"], order=POPULATIONS,
+                       center="median", marker="+")
             plt.xlabel("Populations", fontdict={"fontsize": 12})
             plt.ylabel("Number of Singletons in Chr21", fontdict={"fontsize": 12})
             plt.savefig(args.savefile, dpi=300, format="svg",
@@ -10,12 +10,23 @@ import gzip
 import argparse
 import itertools
 from collections import defaultdict
+import numpy as np
 import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-mpl.rc("font", family="Arial")
-mpl.rc("xtick", labelsize=9.5)  # set X axis ticksize
-mpl.rc("ytick", labelsize=11)  # set Y axis ticksize
+from vcf_kernels import HET, HOM_ALT, get_decoder, read_samples
+from vcf_sampling import count_sampled
+from plot_utils import load_pyplot, strip_plot
+from result_io import OUTPUT_FORMATS, output_path, read_results, write_results
+
+
+def get_variant_calls(line, decode, n_samples):
+    """Return non-reference (1|0, 0|1 or 1|1) calls of a Chr21 VCF record, or None."""
+    try:
+        assert line.startswith(b"21")
+    except AssertionError:
+        return None
+    else:
+        calls = decode(line, n_samples)
+        return (calls == HET) | (calls == HOM_ALT)
 
 
 def handle_program_options():
@@ -27,8 +38,25 @@ def handle_program_options():
     parser.add_argument("-mf", "--main_file", help="Output file of variant counts.")
     parser.add_argument("-s", "--savefile",
                         help="Save the plot to this file. PDF preferred.")
-    parser.add_argument("-o", "--output_file", action="store_true",
-                        help="Save consolidated data to this file")
+    parser.add_argument("-k", "--kernel", choices=["auto", "numba", "numpy"],
+                        default="auto",
+                        help="Genotype decoding backend. Default 'auto' uses Numba when "
+                        "installed and NumPy otherwise.")
+    parser.add_argument("-sf", "--sample_fraction", type=float,
+                        help="Preview mode. Estimate variant counts from this fraction "
+                        "(0-1] of randomly sampled BGZF blocks (or sites, for plain gzip "
+                        "files). Estimates are scaled to the whole file and standard "
+                        "errors are saved in 'variant counts se' column.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for --sample_fraction.")
+    parser.add_argument("-o", "--output_file",
+                        help="Save consolidated data to this file. Use a .parquet or "
+                        ".feather extension to save a typed, columnar file instead of a "
+                        "tab-separated file.")
+    parser.add_argument("-of", "--output_format", choices=OUTPUT_FORMATS,
+                        help="File format of --output_file: 'txt' (tab-separated), "
+                        "'parquet' or 'feather' (typed, columnar), replacing its "
+                        "extension. Default is given by the --output_file extension.")
     return parser.parse_args()
 
 
@@ -43,33 +71,28 @@ def main():
                 line = line.split()
                 md_data[line[0]] = line[1]
 
-    variants = ["1|0", "0|1", "1|1"]
-
     # Get variant site data for all genomes
     if args.chr21_vcf_file:
-        with gzip.open(args.chr21_vcf_file, "rb") as vcff:
-            for line in vcff.readlines():
-                try:
-                    line = line.decode()
-                    assert line.startswith("#CHROM")
-                except Exception:
+        decode = get_decoder(args.kernel)
+        if args.sample_fraction:
+            genome_order, counts, std_err = count_sampled(
+                args.chr21_vcf_file, args.sample_fraction,
+                lambda line, linenum, n_samples: get_variant_calls(line, decode,
+                                                                   n_samples),
+                args.seed)
+        else:
+            with gzip.open(args.chr21_vcf_file, "rb") as vcff:
+                genome_order = read_samples(vcff)
+                counts = np.zeros(len(genome_order), dtype=np.int64)
+                for line in vcff:
+                    res = get_variant_calls(line, decode, len(genome_order))
                     try:
-                        assert line.startswith("21")
-                    except Exception:
+                        assert res is not None
+                    except AssertionError:
                         continue
                     else:
-                        line = line.strip().split()
-                        for i, entry in enumerate(line[9:]):
-                            try:
-                                assert entry in variants
-                            except Exception:
-                                continue
-                            else:
-                                variant_data[genome_order[i]] += 1
-                else:
-                    line = line.strip().split()
-                    genome_order = line[9:]
-                    variant_data = {col: 0 for col in genome_order}
+                        counts += res
+        variant_data = dict(zip(genome_order, counts.tolist()))
 
         # Consolidate data
         all_data = defaultdict(list)
@@ -77,22 +100,25 @@ def main():
             all_data[sample] = [md_data[sample], variant_data[sample]]
         all_data_df = pd.DataFrame.from_dict(all_data, orient="index")
         all_data_df.columns = ["population", "variant counts"]
+        if args.sample_fraction:
+            all_data_df["variant counts se"] = all_data_df.index.map(
+                dict(zip(genome_order, std_err.tolist())))
         if args.output_file:
-            all_data_df.to_csv(args.output_file, sep="\t")
+            all_data_df.index.name = "sample"
+            write_results(all_data_df.reset_index(),
+                          output_path(args.output_file, args.output_format))
 
     # The code above is run on MERCED, and below is using output of variant counts and
     # plotting the data.
 
     # Plot variant calls
     if args.main_file:
-        count_data_df = pd.read_csv(args.main_file, sep="\t", index_col=0)
-        count_data_df = count_data_df.sort_values(by=["population", "variant counts"])
-        x_order = count_data_df.groupby(["population"]).mean().sort_values(by="variant counts")
+        plt = load_pyplot(xtick=9.5)[1]
+        count_data_df = read_results(args.main_file, ["population", "variant counts"])
         fig = plt.figure(figsize=(12, 8))
-        for entry in x_order.itertuples():
-            plt.scatter(entry[0], entry[1], marker="_", s=300, c="r")
-        for entry in count_data_df.itertuples():
-            plt.scatter(entry[1], entry[2], marker="+", c="b")
+        strip_plot(plt.gca(), count_data_df["population"],
+                   count_data_df["variant counts"], colors="b", center_color="r",
+                   marker="+")
         plt.xlabel("Individual", fontsize=15)
         plt.ylabel("Variant sites per genome", fontsize=15)
         if args.savefile:
@@ -10,45 +10,51 @@ import gzip
 import argparse
 from time import strftime
 from re import findall
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
 try:
     import pandas as pd
 except ImportError:
     sys.exit("Please install pandas")
+from vcf_kernels import HET, HAP_ALT, get_decoder, read_samples
+from vcf_sampling import count_sampled
+from vcf_checkpoint import iter_checkpointed_lines
+from result_io import OUTPUT_FORMATS, output_path, write_results
+from vcf_filters import in_par
+
 
+def site_fields(line):
+    """Decode the CHROM, POS, ID, REF and ALT columns of a raw VCF data line."""
+    return line.split(b"\t", 5)[:5]
 
-def get_variant_counts(line, males, linenum):
+
+def get_variant_counts(line, males, linenum, decode, n_samples):
     """Iterate through dataframe of genotype entries and count 0|1 or 1|0."""
     print("{}: Processing line {}".format(strftime("%d %b %Y %H:%M:%S"), linenum))
     try:
-        line = line.strip().split("\t")
+        genotypes = line
+        line = [field.decode() for field in site_fields(line)]
         if males:
             try:
-                assert 60001 <= int(line[1]) <= 2699520
+                assert not in_par(int(line[1]))
             except AssertionError:  # fail assertion
-                try:
-                    154931044 <= int(line[1]) <= 155260560
-                except AssertionError:  # fail assertion
-                    try:
-                        assert line[3] in ["A", "T", "C", "G"]
-                        assert line[4] in ["A", "T", "C", "G"]
-                    except AssertionError:
-                        print("{}: Skipped line because coordinate in ignored region".
-                              format(strftime("%d %b %Y %H:%M:%S"), linenum))
-                        return None
-                    else:
-                        variant_indices = [i for i, entry in enumerate(line[9:])
-                                           if int(entry) == 1]
-                        print("{}: Completed line {}".
-                              format(strftime("%d %b %Y %H:%M:%S"), linenum))
-                        return variant_indices
-                else:
-                    print("{}: Skipped line because {} in ignored region".
-                          format(strftime("%d %b %Y %H:%M:%S"), line[1], linenum))
-                    return None
-            else:
                 print("{}: Skipped line because coordinate in ignored region".
                       format(strftime("%d %b %Y %H:%M:%S"), linenum))
                 return None
+            try:
+                assert line[3] in ["A", "T", "C", "G"]
+                assert line[4] in ["A", "T", "C", "G"]
+            except AssertionError:
+                print("{}: Skipped line because coordinate in ignored region".
+                      format(strftime("%d %b %Y %H:%M:%S"), linenum))
+                return None
+            else:
+                variant_calls = decode(genotypes, n_samples) == HAP_ALT
+                print("{}: Completed line {}".
+                      format(strftime("%d %b %Y %H:%M:%S"), linenum))
+                return variant_calls
         assert line[3] in ["A", "T", "C", "G"]
         assert line[4] in ["A", "T", "C", "G"]
     except AssertionError:
@@ -56,93 +62,67 @@ def get_variant_counts(line, males, linenum):
               format(strftime("%d %b %Y %H:%M:%S"), linenum))
         return None
     else:
-        variant_indices = [i for i, entry in enumerate(line[9:])
-                           if entry in ["1|0", "0|1"]]
+        variant_calls = decode(genotypes, n_samples) == HET
         print("{}: Completed line {}".format(strftime("%d %b %Y %H:%M:%S"), linenum))
-        return variant_indices
+        return variant_calls
 
 
-def get_diploid_htz_counts(line, linenum):
+def get_diploid_htz_counts(line, linenum, decode, n_samples):
     """Iterate through dataframe of genotype entries and count 0|1 or 1|0."""
-    line = line.strip().split("\t")
+    genotypes = line
+    line = [field.decode() for field in site_fields(line)]
     print("{}: Processing position {} in line {}".
           format(strftime("%d %b %Y %H:%M:%S"), line[1], linenum))
     try:
-        assert 60001 <= int(line[1]) <= 2699520
+        assert in_par(int(line[1]))
     except AssertionError:
-        try:
-            assert 154931044 <= int(line[1]) <= 155260560
-        except AssertionError:
-            print("{}: Skipped line {} as coordinate {} is not in range of interest".
-                  format(strftime("%d %b %Y %H:%M:%S"), linenum, line[1]))
-            return None
-        else:
-            try:
-                assert line[3] in ["A", "T", "C", "G"]
-                assert line[4] in ["A", "T", "C", "G"]
-            except AssertionError as ae:
-                print("{}: Skipped line {} as it is not biallelic entry".
-                      format(strftime("%d %b %Y %H:%M:%S"), linenum))
-                return None
-            else:  # entry is biallelic and not in ignored region
-                variant_indices = [i for i, entry in enumerate(line[9:])
-                                   if entry in ["0|1", "1|0"]]
-                print("{}: Processed line {}".
-                      format(strftime("%d %b %Y %H:%M:%S"), linenum))
-                return variant_indices
-    else:
-        try:
-            assert line[3] in ["A", "T", "C", "G"]
-            assert line[4] in ["A", "T", "C", "G"]
-        except AssertionError as ae:
-            print("{}: Skipped line {} as it is not biallelic entry".
-                  format(strftime("%d %b %Y %H:%M:%S"), linenum))
-            return None
-        else:  # entry is biallelic and not in ignored region
-            variant_indices = [i for i, entry in enumerate(line[9:])
-                               if entry in ["0|1", "1|0"]]
-            print("{}: Processed line {}".
-                  format(strftime("%d %b %Y %H:%M:%S"), linenum))
-            return variant_indices
-
-
-def get_haploid_htz_counts(line, linenum):
+        print("{}: Skipped line {} as coordinate {} is not in range of interest".
+              format(strftime("%d %b %Y %H:%M:%S"), linenum, line[1]))
+        return None
+    try:
+        assert line[3] in ["A", "T", "C", "G"]
+        assert line[4] in ["A", "T", "C", "G"]
+    except AssertionError as ae:
+        print("{}: Skipped line {} as it is not biallelic entry".
+              format(strftime("%d %b %Y %H:%M:%S"), linenum))
+        return None
+    else:  # entry is biallelic and not in ignored region
+        variant_calls = decode(genotypes, n_samples) == HET
+        print("{}: Processed line {}".
+              format(strftime("%d %b %Y %H:%M:%S"), linenum))
+        return variant_calls
+
+
+def get_haploid_htz_counts(line, linenum, decode, n_samples):
     """Iterate through dataframe of genotype entries and count 0|1 or 1|0."""
-    line = line.strip().split("\t")
+    genotypes = line
+    line = [field.decode() for field in site_fields(line)]
     print("{}: Processing position {} in line {}".
           format(strftime("%d %b %Y %H:%M:%S"), line[1], linenum))
     try:
-        assert 60001 <= int(line[1]) <= 2699520
+        assert not in_par(int(line[1]))
     except AssertionError:
-        try:
-            assert 154931044 <= int(line[1]) <= 155260560
-        except AssertionError:    # when coordinates not in the ignore range
-            try:
-                assert line[3] in ["A", "T", "C", "G"]
-                assert line[4] in ["A", "T", "C", "G"]
-            except AssertionError:
-                print("{}: Skipped line {} as it is not biallelic entry".
-                  format(strftime("%d %b %Y %H:%M:%S"), linenum))
-                return None
-            else:  # entry is biallelic and not in ignored region
-                variant_indices = [i for i, entry in enumerate(line[9:])
-                                   if entry in ["0|1", "1|0"]]
-                print("{}: Processed line {}".
-                      format(strftime("%d %b %Y %H:%M:%S"), linenum))
-                return variant_indices
-        else:
-            print("{}: Skipped line {} as coordinate {} is not in range of interest".
-                  format(strftime("%d %b %Y %H:%M:%S"), linenum, line[1]))
-            return None
-    else:
         print("{}: Skipped line {} as coordinate {} is not in range of interest".
               format(strftime("%d %b %Y %H:%M:%S"), linenum, line[1]))
         return None
+    try:
+        assert line[3] in ["A", "T", "C", "G"]
+        assert line[4] in ["A", "T", "C", "G"]
+    except AssertionError:
+        print("{}: Skipped line {} as it is not biallelic entry".
+              format(strftime("%d %b %Y %H:%M:%S"), linenum))
+        return None
+    else:  # entry is biallelic and not in ignored region
+        variant_calls = decode(genotypes, n_samples) == HET
+        print("{}: Processed line {}".
+              format(strftime("%d %b %Y %H:%M:%S"), linenum))
+        return variant_calls
 
 
-def get_autosome_htz_counts(line, linenum):
+def get_autosome_htz_counts(line, linenum, decode, n_samples):
     """Iterate through dataframe of genotype entries and count 0|1 or 1|0."""
-    line = line.strip().split("\t")
+    genotypes = line
+    line = [field.decode() for field in site_fields(line)]
     print("{}: Processing position {} in line {}".
           format(strftime("%d %b %Y %H:%M:%S"), line[1], linenum))
     try:
@@ -153,11 +133,10 @@ def get_autosome_htz_counts(line, linenum):
               format(strftime("%d %b %Y %H:%M:%S"), linenum))
         return None
     else:  # entry is biallelic and not in ignored region
-        variant_indices = [i for i, entry in enumerate(line[9:])
-                           if entry in ["0|1", "1|0"]]
+        variant_calls = decode(genotypes, n_samples) == HET
         print("{}: Processed line {}".
               format(strftime("%d %b %Y %H:%M:%S"), linenum))
-        return variant_indices
+        return variant_calls
 
 
 def handle_program_options():
@@ -173,9 +152,34 @@ def handle_program_options():
     parser.add_argument("-a", "--autosomes", action="store_true",
                         help="Supply this parameter to get heterozygosity counts for all"
                         " autosomes.")
+    parser.add_argument("-k", "--kernel", choices=["auto", "numba", "numpy"],
+                        default="auto",
+                        help="Genotype decoding backend. Default 'auto' uses Numba when "
+                        "installed and NumPy otherwise.")
+    parser.add_argument("-sf", "--sample_fraction", type=float,
+                        help="Preview mode. Estimate heterozygosity counts from this "
+                        "fraction (0-1] of randomly sampled BGZF blocks (or sites, for "
+                        "plain gzip files). Estimates are scaled to the whole file and "
+                        "standard errors are saved in 'htz_counts_se' column.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for --sample_fraction.")
+    parser.add_argument("-cp", "--checkpoint",
+                        help="Periodically save counts and the current position in the VCF"
+                        " file to this checkpoint file.")
+    parser.add_argument("-ce", "--checkpoint_every", type=int, default=100000,
+                        help="Number of VCF lines read between checkpoints. Default is "
+                        "100000.")
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="Continue from the last checkpoint saved in --checkpoint "
+                        "file, if it exists.")
     parser.add_argument("-o", "--output_file",
                         help="Save consolidated data a tab-separated file. Provide file "
-                        "path and file name with extension.")
+                        "path and file name with extension. Use a .parquet or .feather "
+                        "extension to save a typed, columnar file instead.")
+    parser.add_argument("-of", "--output_format", choices=OUTPUT_FORMATS,
+                        help="File format of --output_file: 'txt' (tab-separated), "
+                        "'parquet' or 'feather' (typed, columnar), replacing its "
+                        "extension. Default is given by the --output_file extension.")
     return parser.parse_args()
 
 
@@ -183,41 +187,57 @@ def main():
     args = handle_program_options()
 
     #  Obtain non-reference site counts for all individuals
+    try:
+        assert not (args.sample_fraction and args.checkpoint)
+    except AssertionError:
+        sys.exit("--checkpoint can not be used with --sample_fraction.")
     if args.vcf_file:
-        with gzip.open(args.vcf_file, "rb") as vcff:
-            chr_name = args.vcf_file.split(".")[1]
-            try:
-                chr_num = findall(r"(\d+)", chr_name)[0]
-            except IndexError:
-                chr_num = "X"    # when processing ChrX vcf
-            for line in vcff:
-                for i, line in enumerate(vcff):
+        decode = get_decoder(args.kernel)
+        chr_name = args.vcf_file.split(".")[1]
+        try:
+            chr_num = findall(r"(\d+)", chr_name)[0]
+        except IndexError:
+            chr_num = "X"    # when processing ChrX vcf
+        chr_tag = chr_num.encode()
+        if args.include:
+            get_htz_counts = get_diploid_htz_counts
+        elif args.autosomes:
+            get_htz_counts = get_autosome_htz_counts
+        else:
+            get_htz_counts = get_haploid_htz_counts
+        if args.sample_fraction:
+            def count_line(line, linenum, n_samples):
+                if line.startswith(chr_tag):
+                    return get_htz_counts(line, linenum, decode, n_samples)
+            genome_order, htz_counts, htz_std_err = count_sampled(args.vcf_file,
+                                                                  args.sample_fraction,
+                                                                  count_line, args.seed)
+        else:
+            with gzip.open(args.vcf_file, "rb") as vcff:
+                genome_order = read_samples(vcff)
+            counters = {"htz_counts": np.zeros(len(genome_order), dtype=np.int64),
+                        "skipped": np.zeros(1, dtype=np.int64)}
+            settings = "{} {}".format(get_htz_counts.__name__, chr_num)
+            for i, line in iter_checkpointed_lines(args.vcf_file, counters,
+                                                   args.checkpoint,
+                                                   args.checkpoint_every, args.resume,
+                                                   settings):
+                try:
+                    assert line.startswith(chr_tag)
+                except AssertionError:
+                    continue
+                else:
+                    res = get_htz_counts(line, i, decode, len(genome_order))
                     try:
-                        line = line.decode()
-                        assert line.startswith("#CHROM")
-                    except Exception:
-                        try:
-                            assert line.startswith("{}".format(chr_num))
-                        except AssertionError:
-                            continue
-                        else:
-                            if args.include:
-                                res = get_diploid_htz_counts(line, i)
-                            elif args.autosomes:
-                                res = get_autosome_htz_counts(line, i)
-                            else:
-                                res = get_haploid_htz_counts(line, i)
-                            try:
-                                assert res is not None
-                            except AssertionError:
-                                continue
-                            else:
-                                for entry in res:
-                                    variant_data[genome_order[entry]] += 1
+                        assert res is not None
+                    except AssertionError:
+                        counters["skipped"] += 1
                     else:
-                        line = line.strip().split("\t")
-                        genome_order = line[9:]
-                        variant_data = {col: 0 for col in genome_order}
+                        counters["htz_counts"] += res
+            htz_counts = counters["htz_counts"]
+            print("{}: Skipped {} sites".format(strftime("%d %b %Y %H:%M:%S"),
+                                                counters["skipped"][0]))
+        variant_data = dict(zip(genome_order, htz_counts.tolist()))
 
         # Consolidate data
         # Get metadata for each genome
@@ -225,8 +245,12 @@ def main():
             md_data = pd.read_csv(args.map_fp, sep="\t", index_col=False,
                                   usecols=[0, 1, 2, 3])
             md_data["htz_counts"] = md_data["sample"].map(variant_data)
+            if args.sample_fraction:
+                md_data["htz_counts_se"] = md_data["sample"].map(
+                    dict(zip(genome_order, htz_std_err.tolist())))
             if args.output_file:
-                md_data.to_csv(args.output_file, sep="\t", index=False)
+                write_results(md_data, output_path(args.output_file,
+                                                   args.output_format))
         else:
             sys.exit("Please supply --map_fp parameter with the metadata file.")
 
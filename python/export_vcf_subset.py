@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""
+:Abstract: Export a subset of sites and genomes of a 1000 Genomes Project VCF file, e.g.
+           biallelic SNPs only, female genomes only or the non-admixed populations used
+           for PCA. The VCF file is parsed in large chunks with NumPy; selected columns
+           are copied as byte slices without re-formatting records. Output is written as
+           BGZF with blocks compressed in a pool of threads, along with a tabix index.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+import gzip
+import argparse
+from time import strftime
+from itertools import chain
+from multiprocessing import cpu_count
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
+import bgzf
+from tabix import build_tabix_index, write_tabix_index
+from vcf_kernels import parse_digits, read_samples
+from vcf_filters import ADMIXED_POPULATIONS, in_par, read_metadata, select_samples
+
+_BASES = np.zeros(256, dtype=bool)
+_BASES[np.frombuffer(b"ACGT", dtype=np.uint8)] = True
+
+
+def iter_chunks(vcf_file, threads, chunk_size=1 << 22):
+    """
+    Yield decompressed data of a gzipped VCF file in chunks which end with a newline.
+    BGZF compressed files are decompressed in a pool of threads.
+    """
+    if bgzf.is_bgzf(vcf_file):
+        fh = open(vcf_file, "rb")
+        raw = bgzf.iter_blocks(fh, threads)
+    else:
+        fh = gzip.open(vcf_file, "rb")
+        raw = iter(lambda: fh.read(chunk_size), b"")
+    with fh:
+        pending = []
+        size = 0
+        for data in raw:
+            pending.append(data)
+            size += len(data)
+            if size < chunk_size:
+                continue
+            data = b"".join(pending)
+            cut = data.rfind(b"\n") + 1
+            pending = [data[cut:]]
+            size = len(pending[0])
+            if cut:
+                yield data[:cut]
+        data = b"".join(pending)
+        if data:
+            yield data if data.endswith(b"\n") else data + b"\n"
+
+
+def column_runs(keep_columns):
+    """Group kept column indices into runs of consecutive columns (first, last)."""
+    keep_columns = np.asarray(keep_columns)
+    breaks = np.flatnonzero(np.diff(keep_columns) != 1)
+    firsts = np.append(keep_columns[0], keep_columns[breaks + 1])
+    lasts = np.append(keep_columns[breaks], keep_columns[-1])
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+
+def filter_chunk(chunk, n_columns, runs, biallelic_snps=False, exclude_par=False):
+    """
+    Select sites and columns of a chunk of complete VCF data lines.
+
+    :type chunk: bytes
+    :param chunk: VCF data lines, ending with a newline.
+
+    :type n_columns: int
+    :param n_columns: Number of columns of every record (9 + number of samples).
+
+    :type runs: list
+    :param runs: Runs of consecutive columns to keep, from column_runs().
+
+    :type biallelic_snps: bool
+    :param biallelic_snps: Keep only sites with single base REF and ALT alleles.
+
+    :type exclude_par: bool
+    :param exclude_par: Discard ChrX sites in the pseudo-autosomal regions.
+
+    :return: Tuple of (output bytes, chromosome of each kept record, positions, REF
+             lengths, output line lengths)
+    """
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == 10)
+    tabs = np.flatnonzero(buf == 9)
+    starts = np.append(0, newlines[:-1] + 1)
+    try:
+        assert tabs.size == newlines.size * (n_columns - 1)
+        tabs = tabs.reshape(newlines.size, n_columns - 1)
+        assert np.all(tabs[:, -1] < newlines) and np.all(tabs[1:, 0] > newlines[:-1])
+    except (AssertionError, ValueError):
+        raise ValueError("VCF records do not all have {} columns.".format(n_columns))
+
+    # Site filters
+    keep = np.ones(newlines.size, dtype=bool)
+    ref_len = tabs[:, 3] - tabs[:, 2] - 1
+    if biallelic_snps:
+        keep &= ((ref_len == 1) & (tabs[:, 4] - tabs[:, 3] == 2) &
+                 _BASES[buf[tabs[:, 2] + 1]] & _BASES[buf[tabs[:, 3] + 1]])
+    positions = parse_digits(buf, tabs[:, 0] + 1, tabs[:, 1])
+    chroms = [chunk[a:b] for a, b in zip(starts.tolist(), tabs[:, 0].tolist())]
+    if exclude_par:
+        chrx = np.array([chrom in (b"X", b"chrX") for chrom in chroms], dtype=bool)
+        keep &= ~(chrx & in_par(positions))
+    kept = np.flatnonzero(keep)
+    starts, newlines, tabs = starts[kept], newlines[kept], tabs[kept]
+
+    # Byte ranges of kept columns, each including the tab before it
+    seg_starts = []
+    seg_ends = []
+    for first, last in runs:
+        seg_starts.append(starts if first == 0 else tabs[:, first - 1])
+        seg_ends.append(newlines if last == n_columns - 1 else tabs[:, last])
+    seg_starts.append(newlines)
+    seg_ends.append(newlines + 1)
+    seg_starts = np.concatenate(seg_starts)
+    seg_ends = np.concatenate(seg_ends)
+    # Segments do not overlap, so starts and ends are unique, but a segment can end
+    # where the next one starts
+    delta = np.zeros(buf.size + 1, dtype=np.int8)
+    delta[seg_starts] = 1
+    delta[seg_ends] -= 1
+    mask = np.cumsum(delta[:-1], dtype=np.int8).view(bool)
+    line_len = (seg_ends - seg_starts).reshape(len(runs) + 1, -1).sum(axis=0)
+    return (buf[mask].tobytes(), [chroms[i] for i in kept.tolist()], positions[kept],
+            ref_len[kept], line_len)
+
+
+def export_subset(vcf_file, output_file, samples=None, biallelic_snps=False,
+                  exclude_par=False, threads=1, level=6, index=True, command=""):
+    """
+    Write selected sites and genomes of a VCF file as a BGZF compressed VCF file.
+
+    :type samples: list
+    :param samples: Column indices (0-based, among samples) of genomes to keep. Genomes
+                    are written in VCF column order. Default keeps all genomes.
+
+    :type index: bool
+    :param index: Also write a tabix index to output_file + '.tbi'. The VCF file must be
+                  sorted by chromosome and position.
+
+    :return: Tuple of (number of sites read, number of sites written)
+    """
+    chunks = iter_chunks(vcf_file, threads)
+    header = []
+    for chunk in chunks:
+        header.append(chunk)
+        data = b"".join(header)
+        chrom_line = (b"\n" + data).find(b"\n#CHROM")    # start of #CHROM line
+        if chrom_line != -1 and data.find(b"\n", chrom_line) != -1:
+            break
+    else:
+        sys.exit("No #CHROM header line found in VCF file.")
+    chrom_end = data.find(b"\n", chrom_line) + 1
+    columns = data[chrom_line:chrom_end].rstrip(b"\r\n").split(b"\t")
+    n_columns = len(columns)
+    samples = list(range(n_columns - 9)) if samples is None else sorted(set(samples))
+    try:
+        assert len(samples) > 0
+    except AssertionError:
+        sys.exit("No genomes selected for export.")
+    keep_columns = list(range(9)) + [9 + i for i in samples]
+    runs = column_runs(keep_columns)
+    header_out = data[:chrom_line]
+    if command:
+        header_out += "##export_vcf_subsetCommand={}\n".format(command).encode()
+    header_out += b"\t".join(columns[i] for i in keep_columns) + b"\n"
+
+    name_ids = {}
+    records = {key: [np.empty(0, dtype=np.int64)] for key in
+               ("tid", "beg", "end", "ustart", "uend")}
+    counts = {"read": 0, "written": 0}
+
+    def output_stream():
+        yield header_out
+        offset = len(header_out)
+        for chunk in chain([data[chrom_end:]], chunks):
+            if not chunk:
+                continue
+            out, chroms, positions, ref_len, line_len = filter_chunk(
+                chunk, n_columns, runs, biallelic_snps, exclude_par)
+            counts["read"] += chunk.count(b"\n")
+            counts["written"] += line_len.size
+            if index:
+                records["tid"].append(np.array([name_ids.setdefault(chrom, len(name_ids))
+                                                for chrom in chroms], dtype=np.int64))
+                records["beg"].append(positions - 1)
+                records["end"].append(positions - 1 + ref_len)
+                records["ustart"].append(offset + np.cumsum(line_len) - line_len)
+                records["uend"].append(offset + np.cumsum(line_len))
+            print("{}: Exported {} of {} sites".format(strftime("%d %b %Y %H:%M:%S"),
+                                                       counts["written"], counts["read"]))
+            offset += len(out)
+            yield out
+
+    with open(output_file, "wb") as outf:
+        block_offsets = bgzf.write_blocks(outf, bgzf.split_blocks(output_stream()),
+                                          threads, level)
+
+    if index:
+        tids, beg, end, ustart, uend = [np.concatenate(records[key]) for key in
+                                        ("tid", "beg", "end", "ustart", "uend")]
+        try:
+            assert np.all(np.diff(tids) >= 0)
+            assert np.all(np.diff(beg)[np.diff(tids) == 0] >= 0)
+        except AssertionError:
+            sys.exit("VCF file is not sorted by chromosome and position, can not create "
+                     "tabix index.")
+        block_offsets = np.asarray(block_offsets, dtype=np.int64)
+        vstart = (block_offsets[ustart // bgzf.MAX_BLOCK_DATA] << 16) | \
+            (ustart % bgzf.MAX_BLOCK_DATA)
+        vend = (block_offsets[uend // bgzf.MAX_BLOCK_DATA] << 16) | \
+            (uend % bgzf.MAX_BLOCK_DATA)
+        write_tabix_index(output_file + ".tbi",
+                          build_tabix_index(list(name_ids), tids, beg, end, vstart, vend),
+                          threads)
+    return counts["read"], counts["written"]
+
+
+def handle_program_options():
+    parser = argparse.ArgumentParser(description="Export selected sites and genomes of a "
+                                     "1000 genome project VCF file as a BGZF compressed, "
+                                     "tabix indexed VCF file. INFO fields are copied "
+                                     "unchanged and are not recomputed for the selected "
+                                     "genomes.")
+    parser.add_argument("-vcf", "--vcf_file", required=True,
+                        help="Path to input VCF file. [REQUIRED]")
+    parser.add_argument("-o", "--output_file", required=True,
+                        help="Path to output .vcf.gz file. [REQUIRED]")
+    parser.add_argument("-md", "--map_fp",
+                        help="Metadata mapping file corresponding to VCF file. Required to"
+                        " select genomes by population or gender.")
+    parser.add_argument("-pop", "--populations", nargs="+",
+                        help="Keep only genomes of these populations.")
+    parser.add_argument("-xpop", "--exclude_populations", nargs="+",
+                        help="Discard genomes of these populations.")
+    parser.add_argument("-na", "--non_admixed", action="store_true",
+                        help="Discard genomes of admixed populations ({}), as done for "
+                        "PCA.".format(", ".join(ADMIXED_POPULATIONS)))
+    parser.add_argument("-g", "--gender", choices=["male", "female"],
+                        help="Keep only genomes of this gender.")
+    parser.add_argument("-bs", "--biallelic_snps", action="store_true",
+                        help="Keep only biallelic SNP sites.")
+    parser.add_argument("-ep", "--exclude_par", action="store_true",
+                        help="Discard ChrX sites in the pseudo-autosomal regions.")
+    parser.add_argument("-ni", "--no_index", action="store_true",
+                        help="Do not write a tabix index. Use for unsorted VCF files.")
+    parser.add_argument("-cl", "--compression_level", type=int, default=6,
+                        choices=range(10), metavar="{0-9}",
+                        help="BGZF compression level. Default is 6.")
+    parser.add_argument("-t", "--threads", type=int, default=cpu_count(),
+                        help="Number of threads used to decompress and compress BGZF "
+                        "blocks. Default is all available cores.")
+    return parser.parse_args()
+
+
+def main():
+    args = handle_program_options()
+
+    # Select genomes
+    samples = None
+    exclude_populations = list(args.exclude_populations or [])
+    if args.non_admixed:
+        exclude_populations += ADMIXED_POPULATIONS
+    if args.populations or exclude_populations or args.gender:
+        try:
+            assert args.map_fp
+        except AssertionError:
+            sys.exit("Please supply --map_fp parameter to select genomes by population or"
+                     " gender.")
+        with gzip.open(args.vcf_file, "rb") as vcff:
+            genome_order = read_samples(vcff)
+        samples = select_samples(genome_order, read_metadata(args.map_fp),
+                                 args.populations, exclude_populations, args.gender)
+        print("Selected {} of {} genomes".format(len(samples), len(genome_order)))
+
+    # Export sites
+    n_read, n_written = export_subset(args.vcf_file, args.output_file, samples,
+                                      args.biallelic_snps, args.exclude_par, args.threads,
+                                      args.compression_level, not args.no_index,
+                                      " ".join(sys.argv))
+    print("Exported {} of {} sites to {}".format(n_written, n_read, args.output_file))
+    print("Finished!\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
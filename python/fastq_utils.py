@@ -0,0 +1,745 @@
+#!/usr/bin/env python
+"""
+:Abstract: Read plain or gzipped FASTQ files in large chunks and locate the sequence and
+           quality lines of all complete records of a chunk at once with NumPy. Per
+           position quality score and base histograms are built with vectorized
+           bincount, and fastx_quality_stats style statistics (mean, quartiles,
+           whiskers and base composition per position) are derived from them. Read
+           start adapters are counted in one pass over a file with an Aho-Corasick
+           automaton matching all adapters at once, and the most common read prefixes
+           are found in fixed memory with a Misra-Gries sketch. Reads are quality
+           filtered (as fastq_quality_filter) a chunk at a time, with the quality scores
+           of all reads of a chunk in one padded matrix. Read pairs are demultiplexed by
+           their 5'-end adapters in one pass to file objects or pipes. For a quick look
+           at a run, a uniform sample of reads is drawn with a reservoir in one pass, or
+           by seeking to random offsets of large uncompressed files.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import os
+import sys
+import gzip
+import heapq
+from itertools import islice, combinations, product, zip_longest
+from collections import Counter, deque
+err = []
+try:
+    import numpy as np
+except ImportError:
+    err.append("numpy")
+try:
+    import pandas as pd
+except ImportError:
+    err.append("pandas")
+try:
+    assert len(err) == 0
+except AssertionError:
+    for error in err:
+        sys.exit("Please install {}".format(error))
+
+FASTQ_EXTENSIONS = (".fastq", ".fq", ".fastq.gz", ".fq.gz")
+N_QUALITIES = 94    # phred scores 0 to 93 are printable characters
+CHUNK_SIZE = 1 << 23
+SEEK_MIN_SIZE = 1 << 26    # uncompressed files sampled by seeking
+
+# Plate, 16S region, forward and reverse adapter columns of a ws_map sample row
+PLATE_REGIONS = (("P1", "V1-V3", "27F", "519R"), ("P1", "V4-V5", "515F", "806R"),
+                 ("P2", "V1-V3", "27F", "519R"), ("P2", "V4-V5", "515F", "806R"))
+
+# Base codes A, C, G, T and N (any other character) of sequence bytes
+BASES = "ACGTN"
+_BASE_CODE = np.full(256, 4, dtype=np.int64)
+for _code, _base in enumerate(bytearray(b"ACGT")):
+    _BASE_CODE[_base] = _code
+    _BASE_CODE[_base + 32] = _code    # lowercase
+
+
+def open_fastq(fastq_file, mode="rb"):
+    """Open a FASTQ file, decompressing it if the file name ends with .gz"""
+    if fastq_file.endswith(".gz"):
+        return gzip.open(fastq_file, mode)
+    return open(fastq_file, mode)
+
+
+def is_fastq(file_name):
+    """Check if a file name has a FASTQ file extension."""
+    return file_name.endswith(FASTQ_EXTENSIONS)
+
+
+def _chunk_records(data):
+    """Locate header, sequence and quality lines of complete records in a chunk."""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == 10)
+    starts = np.append(0, ends[:-1] + 1)
+    ends = ends - ((ends > starts) & (buf[np.maximum(ends - 1, 0)] == 13))
+    try:
+        assert np.all(buf[starts[0::4]] == 64)
+    except AssertionError:
+        raise ValueError("FASTQ record does not start with '@'")
+    return {"buf": buf, "head_start": starts[0::4], "head_end": ends[0::4],
+            "seq_start": starts[1::4], "seq_end": ends[1::4],
+            "qual_start": starts[3::4], "qual_end": ends[3::4]}
+
+
+def iter_fastq_chunks(fastq_file, chunk_size=CHUNK_SIZE):
+    """
+    Read a FASTQ file in chunks of about chunk_size bytes and locate the lines of all
+    complete records in each chunk. Records are 4 lines: header, sequence, '+' and
+    quality.
+
+    :type fastq_file: str or file
+    :param fastq_file: FASTQ file name, or a binary file object (e.g. a pipe).
+
+    :return: Yields dicts with 'buf' (chunk data as numpy.uint8 array) and start and
+             end offsets (line ends exclude newline characters) of the 'head', 'seq'
+             and 'qual' lines of every record in the chunk.
+    """
+    if hasattr(fastq_file, "read"):
+        for chunk in _read_chunks(fastq_file, chunk_size, fastq_file):
+            yield chunk
+        return
+    with open_fastq(fastq_file) as fh:
+        for chunk in _read_chunks(fh, chunk_size, fastq_file):
+            yield chunk
+
+
+def _read_chunks(fh, chunk_size, name):
+    """Yield chunks of complete records read from an open FASTQ file."""
+    rest = b""
+    while True:
+        data = fh.read(chunk_size)
+        if not data:
+            break
+        data = rest + data
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+        n_lines = newlines.size - newlines.size % 4
+        if n_lines == 0:
+            rest = data
+            continue
+        end = int(newlines[n_lines - 1]) + 1
+        rest = data[end:]
+        yield _chunk_records(data[:end])
+    if rest.strip():
+        if not rest.endswith(b"\n"):
+            rest += b"\n"
+        try:
+            assert rest.count(b"\n") == 4
+        except AssertionError:
+            raise ValueError("Truncated FASTQ record at the end of {}".format(name))
+        yield _chunk_records(rest)
+
+
+def line_positions(starts, ends):
+    """
+    Flatten the bytes of many lines.
+
+    :return: Tuple of (offsets of all bytes, position of each byte within its line,
+             line lengths)
+    """
+    lengths = ends - starts
+    first = np.cumsum(lengths) - lengths
+    within = np.arange(int(lengths.sum())) - np.repeat(first, lengths)
+    return np.repeat(starts, lengths) + within, within, lengths
+
+
+def _add_counts(total, counts):
+    """Add a (positions, bins) count array to a running total of possibly fewer rows."""
+    if total is None:
+        return counts
+    if counts.shape[0] > total.shape[0]:
+        counts[:total.shape[0]] += total
+        return counts
+    total[:counts.shape[0]] += counts
+    return total
+
+
+def chunk_counts(chunk, phred_offset=33):
+    """
+    Count quality scores and bases per read position of all records of a chunk.
+
+    :return: Dict of 'quality' (positions, N_QUALITIES), 'bases' (positions, 5) and
+             'lengths' (read length histogram) count arrays and 'reads' count.
+    """
+    buf = chunk["buf"]
+    idx, within, lengths = line_positions(chunk["qual_start"], chunk["qual_end"])
+    try:
+        assert np.array_equal(lengths, chunk["seq_end"] - chunk["seq_start"])
+    except AssertionError:
+        raise ValueError("FASTQ sequence and quality lines differ in length")
+    n_pos = int(lengths.max()) if lengths.size else 0
+    quality = buf[idx].astype(np.int64) - phred_offset
+    try:
+        assert quality.size == 0 or (quality.min() >= 0 and
+                                     quality.max() < N_QUALITIES)
+    except AssertionError:
+        raise ValueError("Quality scores out of range for phred offset {}".
+                         format(phred_offset))
+    seq_idx = np.repeat(chunk["seq_start"], lengths) + within
+    return {"quality": np.bincount(within * N_QUALITIES + quality,
+                                   minlength=n_pos * N_QUALITIES).
+            reshape(n_pos, N_QUALITIES),
+            "bases": np.bincount(within * 5 + _BASE_CODE[buf[seq_idx]],
+                                 minlength=n_pos * 5).reshape(n_pos, 5),
+            "lengths": np.bincount(lengths),
+            "reads": lengths.size}
+
+
+def merge_counts(total, counts):
+    """Add counts returned by chunk_counts() to a running total (None to start)."""
+    if total is None:
+        return counts
+    return {"quality": _add_counts(total["quality"], counts["quality"]),
+            "bases": _add_counts(total["bases"], counts["bases"]),
+            "lengths": _add_counts(total["lengths"], counts["lengths"]),
+            "reads": total["reads"] + counts["reads"]}
+
+
+def fastq_counts(fastq_file, phred_offset=33, chunk_size=CHUNK_SIZE):
+    """
+    Count quality scores and bases per read position of all reads of a FASTQ file in one
+    streaming pass.
+
+    :return: Dict of counts, see chunk_counts().
+    """
+    total = None
+    for chunk in iter_fastq_chunks(fastq_file, chunk_size):
+        total = merge_counts(total, chunk_counts(chunk, phred_offset))
+    if total is None:
+        total = {"quality": np.zeros((0, N_QUALITIES), dtype=np.int64),
+                 "bases": np.zeros((0, 5), dtype=np.int64),
+                 "lengths": np.zeros(1, dtype=np.int64), "reads": 0}
+    return total
+
+
+def reservoir_sample(fastq_file, n_reads, seed=None, chunk_size=CHUNK_SIZE):
+    """
+    Draw a uniform sample of reads in one pass. Every read gets a random key and the
+    n_reads reads with the smallest keys are kept, a chunk of reads at a time.
+
+    :return: Tuple of (sampled records joined as bytes, number of reads in the file)
+    """
+    rng = np.random.default_rng(seed)
+    keys = np.empty(0)
+    records = []
+    threshold = 1.0
+    n_total = 0
+    for chunk in iter_fastq_chunks(fastq_file, chunk_size):
+        starts = chunk["head_start"]
+        n_total += starts.size
+        chunk_keys = rng.random(starts.size)
+        picked = np.flatnonzero(chunk_keys < threshold)
+        if picked.size == 0:
+            continue
+        ends = np.append(starts[1:], chunk["buf"].size)
+        records.extend(chunk["buf"][starts[k]:ends[k]].tobytes() for k in picked)
+        keys = np.append(keys, chunk_keys[picked])
+        if keys.size > n_reads:
+            keep = np.argpartition(keys, n_reads - 1)[:n_reads]
+            keys = keys[keep]
+            records = [records[k] for k in keep]
+            threshold = keys.max()
+    return b"".join(records), n_total
+
+
+def _record_at(data, pos, at_start, at_end):
+    """
+    Find the FASTQ record containing offset pos of a block of data. A record starts with
+    a line beginning with '@', followed by a sequence line, a line beginning with '+' and
+    a quality line as long as the sequence line. Candidate starts are tried backwards
+    from pos.
+
+    :type at_start: bool
+    :param at_start: The block starts at the start of the file.
+
+    :type at_end: bool
+    :param at_end: The block ends at the end of the file.
+
+    :return: Bytes of the record, or None if the block is too small to tell.
+    """
+    start = pos + 1
+    while start > 0:
+        start = data.rfind(b"\n@", 0, start) + 1
+        if start == 0 and not (at_start and data[:1] == b"@"):
+            return None
+        ends = [start - 1]
+        for _ in range(4):
+            end = data.find(b"\n", ends[-1] + 1)
+            if end < 0:
+                if not at_end or len(ends) < 4:
+                    return None
+                end = len(data)
+            ends.append(end)
+        seq = data[ends[1] + 1:ends[2]].rstrip()
+        if (data[ends[2] + 1:ends[2] + 2] == b"+" and
+                len(seq) == len(data[ends[3] + 1:ends[4]].rstrip())):
+            return data[start:ends[4]] + b"\n" if ends[4] >= pos else None
+        start -= 1
+    return None
+
+
+def seek_sample(fastq_file, n_reads, seed=None, window=1 << 11):
+    """
+    Draw a uniform sample of reads of an uncompressed FASTQ file by seeking to random
+    offsets. The record containing an offset is picked with probability proportional to
+    its length in bytes, so picked records are resampled with weights inverse to their
+    length. Reads are drawn with replacement: a read may appear more than once in the
+    sample, which is negligible when n_reads is small next to the number of reads.
+
+    :return: Tuple of (sampled records joined as bytes, estimated number of reads)
+    """
+    rng = np.random.default_rng(seed)
+    size = os.path.getsize(fastq_file)
+    records = []
+    with open(fastq_file, "rb") as fh:
+        for offset in np.sort(rng.integers(0, size, n_reads)):
+            width = window
+            record = None
+            while record is None and width <= 1 << 24:
+                start = max(int(offset) - width, 0)
+                fh.seek(start)
+                data = fh.read(int(offset) - start + width)
+                record = _record_at(data, int(offset) - start, start == 0,
+                                    start + len(data) >= size)
+                width *= 4
+            try:
+                assert record is not None
+            except AssertionError:
+                raise ValueError("No FASTQ record found at offset {} of {}".
+                                 format(offset, fastq_file))
+            records.append(record)
+    inverse = 1.0 / np.array([len(record) for record in records])
+    picked = rng.choice(len(records), n_reads, p=inverse / inverse.sum())
+    return b"".join(records[k] for k in picked), int(round(size * inverse.mean()))
+
+
+def sample_counts(fastq_file, n_reads, phred_offset=33, seed=None):
+    """
+    Count quality scores and bases per read position of a uniform sample of n_reads
+    reads. Large uncompressed files are sampled by seeking, with replacement (see
+    seek_sample()), other files are read in full.
+
+    :return: Dict of counts (see chunk_counts()), with the (estimated) number of reads of
+             the file as 'total_reads'.
+    """
+    if not fastq_file.endswith(".gz") and os.path.getsize(fastq_file) >= SEEK_MIN_SIZE:
+        data, n_total = seek_sample(fastq_file, n_reads, seed)
+    else:
+        data, n_total = reservoir_sample(fastq_file, n_reads, seed)
+    if data:
+        counts = chunk_counts(_chunk_records(data), phred_offset)
+    else:
+        counts = fastq_counts(os.devnull)
+    counts["total_reads"] = n_total
+    return counts
+
+
+def _nth_quality(cumulative, n):
+    """Smallest quality score of each position with at least n[i] scores up to it."""
+    return (cumulative < n[:, None]).sum(axis=1)
+
+
+def quality_stats(counts):
+    """
+    Compute per position quality statistics from quality and base histograms, with the
+    columns of fastx_quality_stats output.
+
+    :type counts: dict
+    :param counts: Counts returned by fastq_counts().
+
+    :return: pandas.DataFrame with one row per read position, indexed by 'column'
+             (1-based position).
+    """
+    quality = counts["quality"]
+    scores = np.arange(N_QUALITIES)
+    count = quality.sum(axis=1)
+    seen = quality > 0
+    q_min = np.where(seen.any(axis=1), seen.argmax(axis=1), 0)
+    q_max = np.where(seen.any(axis=1), N_QUALITIES - 1 - seen[:, ::-1].argmax(axis=1), 0)
+    q_sum = quality.dot(scores)
+    cumulative = np.cumsum(quality, axis=1)
+    q1 = _nth_quality(cumulative, np.maximum(count // 4, 1))
+    med = _nth_quality(cumulative, np.maximum(count // 2, 1))
+    q3 = _nth_quality(cumulative, np.maximum(count * 3 // 4, 1))
+    iqr = q3 - q1
+    stats = pd.DataFrame({"column": np.arange(1, count.size + 1), "count": count,
+                          "min": q_min, "max": q_max, "sum": q_sum,
+                          "mean": q_sum / np.maximum(count, 1), "Q1": q1, "med": med,
+                          "Q3": q3, "IQR": iqr,
+                          "lW": np.maximum(q1 - iqr * 3 // 2, q_min),
+                          "rW": np.minimum(q3 + iqr * 3 // 2, q_max)})
+    for k, base in enumerate(BASES):
+        stats["{}_Count".format(base)] = counts["bases"][:, k]
+    stats["Max_count"] = count.max() if count.size else 0
+    return stats.set_index("column")
+
+
+def quality_matrix(chunk):
+    """
+    Decode quality lines of all records of a chunk into a padded matrix. Rows are
+    gathered from a sliding window view of the chunk, and bytes past the end of each
+    quality line are set to 0.
+
+    :return: Tuple of (numpy.uint8 array of shape (reads, longest read) holding quality
+             characters, padded with 0, read lengths)
+    """
+    lengths = chunk["qual_end"] - chunk["qual_start"]
+    width = max(int(lengths.max()) if lengths.size else 0, 1)
+    padded = np.concatenate((chunk["buf"], np.zeros(width, dtype=np.uint8)))
+    quals = np.lib.stride_tricks.sliding_window_view(padded, width)[chunk["qual_start"]]
+    quals[np.arange(width) >= lengths[:, None]] = 0
+    return quals, lengths
+
+
+def write_records(fh, chunk, keep):
+    """Write records of a chunk flagged in keep (boolean array) to an open file."""
+    starts = chunk["head_start"]
+    ends = np.append(starts[1:], chunk["buf"].size)
+    # Runs of consecutive kept records are written with one call
+    flags = np.concatenate(([False], keep, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(flags))
+    for first, last in zip(edges[0::2], edges[1::2]):
+        fh.write(chunk["buf"][starts[first]:ends[last - 1]])
+
+
+def quality_filter(fastq_file, output_file, min_qual=20, min_pct=90, phred_offset=33,
+                   chunk_size=CHUNK_SIZE):
+    """
+    Keep reads with at least min_pct percent of bases of quality min_qual or higher, as
+    fastq_quality_filter -q min_qual -p min_pct.
+
+    :type fastq_file: str or file
+    :param fastq_file: FASTQ file name, or a binary file object (e.g. a pipe).
+
+    :type output_file: str
+    :param output_file: FASTQ file receiving kept reads, gzipped if it ends with .gz
+
+    :return: Tuple of (number of input reads, number of kept reads)
+    """
+    n_input = 0
+    n_kept = 0
+    with open_fastq(output_file, "wb") as fh:
+        for chunk in iter_fastq_chunks(fastq_file, chunk_size):
+            quals, lengths = quality_matrix(chunk)
+            try:
+                assert np.array_equal(lengths, chunk["seq_end"] - chunk["seq_start"])
+            except AssertionError:
+                raise ValueError("FASTQ sequence and quality lines differ in length")
+            good = (quals >= phred_offset + min_qual).sum(axis=1)
+            keep = good * 100 >= min_pct * lengths
+            write_records(fh, chunk, keep)
+            n_input += keep.size
+            n_kept += int(keep.sum())
+    return n_input, n_kept
+
+
+def filter_report(min_qual, min_pct, n_input, n_kept):
+    """Return the statistics of a quality filter run, as fastq_quality_filter -v."""
+    discarded = n_input - n_kept
+    return ("Quality cut-off: {}\nMinimum percentage: {}\nInput: {} reads.\n"
+            "Output: {} reads.\ndiscarded {} ({}%) low-quality reads.\n".
+            format(min_qual, min_pct, n_input, n_kept, discarded,
+                   discarded * 100 // n_input if n_input else 0))
+
+
+def quality_trim(seq, qual, low_quals):
+    """Trim 3'-end bases with quality scores in low_quals (bytes) off a read."""
+    qual = qual.rstrip(low_quals)
+    return seq[:len(qual)], qual
+
+
+def well_combos(sample):
+    """
+    Return (output prefix, forward adapter, reverse adapter) of every plate and 16S
+    region of a ws_map row, skipping combinations with 'NA' entries.
+    """
+    combos = []
+    for plate, region, fwd, rev in PLATE_REGIONS:
+        try:
+            combo = (sample["{}_sample".format(plate)] + "_" + region,
+                     sample["{}_{}".format(fwd, plate)],
+                     sample["{}_{}".format(rev, plate)])
+            assert "NA" not in combo
+        except (KeyError, TypeError, AssertionError):
+            continue
+        combos.append(combo)
+    return combos
+
+
+def demultiplex_pairs(R1_file, R2_file, combos, outputs, min_length=200, min_qual=25,
+                      mismatches=0):
+    """
+    Demultiplex R1/R2 read pairs in one pass. Read pairs are matched to every
+    forward/reverse adapter combination at the 5'-end of R1 and R2. Pairs matching
+    exactly one combination are written to the outputs of that combination, with their
+    adapters removed and 3'-ends trimmed until the desired quality is reached, unless
+    either read has a mean quality below min_qual before trimming or is shorter than
+    min_length after trimming. R1 and R2 must list the same reads in the same order.
+
+    :type combos: list
+    :param combos: List of (name, forward adapter, reverse adapter)
+
+    :type outputs: list
+    :param outputs: (R1 output, R2 output) binary file objects of every combination. The
+                    same file object may receive both reads, interleaved.
+
+    :type mismatches: int
+    :param mismatches: Number of mismatches tolerated per adapter.
+
+    :return: Dict of read pair counts per combination name and for 'unassigned',
+             'ambiguous' and 'filtered' read pairs
+
+    :raises ValueError: If R1 and R2 have different numbers of reads or read IDs, or a
+                        record is malformed.
+    """
+    fwd_automaton = adapter_automaton([fwd for _, fwd, _ in combos], mismatches)
+    rev_automaton = adapter_automaton([rev for _, _, rev in combos], mismatches)
+    fwd_span = max(len(fwd) for _, fwd, _ in combos)
+    rev_span = max(len(rev) for _, _, rev in combos)
+    low_quals = bytes(bytearray(range(33, 33 + min_qual)))
+    counts = dict.fromkeys([prefix for prefix, _, _ in combos] +
+                           ["unassigned", "ambiguous", "filtered"], 0)
+    route = {}
+    for r1, r2 in zip_longest(iter_fastq_records(R1_file), iter_fastq_records(R2_file)):
+        try:
+            assert r1 is not None and r2 is not None
+        except AssertionError:
+            raise ValueError("{} has more reads than {}".format(
+                             *((R1_file, R2_file) if r2 is None else (R2_file, R1_file))))
+        try:
+            assert _read_id(r1[0]) == _read_id(r2[0])
+        except AssertionError:
+            raise ValueError("Read IDs of {} and {} differ: {} and {}".format(
+                             R1_file, R2_file, r1[0].rstrip().decode(errors="replace"),
+                             r2[0].rstrip().decode(errors="replace")))
+        key = (r1[1][:fwd_span], r2[1][:rev_span])
+        k = route.get(key)
+        if k is None:
+            matches = (match_adapters(key[0].upper(), fwd_automaton) &
+                       match_adapters(key[1].upper(), rev_automaton))
+            if len(matches) == 1:
+                k = matches.pop()
+            else:
+                k = -2 if matches else -1    # ambiguous or unassigned
+            if len(route) > 1000000:
+                route.clear()
+            route[key] = k
+        if k < 0:
+            counts["unassigned" if k == -1 else "ambiguous"] += 1
+            continue
+        prefix, fwd, rev = combos[k]
+        reads = []
+        for (head, seq, _, qual), adapter in ((r1, fwd), (r2, rev)):
+            # Mean quality is checked before trimming, as Skewer -Q
+            qual = qual.rstrip()
+            if sum(bytearray(qual)) < (33 + min_qual) * len(qual):
+                break
+            seq, qual = quality_trim(seq.rstrip()[len(adapter):], qual[len(adapter):],
+                                     low_quals)
+            if len(qual) < min_length:
+                break
+            reads.append(b"".join((head, seq, b"\n+\n", qual, b"\n")))
+        else:
+            outputs[k][0].write(reads[0])
+            outputs[k][1].write(reads[1])
+            counts[prefix] += 1
+            continue
+        counts["filtered"] += 1
+    return counts
+
+
+def iter_sequences(fastq_file):
+    """Yield sequence lines (bytes, with line ending) of a plain or gzipped FASTQ file."""
+    with open_fastq(fastq_file) as fh:
+        for line in islice(fh, 1, None, 4):
+            yield line
+
+
+def iter_fastq_records(fastq_file):
+    """
+    Yield records of a plain or gzipped FASTQ file as tuples of 4 lines (bytes).
+
+    :raises ValueError: If a record does not start with '@', its third line does not
+                        start with '+' or the last record is truncated.
+    """
+    with open_fastq(fastq_file) as fh:
+        lines = iter(fh)
+        for record in zip_longest(lines, lines, lines, lines):
+            try:
+                assert record[3] is not None
+            except AssertionError:
+                raise ValueError("Truncated FASTQ record at the end of {}".
+                                 format(fastq_file))
+            try:
+                assert record[0][:1] == b"@" and record[2][:1] == b"+"
+            except AssertionError:
+                raise ValueError("Malformed FASTQ record in {}: {}".format(
+                                 fastq_file, record[0].rstrip().decode(errors="replace")))
+            yield record
+
+
+def _read_id(head):
+    """Read ID of a header line, without its /1 or /2 mate suffix."""
+    read_id = head.split(None, 1)[0]
+    if read_id[-2:] in (b"/1", b"/2"):
+        return read_id[:-2]
+    return read_id
+
+
+def mismatch_variants(sequence, mismatches=0):
+    """Return all variants of sequence (bytes) with up to mismatches bases replaced."""
+    sequence = sequence.upper()
+    variants = {sequence}
+    for k in range(1, mismatches + 1):
+        for positions in combinations(range(len(sequence)), k):
+            choices = [[b for b in b"ACGTN" if b != sequence[p]] for p in positions]
+            for bases in product(*choices):
+                variant = bytearray(sequence)
+                for p, b in zip(positions, bases):
+                    variant[p] = b
+                variants.add(bytes(variant))
+    return variants
+
+
+def adapter_automaton(adapters, mismatches=0):
+    """
+    Build an Aho-Corasick automaton matching all adapters, and their variants with up to
+    mismatches substitutions, in one pass over a sequence.
+
+    :type adapters: list
+    :param adapters: Adapter sequences (str).
+
+    :type mismatches: int
+    :param mismatches: Number of substituted bases tolerated per adapter match.
+
+    :return: Tuple of (transitions, outputs). transitions[state] maps a byte to the next
+             state (missing bytes go to the root state 0), outputs[state] is a list of
+             (adapter index, match length) of matches ending in state.
+    """
+    goto = [{}]
+    outputs = [[]]
+    for k, adapter in enumerate(adapters):
+        for variant in mismatch_variants(adapter.encode(), mismatches):
+            state = 0
+            for b in variant:
+                if b not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][b] = len(goto) - 1
+                state = goto[state][b]
+            outputs[state].append((k, len(variant)))
+
+    # Resolve failure links breadth first into full transitions of every state
+    transitions = [dict(goto[0])]
+    transitions.extend({} for _ in goto[1:])
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        transitions[state] = dict(transitions[fail[state]])
+        transitions[state].update(goto[state])
+        for b, child in goto[state].items():
+            fail[child] = transitions[fail[state]].get(b, 0)
+            outputs[child] = outputs[child] + outputs[fail[child]]
+            queue.append(child)
+    return transitions, outputs
+
+
+def match_adapters(sequence, automaton, max_offset=0):
+    """
+    Find adapters starting within the first max_offset + 1 bases of a sequence.
+
+    :return: Set of matched adapter indices.
+    """
+    transitions, outputs = automaton
+    state = 0
+    found = set()
+    for i, b in enumerate(sequence):
+        state = transitions[state].get(b, 0)
+        for k, length in outputs[state]:
+            if i + 1 - length <= max_offset:
+                found.add(k)
+    return found
+
+
+def count_adapters(fastq_file, adapters, max_offset=0, mismatches=0,
+                   max_starts=1000000):
+    """
+    Count reads of a FASTQ file starting with each adapter in one pass. Reads are first
+    tallied by their first max_offset + longest adapter bases, so the automaton runs
+    once per distinct read start. The tally is matched and cleared whenever it holds
+    max_starts distinct read starts, so memory does not grow with the number of reads.
+
+    :type max_offset: int
+    :param max_offset: Adapters may start up to max_offset bases into the read. Default
+                       counts adapters at the read start only (as grep '^ADAPTER').
+
+    :return: List of read counts, one per adapter.
+    """
+    automaton = adapter_automaton(adapters, mismatches)
+    span = max_offset + max(len(adapter) for adapter in adapters)
+    counts = [0] * len(adapters)
+    starts = Counter()
+    for line in iter_sequences(fastq_file):
+        starts[line[:span].upper()] += 1
+        if len(starts) >= max_starts:
+            _add_adapter_counts(counts, starts, automaton, max_offset)
+            starts.clear()
+    _add_adapter_counts(counts, starts, automaton, max_offset)
+    return counts
+
+
+def _add_adapter_counts(counts, starts, automaton, max_offset):
+    """Add read counts of a tally of read starts to the counts of matching adapters."""
+    for start, n_reads in starts.items():
+        for k in match_adapters(start, automaton, max_offset):
+            counts[k] += n_reads
+
+
+def reduce_sketch(sketch, capacity):
+    """
+    Misra-Gries reduction of a sketch to at most capacity entries: the (capacity + 1)th
+    largest count is subtracted from all counts and entries dropping to zero are removed.
+
+    :type sketch: collections.Counter
+    :param sketch: Counts of items, modified in place.
+
+    :return: Count subtracted from every item (0 if the sketch was not reduced).
+    """
+    if len(sketch) <= capacity:
+        return 0
+    cut = heapq.nlargest(capacity + 1, sketch.values())[-1]
+    for item, count in list(sketch.items()):
+        if count <= cut:
+            del sketch[item]
+        else:
+            sketch[item] = count - cut
+    return cut
+
+
+def prefix_sketch(fastq_file, length, capacity=1000, batch_size=100000):
+    """
+    Count reads and find the most common read prefixes of a FASTQ file in one pass with
+    fixed memory. Prefixes of a batch of reads are counted exactly and merged into a
+    Misra-Gries sketch of at most capacity prefixes.
+
+    :type length: int
+    :param length: Number of bases from read start in a prefix.
+
+    :type capacity: int
+    :param capacity: Number of prefixes kept in the sketch.
+
+    :return: Tuple of (collections.Counter of prefix count lower bounds, number of reads,
+             maximum count error). The true count of a prefix is at most its count plus
+             the maximum error (which is at most reads / (capacity + 1)), and prefixes
+             missing from the sketch occur at most maximum error times.
+    """
+    sequences = iter_sequences(fastq_file)
+    sketch = Counter()
+    n_reads = 0
+    error = 0
+    for batch in iter(lambda: list(islice(sequences, batch_size)), []):
+        sketch.update(line.rstrip()[:length] for line in batch)
+        n_reads += len(batch)
+        error += reduce_sketch(sketch, capacity)
+    return sketch, n_reads, error
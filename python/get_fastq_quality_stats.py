@@ -2,64 +2,129 @@
 import os
 import sys
 import argparse
-import pandas as pd
-import subprocess as sp
-import matplotlib.pyplot as plt
+from multiprocessing import Pool
 from os.path import join, relpath
-try:
-    import shlex
-except ImportError as ie:
-    sys.exit("Please install {} module before executing this script.".format(ie))
+from fastq_utils import fastq_counts, sample_counts, quality_stats, is_fastq
+from plot_utils import load_pyplot
 
 
 def prog_options():
     parser = argparse.ArgumentParser(
                 description="Iterate through each FASTQ file in a directory and get "
-                            "quality stats on input FASTQ files using FASTX Toolkit.")
-    parser.add_argument("input_dir", help="Directory containing input files.")
+                            "per position quality stats (fastx_quality_stats format) on "
+                            "input FASTQ files.")
+    parser.add_argument("input_dir", help="Directory containing input files (.fastq, .fq"
+                        " or gzipped .fastq.gz, .fq.gz).")
     parser.add_argument("output_dir", help="Directory to save output files in.")
     parser.add_argument("-s", "--save_fig", default=None,
                         help="Path and filename to save the quality plots. Plots will be "
                         "saved in PNG format.")
+    parser.add_argument("-q", "--phred_offset", type=int, default=33,
+                        help="ASCII offset of quality scores. Default is 33 (Sanger, "
+                        "Illumina 1.8+). Use 64 for old Illumina files, as assumed by "
+                        "fastx_quality_stats without -Q.")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Number of FASTQ files processed in parallel. Default is 1.")
+    parser.add_argument("-n", "--sample", type=int, default=None,
+                        help="Quick QC: compute statistics of a uniform random sample of "
+                        "this many reads per file. Uncompressed files are sampled by "
+                        "seeking to random offsets, so a read may be counted more than "
+                        "once (sampling with replacement). Gzipped files are "
+                        "decompressed once and sampled without replacement. Default is "
+                        "to use all reads.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed of --sample, for reproducible samples.")
     return parser.parse_args()
 
 
+def file_stats(job):
+    """
+    Compute per position quality statistics of one FASTQ file and save them as a
+    tab-separated file.
+
+    :type job: tuple
+    :param job: Tuple of (input FASTQ file, output file without extension, phred offset,
+                number of reads sampled or None, random seed)
+
+    :return: Tuple of (output file, pandas.DataFrame of quality statistics, number of
+             reads used, number of reads in the file)
+    """
+    input_filename, output_filename, phred_offset, n_sample, seed = job
+    try:
+        if n_sample:
+            counts = sample_counts(input_filename, n_sample, phred_offset, seed)
+        else:
+            counts = fastq_counts(input_filename, phred_offset)
+            counts["total_reads"] = counts["reads"]
+    except (ValueError, IOError, OSError) as err:
+        raise ValueError("Error reading {}: {}".format(input_filename, err))
+    qual_data = quality_stats(counts)
+    qual_data.to_csv(output_filename + ".txt", sep="\t")
+    with open(output_filename + "_lengths.txt", "w") as fo:
+        fo.write("length\treads\tfraction\n")
+        for length in counts["lengths"].nonzero()[0]:
+            fo.write("{}\t{}\t{:.6f}\n".format(length, counts["lengths"][length],
+                                               counts["lengths"][length] /
+                                               float(counts["reads"])))
+    return output_filename, qual_data, counts["reads"], counts["total_reads"]
+
+
 def main():
     args = prog_options()
 
     try:
         assert os.path.isdir(args.output_dir)
     except AssertionError:
-        print "\nCreating output directory...\n"
+        print("\nCreating output directory...\n")
         os.makedirs(args.output_dir)
 
+    jobs = []
     for root, dirs, files in os.walk(args.input_dir):
         for file in files:
-            if file.endswith(".fastq") or file.endswith(".fq"):
-                input_filename = relpath(join(args.input_dir, file))
+            if is_fastq(file):
+                input_filename = relpath(join(root, file))
                 output_filename = relpath(join(args.output_dir, file.split(".")[0]))
-                cmd = "fastx_quality_stats -i {} -o {}.txt".format(input_filename,
-                                                                   output_filename)
-                kwargs = shlex.split(cmd)
-                print "\n", kwargs
-                out = sp.check_output(kwargs)
-                qual_data = pd.read_csv(output_filename+".txt", sep="\t", index_col=0)
-                fig = plt.figure(figsize=(10, 7))
-                plt.plot(qual_data.index, qual_data["mean"], color="#7570b3",
-                         linewidth=2.0, label="Mean Quality Score")
-                plt.axhline(y=20, linewidth=2, color="#ff0000", label="Q20")
-                plt.ylim([0, 42])
-                plt.legend(loc="best")
-                plt.title("{}".format(file.split(".")[0]), size=12)
-                plt.grid(True, linestyle=":", c="#808080")
-                plt.xlabel("Nucleotide Base Number")
-                plt.ylabel("Phred Quality Score")
-                if args.save_fig:
-                    plt.savefig(relpath(join(args.save_fig, file.split(".")[0])) + ".png",
-                                dpi=200, facecolor="0.8", format="png",
-                                bbox_inches="tight", pad_inches=0.2)
-                else:
-                    plt.show()
+                jobs.append((input_filename, output_filename, args.phred_offset,
+                             args.sample, args.seed))
+    try:
+        if args.processes > 1:
+            pool = Pool(args.processes)
+            try:
+                results = pool.map(file_stats, jobs, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [file_stats(job) for job in jobs]
+    except ValueError as ve:
+        sys.exit(ve)
+
+    if args.save_fig:
+        # Plots are only saved to files, so no display is needed
+        os.environ.setdefault("MPLBACKEND", "Agg")
+    _, plt = load_pyplot()
+    for output_filename, qual_data, n_reads, n_total in results:
+        name = os.path.basename(output_filename)
+        if args.sample:
+            print("\nSampled {} of ~{} reads".format(n_reads, n_total))
+        print("\nSaved {0}.txt and {0}_lengths.txt".format(output_filename))
+        fig = plt.figure(figsize=(10, 7))
+        plt.plot(qual_data.index, qual_data["mean"], color="#7570b3",
+                 linewidth=2.0, label="Mean Quality Score")
+        plt.axhline(y=20, linewidth=2, color="#ff0000", label="Q20")
+        plt.ylim([0, 42])
+        plt.legend(loc="best")
+        plt.title("{}".format(name), size=12)
+        plt.grid(True, linestyle=":", c="#808080")
+        plt.xlabel("Nucleotide Base Number")
+        plt.ylabel("Phred Quality Score")
+        if args.save_fig:
+            plt.savefig(relpath(join(args.save_fig, name)) + ".png",
+                        dpi=200, facecolor="0.8", format="png",
+                        bbox_inches="tight", pad_inches=0.2)
+            plt.close(fig)
+        else:
+            plt.show()
     return
 
 
@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 
 '''
-Abstract: Iterate through all folders and grep count all adapter sequences.
+Abstract: Iterate through all folders and count reads starting with each adapter
+          sequence. All adapters are matched in a single pass over each fastq file.
 
 Date: 09/03/2015
 
@@ -10,81 +11,105 @@ Author: Akshay Paropkari
 
 import os
 import sys
-import subprocess as sp
 import argparse
-try:
-    import shlex
-except ImportError as ie:
-    sys.exit('Please install {} module before executing this script.'
-             .format(ie))
+from multiprocessing import Pool, cpu_count
+from fastq_utils import count_adapters
+
+# Dict mapping adapter seq to primer name
+ADAPTER_NAME = {'TCGATCG': '27F_A',
+                'CGGACTTGATGTACGA': '519R_A',
+                'CGAGCAATCCACTC': '515F_C',
+                'GATTAGCTGC': '806R_C',
+                'ATCTGTCATG': '27F_B',
+                'TCAGTAGCTACGC': '519R_B',
+                'GATCAGTCGTCTCACTC': '515F_D',
+                'ATCAGCA': '806R_D'}
 
 
 def prog_options():
     parser = argparse.ArgumentParser(
                 description='Iterate through each folder (sample) in a '
-                            'directory and grep count all adapter sequences '
-                            'in zipped fastq file.')
+                            'directory and count reads starting with each adapter '
+                            'sequence in zipped fastq file.')
     parser.add_argument('sample_dir',
                         help='Directory containing sample folders.')
     parser.add_argument('adapter_list',
                         help='File containing one sequence per line. This is '
-                             'the sequence that will be counted by grep.')
+                             'the sequence that will be counted at read start.')
     parser.add_argument('zipped_files', choices=['Y', 'N'],
                         help='Identify if the fastq files being searched are '
                              'Read 1/Read 2 compressed files (Y) or not (N).')
+    parser.add_argument('-o', '--max_offset', type=int, default=0,
+                        help='Count adapters starting up to this many bases into '
+                             'the read. Default is 0 (adapter at read start).')
+    parser.add_argument('-m', '--mismatches', type=int, default=0,
+                        help='Number of mismatched bases tolerated per adapter. '
+                             'Default is 0.')
+    parser.add_argument('-p', '--processes', type=int, default=cpu_count(),
+                        help='Number of wells counted in parallel. Default is the '
+                             'number of CPUs.')
     return parser.parse_args()
 
 
+def count_well(job):
+    '''
+    Count reads starting with each adapter in all fastq files of a well.
+
+    :type job: tuple
+    :param job: Tuple of (well folder, fastq files, adapters, max offset, mismatches)
+
+    :return: Tuple of (well folder, list of (fastq file, adapter counts))
+    '''
+    root, fastq_files, adapters, max_offset, mismatches = job
+    well_counts = []
+    for f in fastq_files:
+        try:
+            well_counts.append((f, count_adapters(os.path.join(root, f), adapters,
+                                                  max_offset, mismatches)))
+        except (IOError, OSError, ValueError) as err:
+            raise ValueError('Error reading {}: {}'.format(os.path.join(root, f), err))
+    return root, well_counts
+
+
 def main():
     args = prog_options()
 
-    # Iterate through all directories and access their files
+    # Read adapter sequences from file
+    with open(args.adapter_list, 'r') as acf:
+        adapters = acf.read().split()
+
+    # Get relevant file names of every well
+    jobs = []
     for root, dirs, files in os.walk(args.sample_dir):
         if root != args.sample_dir:
-            os.chdir(root)
-            print root[24:27]
-
-    # Read adapter sequences from file
-            with open(args.adapter_list, 'r') as acf:
-                for line in acf.readlines():
-                    adapters = line.strip().split('\r')
-
-    # Dict mapping adapter seq to primer name
-            adapter_name = {'TCGATCG': '27F_A',
-                            'CGGACTTGATGTACGA': '519R_A',
-                            'CGAGCAATCCACTC': '515F_C',
-                            'GATTAGCTGC': '806R_C',
-                            'ATCTGTCATG': '27F_B',
-                            'TCAGTAGCTACGC': '519R_B',
-                            'GATCAGTCGTCTCACTC': '515F_D',
-                            'ATCAGCA': '806R_D'}
-
-    # Get relevant file names and grep adapter seqs counts
             if args.zipped_files == 'Y':
                 for file in files:
                     if file.endswith('R1_001.fastq.gz'):
                         R1 = file
                     elif file.endswith('R2_001.fastq.gz'):
                         R2 = file
-                for f in [R1, R2]:
-                    for adapter in adapters:
-                        cmd = 'zgrep -c ^{} {}'.format(adapter, f)
-                        kwargs = shlex.split(cmd)
-                        print '{}__{}'.format(f, adapter_name[adapter])
-                        sp.call(kwargs)
-                    print
-                print
+                fastq_files = [R1, R2]
             else:
-                for file in files:
-                    if file.endswith('.fastq'):
-                        for adapter in adapters:
-                            cmd = 'grep -c ^{} {}'.format(adapter, file)
-                            kwargs = shlex.split(cmd)
-                            print '{}__{}'.format(file, adapter_name[adapter])
-                            sp.call(kwargs)
-                        print
-                    print
+                fastq_files = sorted(f for f in files if f.endswith('.fastq'))
+            jobs.append((root, fastq_files, adapters, args.max_offset,
+                         args.mismatches))
 
+    # Count adapters of all wells in parallel
+    pool = Pool(args.processes)
+    try:
+        for root, well_counts in pool.imap(count_well, jobs):
+            print(root)
+            for f, counts in well_counts:
+                for adapter, count in zip(adapters, counts):
+                    print('{}__{}\n{}'.format(f, ADAPTER_NAME.get(adapter, adapter),
+                                              count))
+                print('')
+            print('')
+    except (IOError, OSError, ValueError) as err:
+        sys.exit('\n{}'.format(err))
+    finally:
+        pool.close()
+        pool.join()
     return
 
 if __name__ == '__main__':
@@ -2,44 +2,38 @@
 
 """
 :Abstract: Run through multiple files and extract ancestry proportion for Chr21 from 1000
-           Genomes project files.
+           Genomes project files. Genome-wide ancestry fractions and diploid ancestry
+           states of all autosomes can also be calculated.
 :Author: Akshay Paropkari
 :Date: 03/15/2018
 """
 
 
+import io
 import os
 import sys
 import argparse
-import subprocess as sp
 from collections import defaultdict
+from multiprocessing import Pool, cpu_count
 err = []
 try:
-    import shlex
+    import numpy as np
 except ImportError:
-    err.append("shlex")
+    err.append("numpy")
 try:
     import pandas as pd
 except ImportError:
     err.append("pandas")
-try:
-    from palettable.cartocolors.qualitative import Safe_6    # 6 populations
-except ImportError:
-    err.append("palettable")
-try:
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    mpl.rc("font", family="Arial")
-    mpl.rc("xtick", labelsize=10)  # set X axis ticksize
-    mpl.rc("ytick", labelsize=10)  # set Y axis ticksize
-except ImportError:
-    err.append("matplotlib")
 try:
     assert len(err) == 0
 except AssertionError:
     for error in err:
         print("Please install {}".format(error))
     sys.exit()
+from result_io import write_results
+from vcf_kernels import parse_digits
+from ancestry_tracts import bed_columns, load_tracts, sweep_ancestry
+from plot_utils import load_pyplot
 
 
 def dir_iterator(sample_directory):
@@ -58,7 +52,74 @@ def get_variant_counts(var_file):
     return var_counts
 
 
-def get_proportion_counts(dir_struct):
+def read_bed_tracts(bed_file, chrom=21):
+    """
+    Read ancestry tracts of one chromosome from a local ancestry .bed file. Columns are
+    located and parsed for all lines at once with NumPy and the output is identical to
+    awk -F'\\t' 'BEGIN {OFS=FS} $1 == 21 {print $1, $2, $3, $4, $3 - $2}'
+
+    :type bed_file: str
+    :param bed_file: Path to tab-separated .bed file (chromosome, start, end, ancestry).
+
+    :type chrom: int
+    :param chrom: Chromosome number to keep.
+
+    :return: Output lines (bytes) with chromosome, start, end, ancestry and tract length
+             columns.
+    """
+    data, buf, field_start, field_end, not_digit = bed_columns(bed_file)
+
+    # Chromosome, start and end must be plain integers, blank lines are skipped
+    lines = np.flatnonzero(field_end[:, 3] > field_start[:, 0])
+    fs, fe = field_start[lines], field_end[lines]
+    valid = (not_digit[fe[:, 0]] == not_digit[fs[:, 0]]) & (fe[:, 0] > fs[:, 0])
+    keep = valid & (parse_digits(buf, fs[:, 0], fe[:, 0]) == chrom)
+    for k in (1, 2):
+        valid &= ~keep | ((not_digit[fe[:, k]] == not_digit[fs[:, k]]) &
+                          (fe[:, k] > fs[:, k]))
+    valid &= ~keep | (fs[:, 3] > fe[:, 2])
+    try:
+        assert valid.all()
+    except AssertionError:
+        raise ValueError("{}: line {} has fewer than four columns or a non-integer "
+                         "chromosome, start or end".format(bed_file,
+                                                           lines[np.argmin(valid)] + 1))
+    fs, fe = fs[keep], fe[keep]
+    length = parse_digits(buf, fs[:, 2], fe[:, 2]) - parse_digits(buf, fs[:, 1], fe[:, 1])
+
+    # Gather the first four columns and the tract length of all lines into one buffer
+    digits = length.astype("S20")
+    n_digits = np.char.str_len(digits)
+    head = fe[:, 3] - fs[:, 0]
+    line_end = np.cumsum(head + n_digits + 2)
+    line_start = line_end - head - n_digits - 2
+    out = np.empty(line_end[-1] if line_end.size else 0, dtype=np.uint8)
+    head_pos = np.arange(head.sum()) + np.repeat(line_start - np.cumsum(head) + head,
+                                                 head)
+    out[head_pos] = buf[head_pos + np.repeat(fs[:, 0] - line_start, head)]
+    out[line_start + head] = 9
+    in_digits = np.arange(20) < n_digits[:, None]
+    out[((line_start + head + 1)[:, None] + np.arange(20))[in_digits]] = \
+        digits.view(np.uint8).reshape(-1, 20)[in_digits]
+    out[line_end - 1] = 10
+    return out.tobytes()
+
+
+def write_genome_tracts(job):
+    """
+    Save Chr21 ancestry tracts of both haplotype .bed files of a genome.
+
+    :type job: tuple
+    :param job: Tuple of (haplotype A .bed file, haplotype B .bed file, output file).
+    """
+    file1, file2, out_file = job
+    tracts = read_bed_tracts(file1) + read_bed_tracts(file2)
+    with open(out_file, "wb") as outf:
+        outf.write(tracts)
+    return out_file
+
+
+def get_proportion_counts(dir_struct, processes=1):
     """
     Run through a folder of .bed files and collect genome proportion on ancestry data
     for Chr21.
@@ -68,9 +129,13 @@ def get_proportion_counts(dir_struct):
                 following convention:
                 ACB_bed/Sample1_A_final.bed, ACB_bed/Sample1_b_final.bed, ...
 
+    :type processes: int
+    :param processes: Number of genomes processed in parallel.
+
     :return: Data will be saved in a folder called "lai" in main directory as
              ACB_bed/lai/Sample1.txt, ACB_bed/lai/Sample2.txt, ...
     """
+    jobs = []
     for root, files in dir_struct.items():
         try:
             assert os.path.exists(os.path.join(root, "lai"))
@@ -89,19 +154,106 @@ def get_proportion_counts(dir_struct):
                 sys.exit()
             else:
                 genome = fnh1.split("_")[0]
-                in1 = "awk -F'\\t' 'BEGIN {OFS=FS} $1 == 21 {print $1, $2, $3, $4, $3 - "\
-                      "$2}' %s %s" % (file1, file2)
-                kwargs = shlex.split(in1)
-                print(in1)
-                out = sp.check_output(kwargs)
-                with open(os.path.join(output_dir, genome)+".txt", "w") as outf:
-                    outf.write(out.decode())
+                jobs.append((file1, file2, os.path.join(output_dir, genome)+".txt"))
+    pool = Pool(processes)
+    try:
+        for out_file in pool.imap_unordered(write_genome_tracts, jobs, chunksize=8):
+            print("Saved {}".format(out_file))
+    except (IOError, OSError, ValueError) as err:
+        sys.exit("\n{}".format(err))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_genome_wide_ancestry(dir_struct, output_file, processes=1):
+    """
+    Calculate ancestry fractions and diploid ancestry states of every genome for each
+    autosome and genome-wide, from the haplotype A and B .bed files of all genomes.
+
+    :type output_file: str
+    :param output_file: Save one row per genome and chromosome (and a 'genome' row per
+                        genome) to this file. Columns hold the fraction of haplotype
+                        length per ancestry (e.g. 'AFR') and the fraction of length where
+                        both haplotypes are covered per unordered diploid state (e.g.
+                        'AFR/EUR').
+    """
+    genomes = []
+    bed_pairs = []
+    for root, files in dir_struct.items():
+        for fnh1, fnh2 in zip(sorted(files)[0::2], sorted(files)[1::2]):
+            try:
+                assert fnh1.split("_")[0] == fnh2.split("_")[0]
+            except AssertionError:
+                sys.exit("ERROR! Files are not for same genome: {} {}".format(fnh1, fnh2))
+            genomes.append(fnh1.split("_")[0])
+            bed_pairs.append((os.path.join(root, fnh1), os.path.join(root, fnh2)))
+    tracts, ancestries = load_tracts(bed_pairs, processes)
+    haploid, diploid = sweep_ancestry(tracts["sample"], tracts["hap"], tracts["chrom"],
+                                      tracts["start"], tracts["end"], tracts["ancestry"],
+                                      len(genomes), len(ancestries))
+
+    # Genome-wide totals are stored in chromosome slot 0, states are made unordered
+    haploid[:, 0] = haploid[:, 1:].sum(axis=1)
+    diploid[:, 0] = diploid[:, 1:].sum(axis=1)
+    upper = np.triu_indices(len(ancestries))
+    state_len = (diploid + np.swapaxes(diploid, -1, -2))[..., upper[0], upper[1]]
+    state_len[..., upper[0] == upper[1]] /= 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        haploid_frac = haploid / haploid.sum(axis=-1, keepdims=True)
+        state_frac = state_len / state_len.sum(axis=-1, keepdims=True)
+    genome_idx, chrom_idx = np.nonzero(haploid.sum(axis=-1) > 0)
+    results = pd.DataFrame({"sample": np.asarray(genomes)[genome_idx],
+                            "chromosome": np.where(chrom_idx == 0, "genome",
+                                                   chrom_idx.astype(str))})
+    for k, anc in enumerate(ancestries):
+        results[anc] = haploid_frac[genome_idx, chrom_idx, k]
+    for k, (a, b) in enumerate(zip(*upper)):
+        results["{}/{}".format(ancestries[a], ancestries[b])] = \
+            state_frac[genome_idx, chrom_idx, k]
+    write_results(results, output_file)
+    print("Saved ancestry of {} genomes to {}".format(len(genomes), output_file))
+
+
+def read_lai_tracts(input_dir):
+    """
+    Read the Chr21 tract files of all genomes in a population's "lai" folder into a
+    single table with one parse.
+
+    :type input_dir: str
+    :param input_dir: Folder with tract files, as saved by get_proportion_counts().
+
+    :return: Tuple of (sample IDs in file order, pandas.DataFrame with sample, population
+             and difference (tract length) columns and one row per tract)
+    """
+    samples = []
+    contents = []
+    n_tracts = []
+    for root, dirs, files in os.walk(input_dir):
+        for file in files:
+            with open(os.path.join(input_dir, file), "rb") as inf:
+                data = inf.read()
+            if data and not data.endswith(b"\n"):
+                data += b"\n"
+            samples.append(file.split(".")[0])
+            contents.append(data)
+            n_tracts.append(data.count(b"\n"))
+    data = b"".join(contents)
+    if data:
+        tracts = pd.read_csv(io.BytesIO(data), sep="\t", header=None, usecols=[3, 4],
+                             names=["population", "difference"], lineterminator="\n",
+                             skip_blank_lines=False)
+    else:
+        tracts = pd.DataFrame({"population": [], "difference": []})
+    tracts.insert(0, "sample", np.repeat(samples, n_tracts))
+    return samples, tracts
 
 
 def get_plot_data(var_file, dir_struct):
     """
     Iterate through ancestry count files for each population, and save formatted local
-    ancestry data to tab-separated file.
+    ancestry data to tab-separated file. Ancestry proportions of all genomes of a
+    population are computed with a single grouped sum over all tracts.
     """
     try:
         variant_counts = get_variant_counts(var_file)
@@ -116,9 +268,7 @@ def get_plot_data(var_file, dir_struct):
             else:
                 lai_data = defaultdict(dict)
                 input_dir = os.path.join(root, "lai")
-                samples = [file.split(".")[0]
-                           for root, dirs, files in os.walk(input_dir)
-                           for file in files]
+                samples, tracts = read_lai_tracts(input_dir)
                 population = root.split("_")[0]
                 for sid in samples:
                     try:
@@ -127,23 +277,16 @@ def get_plot_data(var_file, dir_struct):
                                          "source": root.split("_")[0]}
                     except Exception as ex:
                         continue
-                for root, dirs, files in os.walk(input_dir):
-                    for file in files:
-                        fpath = os.path.join(input_dir, file)
-                        sampleid = file.split(".")[0]
-                        inf = pd.read_csv(fpath, sep="\t", header=0,
-                                          names=["genome", "start", "end",
-                                                 "population", "difference"])
-                        inf["genome"] = inf["genome"].map({21: sampleid})
-                        inf["prop"] = inf["difference"]/inf["difference"].sum()
-                        inf = inf.groupby(["population"]).sum()
-                        for row in inf.itertuples():
-                            try:
-                                lai_data[sampleid][row[0]] = row[-1]
-                            except Exception:
-                                continue
+
+                # Fraction of each genome's tract length per ancestry
+                tracts["prop"] = tracts["difference"] / \
+                    tracts.groupby("sample", sort=False)["difference"].transform("sum")
+                proportions = tracts.groupby(["sample", "population"], sort=False)\
+                    ["prop"].sum()
+                for (sampleid, ancestry), prop in proportions.items():
+                    lai_data[sampleid][ancestry] = prop
                 lai_data_df = pd.DataFrame.from_dict(lai_data, orient="index")
-                lai_data_df.to_csv("{}_plot.txt".format(root.split("_")[0]), sep="\t")
+                lai_data_df.to_csv("{}_plot.txt".format(population), sep="\t")
 
 
 def prog_options():
@@ -158,6 +301,13 @@ def prog_options():
     parser.add_argument("-gc", "--get_counts", action="store_true",
                         help="Supply this parameter to iterate through .bed files and "
                         "calculate ancestry proportion.")
+    parser.add_argument("-p", "--processes", type=int, default=cpu_count(),
+                        help="Number of genomes processed in parallel with --get_counts. "
+                        "Default is all available cores.")
+    parser.add_argument("-gw", "--genome_wide",
+                        help="Calculate ancestry fractions and diploid ancestry states "
+                        "for all autosomes of every genome from .bed files and save them "
+                        "to this file (tab-separated, .parquet or .feather).")
     parser.add_argument("-gpd", "--get_plot_data", action="store_true",
                         help="Supply this option to calculate the ancestry proportions.")
     parser.add_argument("-pd", "--plot_data", nargs='+',
@@ -205,7 +355,11 @@ def main():
 
     # Iterate through .bed files and save ancestry proportion
     if args.get_counts:
-        get_proportion_counts(dir_struct)
+        get_proportion_counts(dir_struct, args.processes)
+
+    # Genome-wide ancestry of all autosomes
+    if args.genome_wide:
+        get_genome_wide_ancestry(dir_struct, args.genome_wide, args.processes)
 
     # Get variant counts for each genome
     if args.get_plot_data:
@@ -213,6 +367,11 @@ def main():
 
     # Plot number of variants vs ancestry (NAT, AFR, EUR) per genome
     if args.plot_data:
+        mpl, plt = load_pyplot(xtick=10, ytick=10)
+        try:
+            from palettable.cartocolors.qualitative import Safe_6    # 6 populations
+        except ImportError:
+            sys.exit("Please install palettable")
         all_data = pd.DataFrame()
         colors = Safe_6.hex_colors
         pop_labels = tuple(["PEL", "MXL", "CLM", "PUR", "ASW", "ACB"])
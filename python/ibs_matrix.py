@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+:Abstract: Calculate pairwise identity-by-state (IBS0, IBS1 and IBS2 counts) between all
+           genomes for a chromosome of 1000 Genomes Project, for example to find related
+           samples before running PCA. Genotypes are packed into two bitplanes per sample
+           (heterozygous and homozygous alternate) of 64 sites per word, and all sample
+           pairs are compared with XOR/AND and popcount over blocks of sites, in row tiles
+           spread across threads.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+import gzip
+import argparse
+from time import strftime
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+err = []
+try:
+    import numpy as np
+except ImportError:
+    err.append("numpy")
+try:
+    import pandas as pd
+except ImportError:
+    err.append("pandas")
+try:
+    assert len(err) == 0
+except AssertionError:
+    for error in err:
+        sys.exit("Please install {}".format(error))
+from vcf_kernels import HET, HOM_ALT, OTHER, get_decoder, read_samples, \
+    iter_genotype_blocks
+
+try:
+    popcount = np.bitwise_count    # NumPy >= 2.0
+except AttributeError:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        """Count set bits of each uint64 word with a per-byte lookup table."""
+        counts = _POPCOUNT_TABLE[words.view(np.uint8)]
+        return counts.reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def pack_bitplane(calls):
+    """
+    Pack a (sites, samples) boolean array into a (samples, words) uint64 array holding 64
+    sites per word. Unused bits of the last word are 0.
+    """
+    packed = np.packbits(calls.T, axis=1, bitorder="little")
+    pad = -packed.shape[1] % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def ibs_tile(het, alt, row_start, row_end):
+    """
+    Count IBS0 and IBS1 sites between samples row_start:row_end and every sample from
+    row_start onwards (upper triangle of the pairwise matrix).
+
+    IBS1 sites are those where exactly one sample of a pair is heterozygous, IBS0 sites are
+    those where the samples are opposite homozygotes.
+
+    :return: Tuple of (IBS0, IBS1) count arrays of shape (tile rows, samples - row_start)
+    """
+    het_a = het[row_start:row_end, None, :]
+    alt_a = alt[row_start:row_end, None, :]
+    het_b = het[None, row_start:, :]
+    alt_b = alt[None, row_start:, :]
+    ibs1 = popcount(het_a ^ het_b).sum(axis=-1, dtype=np.uint32)
+    ref_a = ~(het_a | alt_a)
+    ref_b = ~(het_b | alt_b)
+    ibs0 = popcount((alt_a & ref_b) | (ref_a & alt_b)).sum(axis=-1, dtype=np.uint32)
+    return ibs0, ibs1
+
+
+def calc_ibs(vcff, n_samples, decode, block_size, tile_size, threads):
+    """
+    Accumulate pairwise IBS counts over all biallelic SNP sites of a VCF file. Sites with a
+    missing or non-biallelic call in any sample are skipped.
+
+    :return: Tuple of (IBS0, IBS1, IBS2, number of sites used, number of sites skipped).
+             IBS arrays are symmetric uint32 matrices of shape (n_samples, n_samples).
+    """
+    ibs0 = np.zeros((n_samples, n_samples), dtype=np.uint32)
+    ibs1 = np.zeros((n_samples, n_samples), dtype=np.uint32)
+    tiles = [(start, min(start + tile_size, n_samples))
+             for start in range(0, n_samples, tile_size)]
+    n_sites = skipped = 0
+    pool = ThreadPool(threads)
+
+    def add_tile(tile):
+        row_start, row_end = tile
+        tile_ibs0, tile_ibs1 = ibs_tile(het, alt, row_start, row_end)
+        ibs0[row_start:row_end, row_start:] += tile_ibs0
+        ibs1[row_start:row_end, row_start:] += tile_ibs1
+
+    for positions, codes in iter_genotype_blocks(vcff, n_samples, decode, block_size):
+        called = (codes < OTHER).all(axis=1)
+        skipped += codes.shape[0] - np.count_nonzero(called)
+        codes = codes[called]
+        if codes.shape[0] == 0:
+            continue
+        het = pack_bitplane(codes == HET)
+        alt = pack_bitplane(codes == HOM_ALT)
+        pool.map(add_tile, tiles)
+        n_sites += codes.shape[0]
+        print("{}: Processed {} sites".format(strftime("%d %b %Y %H:%M:%S"),
+                                              n_sites + skipped))
+    pool.close()
+    pool.join()
+
+    # Mirror upper triangle, diagonal counts are 0 for IBS0 and IBS1
+    ibs0 = np.triu(ibs0) + np.triu(ibs0, 1).T
+    ibs1 = np.triu(ibs1) + np.triu(ibs1, 1).T
+    ibs2 = n_sites - ibs0 - ibs1
+    return ibs0, ibs1, ibs2, n_sites, skipped
+
+
+def handle_program_options():
+    parser = argparse.ArgumentParser(description="Calculate pairwise identity-by-state "
+                                     "between all genomes for a chromosome of 1000 genome "
+                                     "project.")
+    parser.add_argument("-vcf", "--vcf_file", required=True,
+                        help="Path to input VCF file. [REQUIRED]")
+    parser.add_argument("-o", "--output_file", required=True,
+                        help="Save IBS0, IBS1 and IBS2 counts and IBS distance of each "
+                        "sample pair to this tab-separated file. [REQUIRED]")
+    parser.add_argument("-npz", "--matrix_file",
+                        help="Optionally, save the full IBS matrices and sample IDs to "
+                        "this NumPy .npz file.")
+    parser.add_argument("-b", "--block_size", type=int, default=1024,
+                        help="Number of sites packed and compared per block. Default is "
+                        "1024 sites.")
+    parser.add_argument("-ts", "--tile_size", type=int, default=64,
+                        help="Number of samples per row tile. Default is 64.")
+    parser.add_argument("-t", "--threads", type=int, default=cpu_count(),
+                        help="Number of threads used to process row tiles. Default is all"
+                        " available cores.")
+    parser.add_argument("-k", "--kernel", choices=["auto", "numba", "numpy"],
+                        default="auto",
+                        help="Genotype decoding backend. Default 'auto' uses Numba when "
+                        "installed and NumPy otherwise.")
+    return parser.parse_args()
+
+
+def main():
+    args = handle_program_options()
+
+    decode = get_decoder(args.kernel)
+    with gzip.open(args.vcf_file, "rb") as vcff:
+        genome_order = read_samples(vcff)
+        ibs0, ibs1, ibs2, n_sites, skipped = calc_ibs(vcff, len(genome_order), decode,
+                                                      args.block_size, args.tile_size,
+                                                      args.threads)
+    print("{} sites used, {} sites skipped due to missing or non-biallelic calls.".
+          format(n_sites, skipped))
+    try:
+        assert n_sites > 0
+    except AssertionError:
+        sys.exit("No sites available to calculate IBS.")
+
+    # Save results for every sample pair
+    if args.matrix_file:
+        np.savez_compressed(args.matrix_file, samples=np.asarray(genome_order),
+                            ibs0=ibs0, ibs1=ibs1, ibs2=ibs2)
+    first, second = np.triu_indices(len(genome_order), 1)
+    pair_data = pd.DataFrame({"sample1": np.asarray(genome_order)[first],
+                              "sample2": np.asarray(genome_order)[second],
+                              "IBS0": ibs0[first, second],
+                              "IBS1": ibs1[first, second],
+                              "IBS2": ibs2[first, second]})
+    pair_data["DST"] = (pair_data["IBS2"] + 0.5 * pair_data["IBS1"]) / n_sites
+    pair_data.to_csv(args.output_file, sep="\t", index=False)
+    print("Finished!\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+:Abstract: Run external commands of sequencing wrapper scripts (FLASh, PEAR, Skewer,
+           fastx toolkit) concurrently. The full job list of all sample folders is built
+           first and jobs are started largest input first, as long as the threads used by
+           running jobs (each job's own -t/-j value) fit in a thread budget. Every job
+           runs in its own sample folder and writes its output to its own log file.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import os
+import sys
+import time
+import subprocess as sp
+from multiprocessing import cpu_count
+
+
+def make_job(command, cwd, log_file, inputs=(), threads=1, log_header=None):
+    """
+    Describe one external command to run.
+
+    :type command: list
+    :param command: Command and its arguments, as for subprocess.
+
+    :type cwd: str
+    :param cwd: Folder the command is run in. Relative input and log file names are
+                relative to this folder.
+
+    :type log_file: str
+    :param log_file: File receiving standard output and error of the command.
+
+    :type inputs: list
+    :param inputs: Input files of the command, used to run large jobs first.
+
+    :type threads: int
+    :param threads: Number of threads used by the command (its -t/-j value).
+
+    :type log_header: str
+    :param log_header: Line written to the log file before the command output.
+
+    :return: Job dict.
+    """
+    size = 0
+    for input_file in inputs:
+        try:
+            size += os.path.getsize(os.path.join(cwd, input_file))
+        except OSError:
+            pass
+    return {"command": list(command), "cwd": cwd, "log_file": log_file,
+            "threads": max(int(threads), 1), "size": size, "log_header": log_header}
+
+
+def _start(job):
+    """Start a job with its output redirected to its log file."""
+    log = open(os.path.join(job["cwd"], job["log_file"]), "w")
+    if job["log_header"] is not None:
+        log.write("{}\n".format(job["log_header"]))
+        log.flush()
+    try:
+        proc = sp.Popen(job["command"], cwd=job["cwd"], stdout=log, stderr=sp.STDOUT)
+    except OSError:
+        log.close()
+        raise
+    return proc, log
+
+
+def run_jobs(jobs, thread_budget=None, dry_run=False, poll_interval=0.2):
+    """
+    Run jobs concurrently, largest input first, within a thread budget. A job asking for
+    more threads than the budget runs alone.
+
+    :type jobs: list
+    :param jobs: Jobs created by make_job().
+
+    :type thread_budget: int
+    :param thread_budget: Maximum number of threads of all running jobs. Default is the
+                          number of CPUs.
+
+    :type dry_run: bool
+    :param dry_run: Print commands in the order they would start, without running them.
+
+    :return: List of (job, exit code) of failed jobs. Jobs which could not be started
+             are listed with the OSError raised instead of an exit code.
+    """
+    budget = thread_budget or cpu_count()
+    pending = sorted(jobs, key=lambda job: job["size"], reverse=True)
+    if dry_run:
+        for job in pending:
+            print("{}: {}\n".format(job["cwd"], " ".join(job["command"])))
+        return []
+    running = []
+    failed = []
+    done = 0
+    while pending or running:
+        # Start the largest pending jobs fitting in the threads left
+        free = budget - sum(min(job["threads"], budget) for job, _, _ in running)
+        for job in list(pending):
+            if min(job["threads"], budget) <= free:
+                pending.remove(job)
+                try:
+                    proc, log = _start(job)
+                except OSError as oe:
+                    # Keep running the other jobs, the failure is reported at the end
+                    done += 1
+                    failed.append((job, oe))
+                    print("Finished ({}/{}): {}/{} FAILED to start".format(
+                          done, len(jobs), job["cwd"], job["log_file"]))
+                    continue
+                running.append((job, proc, log))
+                free -= min(job["threads"], budget)
+                print("Started: {}/{}".format(job["cwd"], job["log_file"]))
+        time.sleep(poll_interval)
+        for entry in list(running):
+            job, proc, log = entry
+            if proc.poll() is None:
+                continue
+            running.remove(entry)
+            log.close()
+            done += 1
+            if proc.returncode != 0:
+                failed.append((job, proc.returncode))
+            print("Finished ({}/{}): {}/{}{}".format(
+                  done, len(jobs), job["cwd"], job["log_file"],
+                  " FAILED with exit code {}".format(proc.returncode)
+                  if proc.returncode else ""))
+    return failed
+
+
+def report_failures(failed):
+    """Exit with an error listing failed jobs, if any."""
+    try:
+        assert len(failed) == 0
+    except AssertionError:
+        sys.exit("\n{} job(s) failed:\n{}".format(len(failed), "\n".join(
+                 "{} ({}), see {}".format(" ".join(job["command"]),
+                                          "exit code {}".format(code)
+                                          if isinstance(code, int) else code,
+                                          os.path.join(job["cwd"], job["log_file"]))
+                 for job, code in failed)))
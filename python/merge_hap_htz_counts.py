@@ -13,22 +13,6 @@ from os import walk
 from time import strftime
 from os.path import join
 err = []
-try:
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    mpl.rc("font", family="Arial")
-    mpl.rc("xtick", labelsize=11)  # set X axis ticksize
-    mpl.rc("ytick", labelsize=11)  # set Y axis ticksize
-except ImportError:
-    err.append("matplotlib")
-try:
-    from palettable.colorbrewer.sequential import Blues_9    # Europe
-    from palettable.colorbrewer.sequential import Greens_9   # East Asia
-    from palettable.colorbrewer.sequential import Purples_9  # South Asia
-    from palettable.colorbrewer.sequential import Reds_9     # Americas
-    from palettable.colorbrewer.sequential import YlOrBr_9   # Sub-Saharan Africa
-except ImportError:
-    err.append("palettable")
 try:
     import pandas as pd
 except ImportError:
@@ -38,6 +22,8 @@ try:
 except AssertionError:
     for error in err:
         sys.exit("Please install {}".format(error))
+from result_io import OUTPUT_FORMATS, output_path, read_results, write_results
+from plot_utils import load_pyplot, plot_style, strip_plot
 
 
 def handle_program_options():
@@ -52,6 +38,10 @@ def handle_program_options():
                         "counts for each population.")
     parser.add_argument("-s", "--savefile", help="Save the plot as an SVG file. Provide "
                         "file path and file name with extension.")
+    parser.add_argument("-of", "--output_format", choices=OUTPUT_FORMATS,
+                        default="txt",
+                        help="File format of merged counts. Default 'txt' saves a "
+                        "tab-separated file.")
     return parser.parse_args()
 
 
@@ -64,8 +54,7 @@ def main():
         for f in files:
             if "chrX" not in f:
                 try:
-                    input = pd.read_csv(join(root, f), sep="\t", index_col=None,
-                                        usecols= ["sample", "variant_counts"])
+                    input = read_results(join(root, f), ["sample", "variant_counts"])
                 except Exception as ee:
                     sys.exit("Error while reading heterozygosity counts files\n{}".
                              format(ee))
@@ -73,7 +62,7 @@ def main():
                     all_data = pd.concat([all_data, input], ignore_index=True,
                                          verify_integrity=True)
             else:
-                all_data = pd.read_csv(join(root, f), sep="\t", index_col=None)
+                all_data = read_results(join(root, f))
                 all_data = all_data.query("variant_counts != 0").dropna()
                 break
 
@@ -81,37 +70,27 @@ def main():
         assert "gender" not in all_data.columns.values
     except AssertionError:
         all_data = all_data[["sample", "variant_counts", "pop", "super_pop", "gender"]]
-        all_data.to_csv("fem_chrX_htz_counts.txt", sep="\t", index=False)
+        write_results(all_data, output_path("fem_chrX_htz_counts.txt",
+                                            args.output_format))
     else:
         all_data = all_data.groupby(["sample"]).sum()
         md_data = pd.read_csv(args.metadata, sep="\t", index_col=False,
                               usecols=[0, 1, 2, 3])
         all_data = pd.merge(all_data, md_data, on="sample")
-        all_data.to_csv("all_autosome_htz_counts.txt", sep="\t", index=False)
+        write_results(all_data, output_path("all_autosome_htz_counts.txt",
+                                            args.output_format))
 
     # Plot heterozygosity counts
     if args.plot_data:
-        colors = Blues_9.hex_colors[4:] + Greens_9.hex_colors[4:] +\
-                 Purples_9.hex_colors[4:] + Reds_9.hex_colors[2:6] +\
-                 YlOrBr_9.hex_colors[2:]
-        x_order = tuple(["FIN", "GBR", "CEU", "IBS", "TSI", "CHS", "CDX", "CHB",
-                         "JPT", "KHV", "GIH", "STU", "PJL", "ITU", "BEB", "PEL",
-                         "MXL", "CLM", "PUR", "ASW", "ACB", "GWD", "YRI", "LWK",
-                         "ESN", "MSL"])
-        assigned_colors = {a: b for a, b in zip(x_order, colors)}
-        x_order = all_data.groupby(["pop"]).mean().sort_values(by="variant_counts")
-        with mpl.style.context("seaborn-white"):
+        mpl, plt = load_pyplot()
+        # Population means and x order use all genomes, points only female genomes
+        pop_means = all_data.groupby("pop", observed=True)["variant_counts"].mean()
+        female_data = all_data.query("gender == 'female'")
+        with mpl.style.context(plot_style("seaborn-white")):
             plt.figure(figsize=(12, 6))
-            for entry in x_order.itertuples():
-                plt.scatter(entry[0], entry[1], marker="_", s=300, c="k")
-            for entry in all_data.itertuples():
-                try:
-                    assert entry[5] == "female"
-                except AssertionError:
-                    continue
-                else:
-                    plt.scatter(entry[3], entry[2], marker=".", edgecolors="face",
-                                c=assigned_colors[entry[3]])
+            strip_plot(plt.gca(), female_data["pop"], female_data["variant_counts"],
+                       order=pop_means.sort_values(kind="stable").index,
+                       centers=pop_means, edgecolors="face")
             plt.title("Heterozygosity in female individuals' chromosome X", fontsize=12)
             plt.grid(axis="y", linestyle=":")
             plt.tight_layout()
@@ -9,8 +9,8 @@ Author: Akshay Paropkari
 import sys
 import shlex
 import argparse
-import subprocess as sp
-from os import chdir, walk
+from os import walk
+from job_scheduler import make_job, run_jobs, report_failures
 
 
 def prog_options():
@@ -30,6 +30,9 @@ def prog_options():
                              "PEAR documentation. Default value is 4G (4GB).")
     parser.add_argument("-j", "--threads", default=4, type=int,
                         help="Number of threads available for usage. Default is 4.")
+    parser.add_argument("-b", "--thread_budget", type=int, default=None,
+                        help="Maximum number of threads used by all PEAR runs at once. "
+                             "Default is the number of CPUs.")
     parser.add_argument("-dr", "--dry_run", action="store_true",
                         help="Provide a dry run of the commands which will be executed "
                              "without actually executing the commands.")
@@ -39,9 +42,9 @@ def prog_options():
 def main():
     args = prog_options()
 
+    jobs = []
     for root, dirs, files in walk(args.sample_dir):
         if root != args.sample_dir:
-            chdir(root)
             print("{}".format(root))
             trimmed_list = [file for file in files if "-trimmed-" in file]
             for a, b in zip(trimmed_list[0::2], trimmed_list[1::2]):
@@ -61,13 +64,10 @@ def main():
                           format(R1, R2, output_prefix, args.min_length, args.memory,
                                  args.threads)
                     kwargs = shlex.split(in1)
-                if not args.dry_run:
-                    out = sp.check_output(kwargs)
-                    print("{}".format(out))
-                    with open("{}_pear_merge_log.txt".format(output_prefix), "w") as outl:
-                        outl.write("{}".format(out))
-                else:
-                    print("{}\n".format(" ".join(kwargs)))
+                    jobs.append(make_job(kwargs, root,
+                                         "{}_pear_merge_log.txt".format(output_prefix),
+                                         inputs=(R1, R2), threads=args.threads))
+    report_failures(run_jobs(jobs, args.thread_budget, args.dry_run))
     return
 
 
@@ -5,11 +5,13 @@ Author: Akshay Paropkari
 Date: 08/24/2016
 """
 import sys
-import math
 import argparse
-from random import uniform
 from collections import Counter
 importerrors = []
+try:
+    import numpy as np
+except:
+    importerrors.append("numpy")
 try:
     import pandas as pd
 except:
@@ -29,43 +31,33 @@ if len(importerrors) > 0:
 
 
 # Get data for plotting
-def get_plot_data(deseq_res):
+def get_plot_data(deseq_res, seed=None):
     """
     From DESeq2 results, obtain formatted data for MA plots.
 
     :type deseq_res: file handle or file path
     :param deseq_res: DESEq results file
+
+    :type seed: int
+    :param seed: Random seed for placing unique genes on the X axis.
+
+    :return: Dict of numpy arrays with x, y, color and label of each gene.
     """
-    in_data = pd.read_csv(deseq_res, sep="\t")
-    x_min, x_max = min(in_data["avgLogExpr"]), max(in_data["avgLogExpr"])
-    coord = {"x": [], "y": [], "color": [], "label": []}
-    for rows in in_data.iterrows():
-        row = rows[1]
-        try:
-            # Check if row represents unique or shared gene
-            # Unique genes will fail the assertion test
-            assert math.isnan(row["avgLogExpr"]) == False
-        except AssertionError:
-            # If avgLogExpr not given (unique genes), pick a value
-            # randomly between min and max avgLogExpr value
-            coord["x"].append(uniform(x_min, x_max))
-            coord["color"].append("#0000FF")
-            coord["y"].append(row["rLogFC"])
-            coord["label"].append("Unique Genes")
-        else:
-            # Common genes
-            coord["x"].append(row["avgLogExpr"])
-            coord["y"].append(row["rLogFC"])
-            if row["rLogFC"] > 2:
-                coord["color"].append("#FF0000")
-                coord["label"].append("Shared & >2 Log$_2$Fold Genes")
-            elif row["rLogFC"] < -2:
-                coord["color"].append("#FF0000")
-                coord["label"].append("Shared & >2 Log$_2$Fold Genes")
-            else:
-                coord["color"].append("#808080")
-                coord["label"].append("Shared Genes")
-    return coord
+    in_data = pd.read_csv(deseq_res, sep="\t", usecols=["avgLogExpr", "rLogFC"])
+    x = in_data["avgLogExpr"].values.astype(float)
+    y = in_data["rLogFC"].values.astype(float)
+
+    # Unique genes have no avgLogExpr, place them randomly between min and max
+    # avgLogExpr value
+    unique = np.isnan(x)
+    x[unique] = np.random.default_rng(seed).uniform(np.nanmin(x), np.nanmax(x),
+                                                    unique.sum())
+    conditions = [unique, (y > 2) | (y < -2)]
+    return {"x": x, "y": y,
+            "color": np.select(conditions, ["#0000FF", "#FF0000"], "#808080"),
+            "label": np.select(conditions, ["Unique Genes",
+                                            "Shared & >2 Log$_2$Fold Genes"],
+                               "Shared Genes")}
 
 
 def handle_program_options():
@@ -85,6 +77,15 @@ def handle_program_options():
                              "specified, the figure will be saved directly instead of "
                              "opening a window in which the plot can be viewed before "
                              "saving.")
+    parser.add_argument("-hb", "--hexbin", action="store_true",
+                        help="Draw shared genes as a hexagonal 2D histogram (log scaled "
+                        "counts) instead of one point per gene. Recommended for tables "
+                        "with millions of genes.")
+    parser.add_argument("-gs", "--gridsize", type=int, default=150,
+                        help="Number of hexagons along the X axis with --hexbin. Default"
+                        " is 150.")
+    parser.add_argument("-s", "--seed", type=int, default=None,
+                        help="Random seed for placing unique genes on the X axis.")
     return parser.parse_args()
 
 
@@ -92,16 +93,24 @@ def main():
     args = handle_program_options()
 
     # Get input data
-    plot_data = get_plot_data(args.deseq_result)
-    counts = Counter(plot_data["label"])
+    plot_data = get_plot_data(args.deseq_result, args.seed)
+    counts = Counter(plot_data["label"].tolist())
     print("\nUnique Genes: {}\nShared Genes: {}\nShared & >2 LFC Genes: {}\n".
           format(counts["Unique Genes"], counts["Shared Genes"],
           counts["Shared & >2 Log$_2$Fold Genes"]))
 
     # Plot input data
     plt.figure(figsize=(12, 10))
-    plt.scatter(x=plot_data["x"], y=plot_data["y"], c=plot_data["color"],
-                s=20, alpha=1, edgecolors="none")
+    # One scatter call per gene group, with no marker edges, so that each group is
+    # drawn as a single set of identical markers
+    for label in ["Shared Genes", "Unique Genes", "Shared & >2 Log$_2$Fold Genes"]:
+        group = plot_data["label"] == label
+        if args.hexbin and label == "Shared Genes":
+            plt.hexbin(plot_data["x"][group], plot_data["y"][group], bins="log",
+                       gridsize=args.gridsize, mincnt=1, cmap="Greys", linewidths=0)
+        elif group.any():
+            plt.scatter(x=plot_data["x"][group], y=plot_data["y"][group],
+                        c=plot_data["color"][group][0], s=20, alpha=1, linewidths=0)
     colors = {"Unique Genes": "#0000FF", "Shared Genes": "#808080",
               "More than 2 Log$_2$Fold": "#FF0000"}
 
@@ -5,28 +5,18 @@
 :Author: Akshay Paropkari
 """
 
+import os
 import sys
 import argparse
 from re import findall
+from multiprocessing import Pool, cpu_count
 err = []
-try:
-    import matplotlib as mpl
-    import matplotlib.pyplot as plt
-    mpl.rc("font", family="Arial")
-    mpl.rc("xtick", labelsize=11)  # set X axis ticksize
-    mpl.rc("ytick", labelsize=11)  # set Y axis ticksize
-except ImportError:
-    err.append("matplotlib")
-try:
-    from palettable.cartocolors.qualitative import Safe_6    # 6 populations
-except ImportError:
-    err.append("palettable")
 try:
     import pandas as pd
 except ImportError:
     err.append("pandas")
 try:
-    from numpy import polyfit, poly1d
+    from numpy import polyfit, poly1d, sort
 except ImportError:
     err.append("numpy")
 try:
@@ -34,6 +24,14 @@ try:
 except AssertionError:
     for error in err:
         sys.exit("Please install {}".format(error))
+from result_io import read_results
+from plot_utils import load_pyplot
+
+POP_LABELS = ("PEL", "MXL", "CLM", "PUR", "ASW", "ACB")
+# Columns of count_variants.py output files used here, in order
+VARIANT_COUNT_COLUMNS = ["sample", "pop", "super_pop", "gender", "htz_counts"]
+PANELS = (("NAT", "Native American Ancestry"), ("AFR", "African Ancestry"),
+          ("EUR", "European Ancestry"))
 
 
 def handle_program_options():
@@ -41,7 +39,8 @@ def handle_program_options():
                                      "genome vs ancestry proportion in autosomes of 1000 "
                                      "genome project.")
     parser.add_argument("main_file", nargs="+", help="Input file of non-reference counts."
-                        " Output file fom count_variants.py")
+                        " Output file fom count_variants.py (tab-separated, .parquet or "
+                        ".feather)")
     parser.add_argument("-s", "--savefile", action="store_true",
                         help="Save the plot as an SVG file. Provide file path and file "
                         "name.")
@@ -51,79 +50,115 @@ def handle_program_options():
     parser.add_argument("-g", "--gender", action="store_true",
                         help="Set this parameter if you need plot for males. Default is"
                         " False, which will not run a haploid check (required for males)")
+    parser.add_argument("-p", "--processes", type=int, default=cpu_count(),
+                        help="Number of figures rendered in parallel, each in a separate"
+                        " process. Default is the number of CPUs.")
     return parser.parse_args()
 
 
+def figure_file(vcfile, gender):
+    """Output SVG file of a variant count file and gender subset."""
+    return "ancestry_figs/{}_{}.svg".format(vcfile.split("_")[1].split("/")[1], gender)
+
+
+def plot_subset(job):
+    """
+    Plot variant counts of one gender subset vs NAT, AFR and EUR ancestry proportions
+    in a three panel figure, with a cubic polynomial fit per panel.
+
+    :type job: tuple
+    :param job: Tuple of (variant count file name, pandas.DataFrame of genomes with
+                ancestry proportions and variant counts, output SVG file).
+    """
+    vcfile, subset_data, out_file = job
+    mpl, plt = load_pyplot()
+    from palettable.cartocolors.qualitative import Safe_6    # 6 populations
+    assigned_colors = dict(zip(POP_LABELS, Safe_6.hex_colors))
+
+    # Polynomial fits are computed once per subset and ancestry
+    y = subset_data["variant_counts"].values
+    fits = {}
+    for anc, title in PANELS:
+        x = sort(subset_data[anc].values)
+        fits[anc] = (x, poly1d(polyfit(subset_data[anc].values, y, 3))(x))
+
+    fig, axarr = plt.subplots(3, figsize=(10, 15))
+    groups = [(pop, data) for pop, data in subset_data.groupby("pop", sort=False)
+              if pop in assigned_colors]
+    for (anc, title), ax in zip(PANELS, axarr):
+        for pop, data in groups:
+            ax.scatter(data[anc].values, data["variant_counts"].values, marker=".",
+                       c=assigned_colors[pop])
+        ax.plot(*fits[anc], "k-")
+        ax.set_title(title, fontdict={"fontsize": 18})
+    for ax in axarr:
+        ax.set_ylabel("Frequency of heterozygosity in chromosome {}".
+                      format(findall(r"(\d+)", vcfile.split("_")[1])[0]),
+                      fontdict={"fontsize": 12})
+        ax.grid(axis="x", linestyle=":")
+        l = [ax.scatter([], [], c=assigned_colors[lab], s=100) for lab in POP_LABELS]
+        ax.legend(l, ["{}".format(lab) for lab in POP_LABELS], fontsize=18,
+                  bbox_to_anchor=(1,1), loc="upper left", scatterpoints=3)
+    fig.tight_layout()
+    try:
+        fig.savefig(out_file, dpi=300, format="svg", bbox_inches="tight")
+    except Exception as ee:
+        raise IOError("Error while saving the image file\n{}".format(ee))
+    finally:
+        plt.close(fig)
+    return out_file
+
+
 def main():
     args = handle_program_options()
 
+    # Figures are only saved to files, so no display is needed
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    load_pyplot()
+    try:
+        import palettable
+    except ImportError:
+        sys.exit("Please install palettable")
+
+    # Local ancestry information is shared by all variant count files
+    lai_data = []
+    for infile in args.plot_ancestry:
+        try:
+            lai_data.append(pd.read_csv(infile, sep="\t", index_col=False))
+        except Exception as ex:
+            sys.exit("Error reading local ancestry information file: {}".format(ex))
+    lai_data = pd.concat(lai_data, ignore_index=True)
+
     # Plot number of variants vs ancestry (NAT, AFR, EUR) per genome
+    jobs = []
     for vcfile in args.main_file:
         try:
-            vc_data = pd.read_csv(vcfile, sep="\t", index_col=False, header=0,
-                                  names=["ID", "pop", "super_pop",
-                                         "gender", "variant_counts"])
+            vc_data = read_results(vcfile, VARIANT_COUNT_COLUMNS)
+            vc_data = vc_data.set_axis(["ID", "pop", "super_pop", "gender",
+                                        "variant_counts"], axis=1)
         except Exception as ee:
             sys.exit("Error reading variant count data file\n{}".format(ee))
         else:
-            all_data = pd.DataFrame()
-            for infile in args.plot_ancestry:
-                try:
-                    lai_data = pd.read_csv(infile, sep="\t", index_col=False)
-                except Exception as ex:
-                    sys.exit("Error reading local ancestry information file: {}".
-                             format(ex))
-                else:
-                    merged_data = pd.merge(lai_data, vc_data, on="ID")
-                    all_data = pd.concat([all_data, merged_data], ignore_index=True,
-                                         verify_integrity=True)
-            colors = Safe_6.hex_colors
-            pop_labels = tuple(["PEL", "MXL", "CLM", "PUR", "ASW", "ACB"])
-            assigned_colors = {a:b for a, b in zip(pop_labels, colors)}
-            male_data = all_data.query("gender == 'male'")       # male only data
-            female_data = all_data.query("gender == 'female'")   # female only data
-            for subset_data in [male_data, female_data]:
-                fig, axarr = plt.subplots(3, figsize=(10, 15))
-                for entry in subset_data.itertuples():
-                    try:
-                        axarr[0].scatter(entry[4], entry[9], marker=".",
-                                         c=assigned_colors[entry[6]])
-                        axarr[1].scatter(entry[2], entry[9], marker=".",
-                                         c=assigned_colors[entry[6]])
-                        axarr[2].scatter(entry[3], entry[9], marker=".",
-                                         c=assigned_colors[entry[6]])
-                    except Exception:
-                        continue
-                for anc, ax in zip(["NAT", "AFR", "EUR"], axarr):
-                    x = subset_data[anc].values
-                    y = subset_data["variant_counts"]
-                    z = polyfit(x, y, 3)
-                    p = poly1d(z)
-                    ax.plot(sorted(x), p(sorted(x)), "k-")
-                axarr[0].set_title("Native American Ancestry", fontdict={"fontsize": 18})
-                axarr[1].set_title("African Ancestry", fontdict={"fontsize": 18})
-                axarr[2].set_title("European Ancestry", fontdict={"fontsize": 18})
-                for ax in axarr:
-                    ax.set_ylabel("Frequency of heterozygosity in chromosome {}".
-                                  format(findall(r"(\d+)", vcfile.split("_")[1])[0]),
-                                  fontdict={"fontsize": 12})
-                    ax.grid(axis="x", linestyle=":")
-                    l = [plt.scatter([], [], c=assigned_colors[lab], s=100)
-                         for lab in pop_labels]
-                    ax.legend(l, ["{}".format(lab) for lab in pop_labels], fontsize=18,
-                              bbox_to_anchor=(1,1), loc="upper left", scatterpoints=3)
-                plt.tight_layout()
-                try:
-                    if subset_data["gender"].values[0] == "male":
-                        plt.savefig("ancestry_figs/{}_male.svg".
-                                    format(vcfile.split("_")[1].split("/")[1]),
-                                    dpi=300, format="svg", bbox_inches="tight")
-                    else:
-                        plt.savefig("ancestry_figs/{}_female.svg".
-                                    format(vcfile.split("_")[1].split("/")[1]),
-                                    dpi=300, format="svg", bbox_inches="tight")
-                except Exception as ee:
-                    sys.exit("Error while saving the image file\n{}".format(ee))
+            all_data = pd.merge(lai_data, vc_data, on="ID")
+            for gender in ["male", "female"]:
+                subset_data = all_data[all_data["gender"] == gender]
+                if len(subset_data):
+                    jobs.append((vcfile, subset_data, figure_file(vcfile, gender)))
+    try:
+        processes = min(args.processes, len(jobs))
+        if processes > 1:
+            pool = Pool(processes)
+            try:
+                for out_file in pool.imap_unordered(plot_subset, jobs):
+                    print("Saved {}".format(out_file))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for job in jobs:
+                print("Saved {}".format(plot_subset(job)))
+    except IOError as ioe:
+        sys.exit(ioe)
 
 
 if __name__ == "__main__":
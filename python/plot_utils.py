@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+:Abstract: Shared plotting helpers for per-genome results of 1000 Genomes Project:
+           population order and colors, and a strip plot which draws all genomes of a
+           population with one scatter call and all population means or medians with
+           one more call, instead of one artist per genome. matplotlib and palettable are
+           only imported when a plot is made, with a headless backend if needed.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import os
+import sys
+err = []
+try:
+    import numpy as np
+except ImportError:
+    err.append("numpy")
+try:
+    import pandas as pd
+except ImportError:
+    err.append("pandas")
+try:
+    assert len(err) == 0
+except AssertionError:
+    for error in err:
+        sys.exit("Please install {}".format(error))
+
+# 1000 Genomes Project populations, grouped by super population
+POPULATIONS = ("FIN", "GBR", "CEU", "IBS", "TSI", "CHS", "CDX", "CHB", "JPT", "KHV",
+               "GIH", "STU", "PJL", "ITU", "BEB", "PEL", "MXL", "CLM", "PUR", "ASW",
+               "ACB", "GWD", "YRI", "LWK", "ESN", "MSL")
+
+
+def has_display():
+    """Check if an interactive matplotlib backend can open windows."""
+    if sys.platform.startswith("linux"):
+        return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+    return True
+
+
+def load_pyplot(xtick=11, ytick=11):
+    """
+    Import matplotlib when a plot is requested, so that counting runs do not pay for it.
+    The non-interactive Agg backend is used when no display is available, unless a
+    backend is set with the MPLBACKEND environment variable.
+
+    :type xtick: float
+    :param xtick: X axis tick label size.
+
+    :type ytick: float
+    :param ytick: Y axis tick label size.
+
+    :return: Tuple of (matplotlib, matplotlib.pyplot) modules.
+    """
+    try:
+        import matplotlib as mpl
+    except ImportError:
+        sys.exit("Please install matplotlib")
+    if not os.environ.get("MPLBACKEND") and not has_display():
+        mpl.use("Agg")
+    import matplotlib.pyplot as plt
+    mpl.rc("font", family="Arial")
+    mpl.rc("xtick", labelsize=xtick)  # set X axis ticksize
+    mpl.rc("ytick", labelsize=ytick)  # set Y axis ticksize
+    return mpl, plt
+
+
+def population_colors():
+    """Return a dict of colors of all 1000 Genomes Project populations."""
+    try:
+        from palettable.colorbrewer.sequential import Blues_9    # Europe
+        from palettable.colorbrewer.sequential import Greens_9   # East Asia
+        from palettable.colorbrewer.sequential import Purples_9  # South Asia
+        from palettable.colorbrewer.sequential import Reds_9     # Americas
+        from palettable.colorbrewer.sequential import YlOrBr_9   # Sub-Saharan Africa
+    except ImportError:
+        sys.exit("Please install palettable")
+    return dict(zip(POPULATIONS, Blues_9.hex_colors[4:] + Greens_9.hex_colors[4:] +
+                    Purples_9.hex_colors[4:] + Reds_9.hex_colors[2:6] +
+                    YlOrBr_9.hex_colors[2:]))
+
+
+def plot_style(name="seaborn-white"):
+    """Return a matplotlib style name, using the renamed seaborn styles if needed."""
+    import matplotlib.pyplot as plt
+    if name in plt.style.available:
+        return name
+    return name.replace("seaborn", "seaborn-v0_8", 1)
+
+
+def strip_plot(ax, categories, values, order=None, colors=None,
+               center="mean", center_color="k", jitter=0, seed=None, centers=None,
+               **kwargs):
+    """
+    Draw values of all genomes grouped by category (e.g. population) at categorical x
+    positions, with a bar at the mean or median of every category.
+
+    :type ax: matplotlib.axes.Axes
+    :param ax: Axes to draw on.
+
+    :type categories: array-like
+    :param categories: Category of each genome.
+
+    :type values: array-like
+    :param values: Value of each genome.
+
+    :type order: list
+    :param order: Categories in x axis order. Genomes of other categories are not drawn.
+                  Default orders categories by increasing center value.
+
+    :type colors: dict or str
+    :param colors: Color of each category, or one color for all categories. Default is
+                   population_colors().
+
+    :type center: str
+    :param center: 'mean', 'median' or None to draw no bars.
+
+    :type centers: pandas.Series
+    :param centers: Bar value of each category, e.g. computed from more genomes than
+                    are drawn. Default computes the centers of the drawn values.
+
+    :type jitter: float
+    :param jitter: Spread points of a category uniformly within +/- jitter around its x
+                   position. Default draws points on the x position.
+
+    :param kwargs: Passed on to Axes.scatter() for genome points, e.g. marker.
+
+    :return: List of categories in x axis order.
+    """
+    data = pd.DataFrame({"category": np.asarray(categories).astype(str),
+                         "value": np.asarray(values, dtype=float)})
+    if centers is None:
+        centers = data.groupby("category")["value"].agg(center or "mean")
+    else:
+        centers = pd.Series(np.asarray(centers, dtype=float),
+                            index=np.asarray(centers.index).astype(str))
+    if order is None:
+        order = centers.sort_values(kind="stable").index.tolist()
+    order = list(order)
+    x = pd.Categorical(data["category"], categories=order).codes
+    data = data.assign(x=x.astype(float))[x >= 0]
+    if jitter:
+        data["x"] += np.random.default_rng(seed).uniform(-jitter, jitter, len(data))
+    if center:
+        ax.scatter(np.arange(len(order)), centers.reindex(order).values, marker="_",
+                   s=300, c=center_color)
+    if colors is None:
+        colors = population_colors()
+    kwargs.setdefault("marker", ".")
+    for category, group in data.groupby("category", sort=False):
+        color = colors if isinstance(colors, str) else colors.get(category, "grey")
+        ax.scatter(group["x"].values, group["value"].values, c=color, label=category,
+                   **kwargs)
+    ax.set_xticks(np.arange(len(order)))
+    ax.set_xticklabels(order)
+    ax.set_xlim(-0.5, len(order) - 0.5)
+    return order
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+:Abstract: Read and write per-genome result tables (e.g. heterozygosity counts joined
+           with population metadata) shared between counting and plotting scripts of the
+           1000 Genomes Project analysis. The file format is chosen by file extension:
+           .parquet and .feather (or .arrow) files are written as typed, columnar files
+           via pyarrow and can be read column-projected; any other extension is written
+           as a tab-separated file.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+from os.path import splitext
+try:
+    import pandas as pd
+except ImportError:
+    sys.exit("Please install pandas")
+
+COLUMNAR_FORMATS = {".parquet": "parquet", ".feather": "feather", ".arrow": "feather"}
+OUTPUT_FORMATS = ("txt", "parquet", "feather")    # choices of -of/--output_format
+CATEGORICAL_COLUMNS = ("pop", "super_pop", "gender", "population")
+
+
+def result_format(file_path):
+    """Return 'parquet', 'feather' or 'tsv' depending on the file extension."""
+    return COLUMNAR_FORMATS.get(splitext(file_path)[1].lower(), "tsv")
+
+
+def output_path(output_file, output_format=None):
+    """
+    Return output_file with the extension of output_format ('txt', 'parquet' or
+    'feather'). Default (None) keeps output_file, whose extension selects the format.
+    """
+    if output_format is None or result_format(output_file) == \
+            result_format("results." + output_format):
+        return output_file
+    return splitext(output_file)[0] + "." + output_format
+
+
+def write_results(data, output_file):
+    """
+    Save a result table. Metadata columns are stored as categoricals in columnar files.
+
+    :type data: pandas.DataFrame
+    :param data: Result table with one row per genome. The index is not saved.
+
+    :type output_file: str
+    :param output_file: Output file path. Extension selects the file format.
+    """
+    fmt = result_format(output_file)
+    if fmt == "tsv":
+        data.to_csv(output_file, sep="\t", index=False)
+        return
+    data = data.reset_index(drop=True)
+    for col in CATEGORICAL_COLUMNS:
+        if col in data.columns:
+            data[col] = data[col].astype("category")
+    try:
+        if fmt == "parquet":
+            data.to_parquet(output_file, index=False)
+        else:
+            data.to_feather(output_file)
+    except ImportError:
+        sys.exit("Please install pyarrow to save {} files".format(fmt))
+
+
+def read_results(input_file, columns=None):
+    """
+    Load a result table saved with write_results() or a tab-separated file.
+
+    :type columns: list
+    :param columns: Load only these columns. Columnar files only read these columns from
+                    disk. Default loads all columns.
+
+    :return: pandas.DataFrame, with columns in the requested order
+    """
+    fmt = result_format(input_file)
+    try:
+        if fmt == "tsv":
+            data = pd.read_csv(input_file, sep="\t", index_col=False, usecols=columns)
+        elif fmt == "parquet":
+            data = pd.read_parquet(input_file, columns=columns)
+        else:
+            data = pd.read_feather(input_file, columns=columns)
+    except ImportError:
+        sys.exit("Please install pyarrow to read {} files".format(fmt))
+    return data if columns is None else data[list(columns)]
@@ -10,14 +10,13 @@ Author: Akshay Paropkari
 
 import sys
 import argparse
-from os import chdir, walk
-import subprocess as sp
-from os.path import join, relpath
+from os import walk
 try:
     import shlex
 except ImportError as ie:
     sys.exit("Please install {} module before executing this script."
              .format(ie))
+from job_scheduler import make_job, run_jobs, report_failures
 
 
 def prog_options():
@@ -27,29 +26,37 @@ def prog_options():
                             "files.")
     parser.add_argument("sample_dir",
                         help="Directory containing sample folders.")
+    parser.add_argument("-t", "--threads", type=int, default=2,
+                        help="Number of threads used by each FLASh run. Default is 2.")
+    parser.add_argument("-b", "--thread_budget", type=int, default=None,
+                        help="Maximum number of threads used by all FLASh runs at "
+                             "once. Default is the number of CPUs.")
+    parser.add_argument("-dr", "--dry_run", action="store_true",
+                        help="Provide a dry run of the commands which will be executed "
+                             "without actually executing the commands.")
     return parser.parse_args()
 
 
 def main():
     args = prog_options()
 
+    jobs = []
     for root, dirs, files in walk(args.sample_dir):
         if root != args.sample_dir:
-            chdir(root)
-            print root.split("/")[-1]
+            print(root.split("/")[-1])
 
             for file in files:
                 if file.endswith("R1_001.fastq.gz"):
                     R1 = file
                 elif file.endswith("R2_001.fastq.gz"):
                     R2 = file
-            in1 = "flash {} {} -M 300 --cap-mismatch-quals".format(R1, R2)
+            in1 = "flash {} {} -M 300 --cap-mismatch-quals -t {}".format(R1, R2,
+                                                                        args.threads)
             kwargs = shlex.split(in1)
-            print kwargs
-            out = sp.check_output(kwargs)
-            print out
-            with open("flash_log.txt", "w") as outlog:
-                outlog.write("{}".format(out))
+            print(kwargs)
+            jobs.append(make_job(kwargs, root, "flash_log.txt", inputs=(R1, R2),
+                                 threads=args.threads))
+    report_failures(run_jobs(jobs, args.thread_budget, args.dry_run))
     return
 
 
@@ -2,8 +2,9 @@
 
 """
 Abstract: Iterate through all folders and execute quality filtering on
-          merged-trimmed fastq files. filtering is achieved through Fastx-
-          Toolkit. For more information, visit:
+          merged-trimmed fastq files. Filtering follows fastq_quality_filter of
+          Fastx-Toolkit, with quality scores of a chunk of reads compared at once.
+          For more information, visit:
           http://hannonlab.cshl.edu/fastx_toolkit/index.html
 
 Date: 10/06/2015
@@ -15,19 +16,15 @@ Author: Akshay Paropkari
 import sys
 import argparse
 from os import walk
-import subprocess as sp
-from os.path import join, relpath
-try:
-    import shlex
-except ImportError as ie:
-    sys.exit("Please install {} module before executing this script."
-             .format(ie))
+from os.path import join
+from multiprocessing import Pool, cpu_count
+from fastq_utils import quality_filter, filter_report
 
 
 def prog_options():
     parser = argparse.ArgumentParser(
                 description="Iterate through each folder in a file and run "
-                            "fastx quality filtering on each merged-trimmed "
+                            "quality filtering on each merged-trimmed "
                             "fastq file. The output stats are written to "
                             "STDOUT and saved in text file.")
     parser.add_argument("sample_dir",
@@ -38,16 +35,46 @@ def prog_options():
     parser.add_argument("-p", "--min_base_pct", type=int, default="90",
                         help="Specify the minimum percent of bases with '-q' "
                              "quality scores. Default is 90 percent.")
+    parser.add_argument("-Q", "--phred_offset", type=int, default=33,
+                        help="ASCII offset of quality scores. Default is 33 (Sanger, "
+                             "Illumina 1.8+).")
+    parser.add_argument("-b", "--thread_budget", type=int, default=None,
+                        help="Maximum number of files filtered at once. Default is the "
+                             "number of CPUs.")
     return parser.parse_args()
 
 
+def filter_file(job):
+    """
+    Quality filter one fastq file and save the filter statistics.
+
+    :type job: tuple
+    :param job: Tuple of (folder, input fastq file, output name, minimum quality score,
+                minimum percent of bases, phred offset)
+
+    :return: Filter statistics, preceded by output name.
+    """
+    root, file, fname, min_qual, min_pct, phred_offset = job
+    try:
+        n_input, n_kept = quality_filter(join(root, file),
+                                         join(root, fname + "_qual_fil.fastq"),
+                                         min_qual, min_pct, phred_offset)
+    except ValueError as ve:
+        raise ValueError("Error filtering {}: {}".format(join(root, file), ve))
+    out = "{}\n{}".format(fname, filter_report(min_qual, min_pct, n_input, n_kept))
+    with open(join(root, fname + "_qual_fil.txt"), "w") as fo:
+        fo.write(out)
+    return out
+
+
 def main():
     args = prog_options()
 
 # Iterate through all directories and access their files
+    jobs = []
     for root, dirs, files in walk(args.sample_dir):
         if root != args.sample_dir:
-            print root
+            print(root)
 
 # Map primer names to their 16S regions
             gene_region = {"519R": "V1-V3", "806R": "V4-V5"}
@@ -57,17 +84,17 @@ def main():
                 if file.endswith("R-assigned-01.fastq"):
                     fname = file.split("_")[0] + "_" +\
                             gene_region[file.split("_")[1][:4]]
-                    cmd = "fastq_quality_filter -v -q {} -p {} -i {} "\
-                          "-o {}_qual_fil.fastq"\
-                          .format(args.min_qual_score, args.min_base_pct,
-                                  relpath(join(root, file)),
-                                  relpath(join(root, fname)))
-                    kwargs = shlex.split(cmd)
-                    print kwargs, "\n"
-                    out = sp.check_output(kwargs)
-                    print out
-                    with open(relpath(join(root, fname+"_qual_fil.txt")), "w")as fo:
-                        fo.write("{}\n{}".format(fname, out))
+                    jobs.append((root, file, fname, args.min_qual_score,
+                                 args.min_base_pct, args.phred_offset))
+    pool = Pool(args.thread_budget or cpu_count())
+    try:
+        for out in pool.imap_unordered(filter_file, jobs):
+            print(out)
+    except ValueError as ve:
+        sys.exit(ve)
+    finally:
+        pool.close()
+        pool.join()
     return
 
 if __name__ == "__main__":
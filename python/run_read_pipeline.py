@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+"""
+Abstract: Iterate through all folders and run 5'-end adapter demultiplexing, read
+          merging with FLASh and quality filtering of each well as one streaming
+          pipeline. Read pairs of every sample and region are piped from the
+          demultiplexer to their own FLASh process, and merged reads are quality
+          filtered as they leave FLASh, so only quality filtered reads are written to
+          disk. Each stage still saves its statistics: demultiplex_log.txt,
+          <sample>_<region>_flash_log.txt and <sample>_<region>_qual_fil.txt
+Date: 10/19/2026
+Author: Akshay Paropkari
+"""
+
+import os
+import sys
+import argparse
+import threading
+import subprocess as sp
+from csv import DictReader
+from multiprocessing import Pool
+from fastq_utils import demultiplex_pairs, quality_filter, filter_report, well_combos
+
+
+def filter_stage(stream, output_file, results, name, min_qual, min_pct, phred_offset):
+    """Quality filter merged reads read from a pipe, saving counts in results[name]."""
+    try:
+        results[name] = quality_filter(stream, output_file, min_qual, min_pct,
+                                       phred_offset)
+    except Exception as ex:
+        results[name] = ex
+        stream.close()    # unblock FLASh
+
+
+def run_well(job):
+    """
+    Demultiplex, merge and quality filter the reads of one well.
+
+    :type job: tuple
+    :param job: Tuple of (well folder, R1 file, R2 file, list of (output prefix, forward
+                adapter, reverse adapter), argparse.Namespace of options)
+
+    :return: Tuple of (well folder, list of (output prefix, trimmed read pairs, merged
+             reads, quality filtered reads), dict of demultiplexing counts)
+    """
+    root, R1_file, R2_file, combos, args = job
+    flash = ["flash", "--interleaved-input", "-", "--to-stdout", "-M",
+             str(args.max_overlap), "--cap-mismatch-quals", "-t", str(args.threads)]
+    procs = []
+    threads = []
+    results = {}
+    counts = None
+    input_error = None
+    try:
+        for prefix, _, _ in combos:
+            log = open(os.path.join(root, prefix + "_flash_log.txt"), "wb")
+            proc = sp.Popen(flash, cwd=root, stdin=sp.PIPE, stdout=sp.PIPE, stderr=log,
+                            bufsize=1 << 20)
+            procs.append((proc, log))
+            thread = threading.Thread(target=filter_stage, args=(
+                     proc.stdout, os.path.join(root, prefix + "_qual_fil.fastq"),
+                     results, prefix, args.min_qual_score, args.min_base_pct,
+                     args.phred_offset))
+            thread.start()
+            threads.append(thread)
+        # Both reads of a pair go to the same FLASh process, interleaved
+        try:
+            counts = demultiplex_pairs(os.path.join(root, R1_file),
+                                       os.path.join(root, R2_file), combos,
+                                       [(proc.stdin, proc.stdin) for proc, _ in procs],
+                                       200, 25, args.mismatches)
+        except BrokenPipeError:
+            pass    # a FLASh process exited early, reported below
+        except (IOError, OSError, ValueError) as err:
+            input_error = RuntimeError("Error reading {} and {}: {}".format(
+                                       os.path.join(root, R1_file),
+                                       os.path.join(root, R2_file), err))
+    finally:
+        for proc, _ in procs:
+            try:
+                proc.stdin.close()
+            except (IOError, OSError):
+                pass
+        for thread in threads:
+            thread.join()
+        for proc, log in procs:
+            proc.wait()
+            log.close()
+    if input_error is not None:
+        raise input_error
+    for (prefix, _, _), (proc, _) in zip(combos, procs):
+        error = results.get(prefix)
+        if proc.returncode or isinstance(error, Exception):
+            raise RuntimeError("Error merging or filtering {}, see {}\n{}".format(
+                               prefix, os.path.join(root, prefix + "_flash_log.txt"),
+                               error if isinstance(error, Exception) else ""))
+    try:
+        assert counts is not None
+    except AssertionError:
+        raise RuntimeError("Error piping reads of {} to FLASh".format(root))
+    with open(os.path.join(root, "demultiplex_log.txt"), "w") as logf:
+        for name, count in counts.items():
+            logf.write("{}\t{}\n".format(name, count))
+
+    summary = []
+    for prefix, _, _ in combos:
+        n_merged, n_kept = results[prefix]
+        with open(os.path.join(root, prefix + "_qual_fil.txt"), "w") as fo:
+            fo.write("{}\n{}".format(prefix, filter_report(
+                     args.min_qual_score, args.min_base_pct, n_merged, n_kept)))
+        summary.append((prefix, counts[prefix], n_merged, n_kept))
+    return root, summary, counts
+
+
+def prog_options():
+    parser = argparse.ArgumentParser(
+                description="Iterate through each folder in a file and demultiplex, "
+                            "merge (FLASh) and quality filter reads in one streaming "
+                            "pipeline, without writing intermediate fastq files. Read "
+                            "pairs are demultiplexed as trim_five_prime_end_adapters.py "
+                            "-e python, merged as run_merge_cmd.py and filtered as "
+                            "run_qual_filter_cmd.py.")
+    parser.add_argument("sample_dir", help="Directory containing sample folders.")
+    parser.add_argument("ap_map",
+                        help="Path to tab-delimited file containing adapter-primer pair "
+                             "per line. Reverse primer adapters must be reverse "
+                             "complemented entries.")
+    parser.add_argument("ws_map",
+                        help="Path to tab-separated sample ID to adapter mapping file. A "
+                             "'NA' must be used for empty cells. Format of the file: well"
+                             "->sampleid->adapters")
+    parser.add_argument("-mm", "--mismatches", type=int, default=1,
+                        help="Number of mismatches tolerated per adapter. Default is 1.")
+    parser.add_argument("-M", "--max_overlap", type=int, default=300,
+                        help="Maximum overlap length expected by FLASh. Default is 300.")
+    parser.add_argument("-t", "--threads", type=int, default=2,
+                        help="Number of threads used by each FLASh run. Default is 2.")
+    parser.add_argument("-q", "--min_qual_score", type=int, default=20,
+                        help="Specify the minimum quality score to keep. Default is Q20.")
+    parser.add_argument("-p", "--min_base_pct", type=int, default=90,
+                        help="Specify the minimum percent of bases with '-q' quality "
+                             "scores. Default is 90 percent.")
+    parser.add_argument("-Q", "--phred_offset", type=int, default=33,
+                        help="ASCII offset of quality scores. Default is 33.")
+    parser.add_argument("-w", "--wells", type=int, default=1,
+                        help="Number of wells processed at once. Each well runs one "
+                             "FLASh process per sample and region. Default is 1.")
+    return parser.parse_args()
+
+
+def main():
+    args = prog_options()
+
+    # Checking the necessary input arguments for validity.
+    for map_file, name in ((args.ap_map, "adapter"),
+                           (args.ws_map, "well-to-sampleID mapping")):
+        try:
+            with open(map_file):
+                pass
+        except IOError as ioe:
+            sys.exit("\nError with the {} file: {}\n".format(name, ioe))
+
+    # Read adapter sequences from file
+    with open(args.ap_map) as apf:
+        adapters = {line.strip().split("\t")[1]: line.strip().split("\t")[0]
+                    for line in apf.readlines()[1:]}
+
+    # Read mapping file data
+    with open(args.ws_map) as csvf:
+        map_data = [line for line in DictReader(csvf, delimiter="\t")]
+
+    # Collect samples and regions of every well
+    jobs = []
+    for root, dirs, files in os.walk(args.sample_dir):
+        if root != args.sample_dir:
+            R1_file = R2_file = None
+            for file in files:
+                if file.endswith("R1_001.fastq.gz"):
+                    R1_file = file
+                elif file.endswith("R2_001.fastq.gz"):
+                    R2_file = file
+            well = root.split("/")[-1].split("-")[0]
+            combos = [combo for sample in map_data if sample["well"] == well
+                      for combo in well_combos(sample)]
+            if R1_file and R2_file and combos:
+                for prefix, fwd, _ in combos:
+                    print("Well: {} | Primer: {} | SampleID: {}".format(
+                          well, adapters.get(fwd, fwd), prefix))
+                jobs.append((root, R1_file, R2_file, combos, args))
+
+    # Run wells, each as one pipeline
+    pool = Pool(args.wells)
+    try:
+        for root, summary, counts in pool.imap_unordered(run_well, jobs):
+            print("\n{}\nunassigned\t{}\nambiguous\t{}\nfiltered\t{}".format(
+                  root, counts["unassigned"], counts["ambiguous"], counts["filtered"]))
+            print("Sample\tTrimmed pairs\tMerged reads\tQuality filtered reads")
+            for row in summary:
+                print("\t".join(str(x) for x in row))
+    except (RuntimeError, IOError, OSError, ValueError) as err:
+        sys.exit("\n{}".format(err))
+    finally:
+        pool.close()
+        pool.join()
+    return
+
+
+if __name__ == "__main__":
+    sys.exit(main())
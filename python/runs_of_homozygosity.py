@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+:Abstract: Call runs of homozygosity (ROH) per genome for a chromosome of 1000 Genomes
+           Project. Genotypes are decoded in blocks of sites and heterozygous sites of all
+           samples are collected in a single pass over the VCF file. Runs are then
+           detected for all samples at once with vectorized run-length encoding.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+import gzip
+import argparse
+from time import strftime
+err = []
+try:
+    import numpy as np
+except ImportError:
+    err.append("numpy")
+try:
+    import pandas as pd
+except ImportError:
+    err.append("pandas")
+try:
+    assert len(err) == 0
+except AssertionError:
+    for error in err:
+        sys.exit("Please install {}".format(error))
+from vcf_kernels import HET, get_decoder, read_samples, iter_genotype_blocks
+
+
+def collect_het_sites(vcff, n_samples, decode, block_size):
+    """
+    Decode the VCF file in blocks of sites and collect heterozygous calls.
+
+    :return: Tuple of (positions, het_samples, het_sites). positions holds coordinates
+             of all biallelic SNP sites, het_samples and het_sites hold the sample and
+             site index of every heterozygous call, sorted by sample and then by site.
+    """
+    positions = []
+    het_samples = []
+    het_sites = []
+    n_sites = 0
+    for block_pos, block_codes in iter_genotype_blocks(vcff, n_samples, decode,
+                                                      block_size):
+        # transposed block gives (sample, site) pairs already ordered by sample
+        samples, sites = np.nonzero(block_codes.T == HET)
+        het_samples.append(samples.astype(np.int32))
+        het_sites.append(sites.astype(np.int64) + n_sites)
+        positions.append(block_pos)
+        n_sites += block_pos.size
+        print("{}: Processed {} sites".format(strftime("%d %b %Y %H:%M:%S"), n_sites))
+    try:
+        assert n_sites > 0
+    except AssertionError:
+        sys.exit("No biallelic SNP sites found in VCF file.")
+    het_samples = np.concatenate(het_samples)
+    het_sites = np.concatenate(het_sites)
+    order = np.argsort(het_samples, kind="stable")
+    return np.concatenate(positions), het_samples[order], het_sites[order]
+
+
+def call_roh(positions, het_samples, het_sites, n_samples, min_length, min_snps,
+             allowed_hets):
+    """
+    Find runs of homozygosity for all samples at once. A site belongs to a run if it is
+    covered by a stretch of consecutive sites containing at most allowed_hets
+    heterozygous calls which spans at least min_length bp and min_snps sites.
+    Overlapping or adjacent stretches are merged into one run. Missing calls do not
+    break runs.
+
+    :type positions: numpy.ndarray
+    :param positions: Coordinates of all sites, as returned by collect_het_sites().
+
+    :type het_samples: numpy.ndarray
+    :param het_samples: Sample index of heterozygous calls, sorted by sample.
+
+    :type het_sites: numpy.ndarray
+    :param het_sites: Site index of heterozygous calls, sorted by site within sample.
+
+    :type n_samples: int
+    :param n_samples: Number of samples in the VCF file.
+
+    :type min_length: int
+    :param min_length: Minimum length of a run in base pairs.
+
+    :type min_snps: int
+    :param min_snps: Minimum number of sites in a run.
+
+    :type allowed_hets: int
+    :param allowed_hets: Number of heterozygous calls allowed within a run.
+
+    :return: Dict of numpy arrays with keys 'sample', 'start', 'end' (first and last site
+             index of each run) and 'n_het'.
+    """
+    n_sites = positions.size
+    het_counts = np.bincount(het_samples, minlength=n_samples)
+
+    # Per-sample het site lists, bracketed with sentinel sites -1 and n_sites
+    row_len = het_counts + 2
+    row_start = np.cumsum(row_len) - row_len
+    bounds = np.empty(row_len.sum(), dtype=np.int64)
+    bounds_sample = np.repeat(np.arange(n_samples), row_len)
+    bounds[row_start] = -1
+    bounds[row_start + row_len - 1] = n_sites
+    het_first = np.cumsum(het_counts) - het_counts
+    het_rank = np.arange(het_sites.size) - het_first[het_samples]
+    bounds[row_start[het_samples] + 1 + het_rank] = het_sites
+
+    # Candidate stretch between het j and het j + allowed_hets + 1 of the same sample
+    row_last = (row_start + row_len - 1)[bounds_sample]
+    first = np.flatnonzero(np.arange(bounds.size) < row_last)
+    last = np.minimum(first + allowed_hets + 1, row_last[first])
+    start = bounds[first] + 1
+    end = bounds[last] - 1
+    sample = bounds_sample[first]
+    keep = end >= start
+    start, end, sample = start[keep], end[keep], sample[keep]
+    keep = ((end - start + 1 >= min_snps) &
+            (positions[end] - positions[start] + 1 >= min_length))
+    start, end, sample = start[keep], end[keep], sample[keep]
+    if start.size == 0:
+        return {"sample": sample, "start": start, "end": end, "n_het": start}
+
+    # Merge overlapping or adjacent stretches per sample. Keys offset by sample keep
+    # them increasing across samples.
+    start_key = sample * (n_sites + 1) + start
+    end_key = np.maximum.accumulate(sample * (n_sites + 1) + end)
+    new_run = np.ones(start.size, dtype=bool)
+    new_run[1:] = start_key[1:] > end_key[:-1] + 1
+    run_first = np.flatnonzero(new_run)
+    run_last = np.append(run_first[1:], start.size) - 1
+    run_sample = sample[run_first]
+    run_start = start[run_first]
+    run_end = end_key[run_last] - run_sample * (n_sites + 1)
+
+    # Heterozygous calls within each run
+    het_key = het_samples.astype(np.int64) * (n_sites + 1) + het_sites
+    n_het = (np.searchsorted(het_key, run_sample * (n_sites + 1) + run_end, "right") -
+             np.searchsorted(het_key, run_sample * (n_sites + 1) + run_start, "left"))
+    return {"sample": run_sample, "start": run_start, "end": run_end, "n_het": n_het}
+
+
+def handle_program_options():
+    parser = argparse.ArgumentParser(description="Call runs of homozygosity per genome "
+                                     "for a chromosome of 1000 genome project.")
+    parser.add_argument("-vcf", "--vcf_file", required=True,
+                        help="Path to input VCF file. [REQUIRED]")
+    parser.add_argument("-md", "--map_fp",
+                        help="Metadata mapping file corresponding to VCF file. If "
+                        "supplied, population, super population and gender columns are "
+                        "added to the totals output.")
+    parser.add_argument("-l", "--min_length", type=float, default=1000,
+                        help="Minimum length of a run of homozygosity in kb. Default is "
+                        "1000 kb.")
+    parser.add_argument("-n", "--min_snps", type=int, default=100,
+                        help="Minimum number of SNPs in a run of homozygosity. Default is"
+                        " 100.")
+    parser.add_argument("-het", "--allowed_hets", type=int, default=1,
+                        help="Number of heterozygous calls allowed within a run of "
+                        "homozygosity. Default is 1.")
+    parser.add_argument("-b", "--block_size", type=int, default=10000,
+                        help="Number of sites decoded per block. Default is 10000.")
+    parser.add_argument("-k", "--kernel", choices=["auto", "numba", "numpy"],
+                        default="auto",
+                        help="Genotype decoding backend. Default 'auto' uses Numba when "
+                        "installed and NumPy otherwise.")
+    parser.add_argument("-o", "--output_file", required=True,
+                        help="Save ROH segments of all samples to this tab-separated "
+                        "file. [REQUIRED]")
+    parser.add_argument("-t", "--totals_file",
+                        help="Save number and total length of ROH segments per sample to "
+                        "this tab-separated file.")
+    return parser.parse_args()
+
+
+def main():
+    args = handle_program_options()
+
+    # Collect heterozygous calls for all samples
+    decode = get_decoder(args.kernel)
+    with gzip.open(args.vcf_file, "rb") as vcff:
+        genome_order = read_samples(vcff)
+        positions, het_samples, het_sites = collect_het_sites(vcff, len(genome_order),
+                                                              decode, args.block_size)
+
+    # Call runs of homozygosity
+    print("{}: Calling runs of homozygosity".format(strftime("%d %b %Y %H:%M:%S")))
+    roh = call_roh(positions, het_samples, het_sites, len(genome_order),
+                   int(args.min_length * 1000), args.min_snps, args.allowed_hets)
+    segments = pd.DataFrame({"sample": np.asarray(genome_order)[roh["sample"]],
+                             "start": positions[roh["start"]],
+                             "end": positions[roh["end"]],
+                             "n_snps": roh["end"] - roh["start"] + 1,
+                             "n_het": roh["n_het"]})
+    segments["length_kb"] = (segments["end"] - segments["start"] + 1) / 1000
+    segments.to_csv(args.output_file, sep="\t", index=False)
+
+    # Number and total length of ROH per sample
+    if args.totals_file:
+        totals = pd.DataFrame({"sample": genome_order,
+                               "n_roh": np.bincount(roh["sample"],
+                                                    minlength=len(genome_order)),
+                               "total_kb": np.bincount(roh["sample"],
+                                                       weights=segments["length_kb"],
+                                                       minlength=len(genome_order))})
+        if args.map_fp:
+            md_data = pd.read_csv(args.map_fp, sep="\t", index_col=False,
+                                  usecols=[0, 1, 2, 3])
+            totals = pd.merge(md_data, totals, on="sample")
+        totals.to_csv(args.totals_file, sep="\t", index=False)
+    print("Finished!\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+:Abstract: Write tabix (.tbi) indices for coordinate sorted, BGZF compressed VCF files,
+           from the BGZF virtual offsets of all records. The binning and linear index are
+           computed with NumPy over all records of a chromosome at once.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+import struct
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
+import bgzf
+
+TBI_VCF_FORMAT = 2
+META_BIN = 37450    # pseudo-bin holding offset range and record count per chromosome
+LINEAR_SHIFT = 14   # 16 kb linear index windows
+
+
+def reg2bin(beg, end):
+    """
+    Compute the smallest UCSC bin containing each 0-based, half-open interval.
+
+    :type beg: numpy.ndarray
+    :param beg: Interval start coordinates (0-based).
+
+    :type end: numpy.ndarray
+    :param end: Interval end coordinates (exclusive).
+    """
+    last = end - 1
+    bins = np.zeros(beg.shape, dtype=np.int64)
+    done = np.zeros(beg.shape, dtype=bool)
+    for shift, first_bin in ((14, 4681), (17, 585), (20, 73), (23, 9), (26, 1)):
+        same = ~done & ((beg >> shift) == (last >> shift))
+        bins[same] = first_bin + (beg[same] >> shift)
+        done |= same
+    return bins
+
+
+def _reference_index(beg, end, vstart, vend):
+    """Encode bins, chunks and linear index of all records of one chromosome."""
+    bins = reg2bin(beg, end)
+    order = np.argsort(bins, kind="stable")
+    bins, chunk_beg, chunk_end = bins[order], vstart[order], vend[order]
+
+    # Merge records of the same bin which are adjacent in the file into one chunk
+    new_chunk = np.ones(bins.size, dtype=bool)
+    new_chunk[1:] = (bins[1:] != bins[:-1]) | (chunk_beg[1:] != chunk_end[:-1])
+    first = np.flatnonzero(new_chunk)
+    last = np.append(first[1:], bins.size) - 1
+    bins, chunk_beg, chunk_end = bins[first], chunk_beg[first], chunk_end[last]
+    bin_ids, bin_first, n_chunks = np.unique(bins, return_index=True, return_counts=True)
+
+    out = [struct.pack("<i", bin_ids.size + 1)]
+    for bin_id, i, n in zip(bin_ids.tolist(), bin_first.tolist(), n_chunks.tolist()):
+        chunks = np.empty((n, 2), dtype="<u8")
+        chunks[:, 0] = chunk_beg[i:i + n]
+        chunks[:, 1] = chunk_end[i:i + n]
+        out.append(struct.pack("<Ii", bin_id, n) + chunks.tobytes())
+    out.append(struct.pack("<Ii4Q", META_BIN, 2, int(vstart.min()), int(vend.max()),
+                           vstart.size, 0))
+
+    # Linear index: smallest offset of records overlapping each 16 kb window
+    first_win = beg >> LINEAR_SHIFT
+    span = ((end - 1) >> LINEAR_SHIFT) - first_win + 1
+    records = np.repeat(np.arange(beg.size), span)
+    windows = first_win[records] + np.arange(records.size) - \
+        np.repeat(np.cumsum(span) - span, span)
+    unset = np.iinfo(np.uint64).max
+    ioff = np.full(windows.max() + 1, unset, dtype=np.uint64)
+    np.minimum.at(ioff, windows, vstart[records].astype(np.uint64))
+    set_windows = np.flatnonzero(ioff != unset)
+    fill = np.zeros(ioff.size, dtype=np.int64)
+    fill[set_windows] = set_windows
+    fill = np.maximum.accumulate(fill)
+    ioff = np.where(np.arange(ioff.size) < set_windows[0], int(vstart.min()), ioff[fill])
+    out.append(struct.pack("<i", ioff.size) + ioff.astype("<u8").tobytes())
+    return b"".join(out)
+
+
+def build_tabix_index(names, tids, beg, end, vstart, vend):
+    """
+    Build a tabix index of VCF records sorted by chromosome and position.
+
+    :type names: list
+    :param names: Chromosome names (bytes) in order of appearance.
+
+    :type tids: numpy.ndarray
+    :param tids: Index into names of each record, non-decreasing.
+
+    :type beg: numpy.ndarray
+    :param beg: 0-based start coordinate of each record (POS - 1).
+
+    :type end: numpy.ndarray
+    :param end: End coordinate of each record (POS - 1 + length of REF).
+
+    :type vstart: numpy.ndarray
+    :param vstart: BGZF virtual offset of the start of each record.
+
+    :type vend: numpy.ndarray
+    :param vend: BGZF virtual offset just after the end of each record.
+
+    :return: Uncompressed index data.
+    """
+    name_data = b"".join(name + b"\x00" for name in names)
+    out = [b"TBI\x01", struct.pack("<8i", len(names), TBI_VCF_FORMAT, 1, 2, 0, ord("#"),
+                                   0, len(name_data)), name_data]
+    bounds = np.searchsorted(tids, np.arange(len(names) + 1))
+    for tid in range(len(names)):
+        i, j = bounds[tid], bounds[tid + 1]
+        if i == j:
+            out.append(struct.pack("<ii", 0, 0))
+            continue
+        out.append(_reference_index(beg[i:j], end[i:j], vstart[i:j], vend[i:j]))
+    out.append(struct.pack("<Q", 0))    # no unplaced records
+    return b"".join(out)
+
+
+def write_tabix_index(index_file, index_data, threads=1):
+    """Write index data from build_tabix_index() as a BGZF compressed .tbi file."""
+    with open(index_file, "wb") as outf:
+        bgzf.write_blocks(outf, bgzf.split_blocks([index_data]), threads)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+:Abstract: Check that the NumPy and Numba genotype decoders of vcf_kernels.py agree on
+           crafted VCF records: missing, unphased, multiallelic and haploid entries,
+           CRLF line endings and records with too few or too many sample columns. Run
+           with pytest. The Numba cases are skipped when Numba is not installed.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import pytest
+np = pytest.importorskip("numpy")
+import vcf_kernels
+from vcf_kernels import (HOM_REF, HET, HOM_ALT, OTHER, HAP_REF, HAP_ALT,
+                         numpy_decode_genotypes, numba_decode_genotypes)
+
+# Genotype entry and expected code
+GENOTYPES = (("0|0", HOM_REF), ("0|1", HET), ("1|0", HET), ("1|1", HOM_ALT),
+             (".", OTHER), ("./.", OTHER), (".|.", OTHER), ("0/1", OTHER),
+             ("1/1", OTHER), ("1|2", OTHER), ("2|0", OTHER), ("0|1:35", OTHER),
+             ("0", HAP_REF), ("1", HAP_ALT), ("2", OTHER), ("", OTHER))
+ENDINGS = (b"\n", b"\r\n", b"")
+
+DECODERS = [numpy_decode_genotypes,
+            pytest.param(numba_decode_genotypes, marks=pytest.mark.skipif(
+                         vcf_kernels.njit is None, reason="numba is not installed"))]
+
+
+def vcf_record(genotypes, ending=b"\n"):
+    """Build a raw VCF data line with the given sample genotype entries."""
+    fields = ["21", "9411239", ".", "G", "A", "100", "PASS", "AC=1", "GT"]
+    return "\t".join(fields + list(genotypes)).encode() + ending
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+@pytest.mark.parametrize("ending", ENDINGS)
+def test_decode_genotypes(decode, ending):
+    genotypes = [gt for gt, _ in GENOTYPES]
+    codes = decode(vcf_record(genotypes, ending), len(genotypes))
+    assert codes.dtype == np.int8
+    assert codes.tolist() == [code for _, code in GENOTYPES]
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+@pytest.mark.parametrize("gt,code", GENOTYPES)
+def test_single_sample(decode, gt, code):
+    for ending in ENDINGS:
+        assert decode(vcf_record([gt], ending), 1).tolist() == [code]
+
+
+@pytest.mark.parametrize("decode", DECODERS)
+@pytest.mark.parametrize("n_samples", [2, 4])
+def test_wrong_number_of_samples(decode, n_samples):
+    for ending in ENDINGS:
+        with pytest.raises(ValueError):
+            decode(vcf_record(["0|1", "1|1", "0"], ending), n_samples)
+
+
+@pytest.mark.skipif(vcf_kernels.njit is None, reason="numba is not installed")
+def test_backends_agree():
+    rng = np.random.RandomState(0)
+    entries = [gt for gt, _ in GENOTYPES]
+    for _ in range(500):
+        picks = rng.randint(len(entries), size=rng.randint(1, 20))
+        genotypes = [entries[k] for k in picks]
+        line = vcf_record(genotypes, ENDINGS[rng.randint(len(ENDINGS))])
+        assert (numpy_decode_genotypes(line, len(genotypes)).tolist() ==
+                numba_decode_genotypes(line, len(genotypes)).tolist())
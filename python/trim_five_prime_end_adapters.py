@@ -13,15 +13,17 @@ Author: Akshay Paropkari
 import os
 import sys
 import argparse
-import subprocess as sp
 from csv import DictReader
+from multiprocessing import Pool, cpu_count
 try:
     import shlex
 except ImportError as ie:
     sys.exit("Please install {} module before executing this script."
              .format(ie))
+from job_scheduler import make_job, run_jobs, report_failures
+from fastq_utils import PLATE_REGIONS, demultiplex_pairs, well_combos
 
-
+# Plate, 16S region, forward and reverse primer of adapter columns in ws_map
 def create_cmd_to_run(threads, fwd_adapter, rev_adapter, primer, fwd_input_file,
                       rev_input_file, action="D"):
     """
@@ -60,6 +62,55 @@ def create_cmd_to_run(threads, fwd_adapter, rev_adapter, primer, fwd_input_file,
     return kwargs
 
 
+def demultiplex_well(job):
+    """
+    Demultiplex the R1/R2 read pairs of a well in one pass to the files of every sample
+    and region of the well, see fastq_utils.demultiplex_pairs().
+
+    :type job: tuple
+    :param job: Tuple of (well folder, R1 file, R2 file, list of (output prefix, forward
+                adapter, reverse adapter), minimum length, minimum quality, number of
+                mismatches tolerated per adapter)
+
+    :return: Tuple of (well folder, dict of read pair counts per output prefix and for
+             'unassigned', 'ambiguous' and 'filtered' read pairs)
+
+    :raises RuntimeError: If the R1/R2 files can not be read, after removing the output
+                          files of the well.
+    """
+    root, R1_file, R2_file, combos, min_length, min_qual, mismatches = job
+    output_files = [os.path.join(root, "{}-assigned-A01-pair{}.fastq".
+                                 format(prefix, pair))
+                    for prefix, _, _ in combos for pair in (1, 2)]
+    outputs = []
+    try:
+        for pair1, pair2 in zip(output_files[0::2], output_files[1::2]):
+            outputs.append((open(pair1, "wb", 1 << 20), open(pair2, "wb", 1 << 20)))
+        counts = demultiplex_pairs(os.path.join(root, R1_file),
+                                   os.path.join(root, R2_file), combos, outputs,
+                                   min_length, min_qual, mismatches)
+    except (IOError, OSError, ValueError) as err:
+        error = RuntimeError("Error reading {} and {}: {}".format(
+                             os.path.join(root, R1_file), os.path.join(root, R2_file),
+                             err))
+    else:
+        error = None
+    finally:
+        for out_files in outputs:
+            for out_file in out_files:
+                out_file.close()
+    if error is not None:
+        # Remove the partial outputs of the failed well
+        for output_file in output_files:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+        raise error
+    with open(os.path.join(root, "demultiplex_log.txt"), "w") as logf:
+        for name, count in counts.items():
+            logf.write("{}\t{}\n".format(name, count))
+    return root, counts
+
+
 def prog_options():
     parser = argparse.ArgumentParser(
                 description="Iterate through each folder in a file and trim 5'-end "
@@ -83,9 +134,26 @@ def prog_options():
     parser.add_argument("-t", "--threads", type=int, default=4,
                         help="Optionally, users may specify number of threads to be used "
                              "for trimming. Default is 4.")
+    parser.add_argument("-b", "--thread_budget", type=int, default=None,
+                        help="Maximum number of threads used by all Skewer runs at "
+                             "once, or number of wells demultiplexed at once by the "
+                             "python engine. Default is the number of CPUs.")
     parser.add_argument("-d", "--action", choices=["D", "T"], default="D",
                         help="Demultiplex (D) or Trim (T) sequences based on adapters. "
                              "Default action is demultiplexing sequencing.")
+    parser.add_argument("-e", "--engine", choices=["skewer", "python"], default="skewer",
+                        help="Demultiplex with one Skewer run per sample and region "
+                             "(skewer), or in a single pass over each well's R1/R2 files "
+                             "routing read pairs to all samples and regions at once "
+                             "(python). The python engine discards pairs with a read of "
+                             "mean quality < Q25 before trimming, trims adapters and 3'-"
+                             "ends to Q25 and discards pairs with a read < 200 nt after "
+                             "trimming, but does not filter degenerate reads (Skewer -n)."
+                             " Default is skewer.")
+    parser.add_argument("-mm", "--mismatches", type=int, default=1,
+                        help="Number of mismatches tolerated per adapter by the python "
+                             "engine. Read pairs matching more than one sample and region"
+                             " are discarded. Default is 1.")
     parser.add_argument("-dr", "--dry_run", action="store_true",
                         help="Provide a dry run of the commands which will be executed "
                              "without actually executing the commands.")
@@ -110,20 +178,27 @@ def main():
                  .format(ioe))
 
     # Read adapter sequences from file
-    with open(args.ap_map, "rU") as apf:
+    with open(args.ap_map) as apf:
         adapters = {line.strip().split("\t")[1]: line.strip().split("\t")[0]
                     for line in apf.readlines()[1:]}
 
     # Read mapping file data
-    with open(args.ws_map, "rU") as csvf:
+    with open(args.ws_map) as csvf:
         map_data = [line for line in DictReader(csvf, delimiter="\t")]
 
+    try:
+        assert args.engine == "skewer" or args.action == "D"
+    except AssertionError:
+        sys.exit("\nThe python engine only demultiplexes sequences (-d D).\n")
+
     # Iterate through all directories and access their files
+    jobs = []
+    well_jobs = []
     for root, dirs, files in os.walk(args.sample_dir):
         if root != args.sample_dir:
-            os.chdir(root)
             well = root
             print("\n{}".format(well))
+            combos = []
 
     # Read the raw FASTQ file
             for file in files:
@@ -133,104 +208,61 @@ def main():
                     elif file.endswith("R2_001.fastq.gz"):
                         R2_file = file
 
-    # Calculate skewer command for each sample
+    # Calculate skewer command for each sample, plate and 16S region
             for sample in map_data:
                 if sample["well"] == well.split("/")[-1].split("-")[0]:
-                    # Plate 1 - V1-V3
-                    try:
-                        if args.action == "T":
-                            R1_file = "{}_V1-V3-assigned-A01-pair1.fastq".\
-                                      format(sample["P1_sample"])
-                            R2_file = "{}_V1-V3-assigned-A01-pair2.fastq".\
-                                      format(sample["P1_sample"])
-                        command = create_cmd_to_run(args.threads, sample["27F_P1"],
-                                                    sample["519R_P1"],
-                                                    sample["P1_sample"]+"_V1-V3",
-                                                    R1_file, R2_file, args.action)
-                        assert "NA" not in command
-                    except:
-                        pass
-                    else:
-                        print("Well: {} | Primer: {} | SampleID: {}".format(
-                              sample["well"],
-                              adapters[sample["27F_P1"]],
-                              sample["P1_sample"]))
-                        print("{}\n".format(" ".join(command)))
-                        if not args.dry_run:
-                            out = sp.check_output(command)
-                            print("{}".format(out))
-
-                    # Plate 1 - V4-V5
-                    try:
-                        if args.action == "T":
-                            R1_file = "{}_V4-V5-assigned-A01-pair1.fastq".\
-                                      format(sample["P1_sample"])
-                            R2_file = "{}_V4-V5-assigned-A01-pair2.fastq".\
-                                      format(sample["P1_sample"])
-                        command = create_cmd_to_run(args.threads, sample["515F_P1"],
-                                                    sample["806R_P1"],
-                                                    sample["P1_sample"]+"_V4-V5",
-                                                    R1_file, R2_file, args.action)
-                        assert "NA" not in command
-                    except:
-                        pass
-                    else:
-                        print("Well: {} | Primer: {} | SampleID: {}".format(
-                              sample["well"],
-                              adapters[sample["515F_P1"]],
-                              sample["P1_sample"]))
-                        print("{}\n".format(" ".join(command)))
-                        if not args.dry_run:
-                            out = sp.check_output(command)
-                            print("{}".format(out))
-
-                    # Plate 2 - V1-V3
-                    try:
-                        if args.action == "T":
-                            R1_file = "{}_V1-V3-assigned-A01-pair1.fastq".\
-                                      format(sample["P2_sample"])
-                            R2_file = "{}_V1-V3-assigned-A01-pair2.fastq".\
-                                      format(sample["P2_sample"])
-                        command = create_cmd_to_run(args.threads, sample["27F_P2"],
-                                                    sample["519R_P2"],
-                                                    sample["P2_sample"]+"_V1-V3",
-                                                    R1_file, R2_file, args.action)
-                        assert "NA" not in command
-                    except:
-                        pass
-                    else:
-                        print("Well: {} | Primer: {} | SampleID: {}".format(
-                              sample["well"],
-                              adapters[sample["27F_P2"]],
-                              sample["P2_sample"]))
-                        print("{}\n".format(" ".join(command)))
-                        if not args.dry_run:
-                            out = sp.check_output(command)
-                            print("{}".format(out))
-
-                    # Plate 2 - V4-V5
-                    try:
-                        if args.action == "T":
-                            R1_file = "{}_V4-V5-assigned-A01-pair1.fastq".\
-                                      format(sample["P2_sample"])
-                            R2_file = "{}_V4-V5-assigned-A01-pair2.fastq".\
-                                      format(sample["P2_sample"])
-                        command = create_cmd_to_run(args.threads, sample["515F_P2"],
-                                                    sample["806R_P2"],
-                                                    sample["P2_sample"]+"_V4-V5",
-                                                    R1_file, R2_file, args.action)
-                        assert "NA" not in command
-                    except:
-                        pass
-                    else:
-                        print("Well: {} | Primer: {} | SampleID: {}".format(
-                              sample["well"],
-                              adapters[sample["515F_P2"]],
-                              sample["P2_sample"]))
-                        print("{}\n".format(" ".join(command)))
-                        if not args.dry_run:
-                            out = sp.check_output(command)
-                            print("{}".format(out))
+                    if args.engine == "python":
+                        for prefix, fwd_adapter, rev_adapter in well_combos(sample):
+                            print("Well: {} | Primer: {} | SampleID: {}".format(
+                                  sample["well"], adapters[fwd_adapter],
+                                  prefix.rsplit("_", 1)[0]))
+                            combos.append((prefix, fwd_adapter, rev_adapter))
+                        continue
+                    for plate, region, fwd, rev in PLATE_REGIONS:
+                        try:
+                            sample_id = sample["{}_sample".format(plate)]
+                            if args.action == "T":
+                                R1_file = "{}_{}-assigned-A01-pair1.fastq".\
+                                          format(sample_id, region)
+                                R2_file = "{}_{}-assigned-A01-pair2.fastq".\
+                                          format(sample_id, region)
+                            command = create_cmd_to_run(
+                                args.threads, sample["{}_{}".format(fwd, plate)],
+                                sample["{}_{}".format(rev, plate)],
+                                sample_id + "_" + region, R1_file, R2_file, args.action)
+                            assert "NA" not in command
+                        except:
+                            pass
+                        else:
+                            print("Well: {} | Primer: {} | SampleID: {}".format(
+                                  sample["well"],
+                                  adapters[sample["{}_{}".format(fwd, plate)]],
+                                  sample_id))
+                            print("{}\n".format(" ".join(command)))
+                            jobs.append(make_job(
+                                command, root,
+                                "{}_{}_skewer_log.txt".format(sample_id, region),
+                                inputs=(R1_file, R2_file), threads=args.threads))
+            if combos:
+                well_jobs.append((root, R1_file, R2_file, combos, 200, 25,
+                                  args.mismatches))
+    if args.engine == "skewer":
+        report_failures(run_jobs(jobs, args.thread_budget, args.dry_run))
+    elif args.dry_run:
+        for root, R1_file, R2_file, combos, _, _, _ in well_jobs:
+            print("{}: demultiplex {} and {} to {}\n".format(
+                  root, R1_file, R2_file, " ".join(prefix for prefix, _, _ in combos)))
+    else:
+        pool = Pool(args.thread_budget or cpu_count())
+        try:
+            for root, counts in pool.imap_unordered(demultiplex_well, well_jobs):
+                print("\n{}\n{}".format(root, "\n".join(
+                      "{}\t{}".format(name, count) for name, count in counts.items())))
+        except (RuntimeError, IOError, OSError, ValueError) as err:
+            sys.exit("\n{}".format(err))
+        finally:
+            pool.close()
+            pool.join()
     return
 
 
@@ -15,13 +15,19 @@ Author: Akshay Paropkari
 import os
 import sys
 import argparse
-import subprocess as sp
 from csv import DictReader
 try:
     import shlex
 except ImportError as ie:
     sys.exit("Please install {} module before executing this script."
              .format(ie))
+from job_scheduler import make_job, run_jobs, report_failures
+
+# Sample column, forward primer of input file, adapter column and reverse primer
+TRIM_FILES = (("P1_sample", "27F", "519R_A", "519R"),
+              ("P1_sample", "515F", "806R_C", "806R"),
+              ("P2_sample", "27F", "519R_B", "519R"),
+              ("P2_sample", "515F", "806R_D", "806R"))
 
 
 def prog_options():
@@ -47,6 +53,9 @@ def prog_options():
     parser.add_argument("-t", "--threads", type=int, default=4,
                         help="Optionally, you may specify number of threads to"
                              " be used for trimming. Default is 4.")
+    parser.add_argument("-b", "--thread_budget", type=int, default=None,
+                        help="Maximum number of threads used by all Skewer runs at "
+                             "once. Default is the number of CPUs.")
     return parser.parse_args()
 
 
@@ -67,91 +76,43 @@ def main():
         sys.exit("\nError with the well-to-sampleid mapping file: {}\n"
                  .format(ioe))
 
+# Read adapter sequences from file
+    with open(args.ap_map) as apf:
+        adapters = {line.strip().split("\t")[1]: line.strip().split("\t")[0]
+                    for line in apf.readlines()[1:]}
+
+# Read mapping file data
+    with open(args.ws_map) as csvf:
+        map_data = [line for line in DictReader(csvf, delimiter="\t")]
+
 # Iterate through all directories and access their files
+    jobs = []
     for root, dirs, files in os.walk(args.sample_dir):
         if root != args.sample_dir:
-            os.chdir(root)
             well = root
-            print "\n", well
-
-# Read adapter sequences from file
-            with open(args.ap_map, "rU") as apf:
-                adapters = {line.strip().split("\t")[1]: line.strip().split("\t")[0]
-                            for line in apf.readlines()[1:]}
-
-# Read mapping file data
-            with open(args.ws_map, "rU") as csvf:
-                map_data = [line
-                            for line in DictReader(csvf, delimiter="\t")]
+            print("\n{}".format(well))
 
 # Calculate skewer command for each sample
             for sample in map_data:
                 if sample["well"] == well.split("-")[0].split("/")[5]:
-                    fname1 = sample["P1_sample"]+"_27F-assigned-01.fastq"
-                    fname2 = sample["P1_sample"]+"_515F-assigned-01.fastq"
-                    if sample["P2_sample"] != "-":
-                        fname3 = sample["P2_sample"]+"_27F-assigned-01.fastq"
-                        fname4 = sample["P2_sample"]+"_515F-assigned-01.fastq"
-
-                    # Plate 1 trimming
-                    for file in files:
-                        if file == fname1:
-                            if sample["519R_A"] != "-":
-                                cmd1 = "skewer -t {} -b -m tail -l 200 -x {} \
-                                       -o {}_519R {}"\
-                                       .format(args.threads, sample["519R_A"],
-                                               file.split("_")[0], file)
-                                kwargs1 = shlex.split(cmd1)
-                                print "Well: {} | Primer: {} | SampleID: {}"\
-                                      .format(sample["well"],
-                                              adapters[sample["519R_A"]],
-                                              file.split("_")[0])
-                                print kwargs1, "\n"
-                                out1 = sp.check_output(kwargs1)
-                                print out1
-                        elif file == fname2:
-                            if sample["806R_C"] != "-":
-                                cmd2 = "skewer -t {} -b -m tail -l 200 -x {} \
-                                       -o {}_806R {}"\
-                                       .format(args.threads, sample["806R_C"],
-                                               file.split("_")[0], file)
-                                kwargs2 = shlex.split(cmd2)
-                                print "Well: {} | Primer: {} | SamplID: {}"\
-                                      .format(sample["well"],
-                                              adapters[sample["806R_C"]],
-                                              file.split("_")[0])
-                                print kwargs2, "\n"
-                                out2 = sp.check_output(kwargs2)
-                                print out2
-
-                        elif file == fname3:
-                            if sample["519R_B"] != "-":
-                                cmd3 = "skewer -t {} -b -m tail -l 200 -x {} \
-                                       -o {}_519R {}"\
-                                       .format(args.threads, sample["519R_B"],
-                                               file.split("_")[0], file)
-                                kwargs3 = shlex.split(cmd3)
-                                print "Well: {} | Primer: {} | SampleID: {}"\
-                                      .format(sample["well"],
-                                              adapters[sample["519R_B"]],
-                                              file.split("_")[0])
-                                print kwargs3, "\n"
-                                out3 = sp.check_output(kwargs3)
-                                print out3
-                        elif file == fname4:
-                            if sample["806R_D"] != "-":
-                                cmd4 = "skewer -t {} -b -m tail -l 200 -x {} \
-                                       -o {}_806R {}"\
-                                       .format(args.threads, sample["806R_D"],
-                                               file.split("_")[0], file)
-                                kwargs4 = shlex.split(cmd4)
-                                print "Well: {} | Primer: {} | SampleID: {}"\
-                                      .format(sample["well"],
-                                              adapters[sample["806R_D"]],
-                                              file.split("_")[0])
-                                print kwargs4, "\n"
-                                out4 = sp.check_output(kwargs4)
-                                print out4
+                    for sample_col, fwd, adapter_col, rev in TRIM_FILES:
+                        if sample[sample_col] == "-" or sample[adapter_col] == "-":
+                            continue
+                        file = "{}_{}-assigned-01.fastq".format(sample[sample_col], fwd)
+                        if file not in files:
+                            continue
+                        cmd = "skewer -t {} -b -m tail -l 200 -x {} -o {}_{} {}"\
+                              .format(args.threads, sample[adapter_col],
+                                      file.split("_")[0], rev, file)
+                        kwargs = shlex.split(cmd)
+                        print("Well: {} | Primer: {} | SampleID: {}"
+                              .format(sample["well"], adapters[sample[adapter_col]],
+                                      file.split("_")[0]))
+                        print(kwargs, "\n")
+                        jobs.append(make_job(kwargs, root, "{}_{}_skewer_log.txt".
+                                             format(file.split("_")[0], rev),
+                                             inputs=(file,), threads=args.threads))
+    report_failures(run_jobs(jobs, args.thread_budget))
     return
 
 if __name__ == "__main__":
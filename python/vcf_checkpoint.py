@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+:Abstract: Checkpointed, resumable scans over 1000 Genomes Project VCF files. Counter
+           arrays are saved periodically together with the position of the next unread
+           line, so that a pre-empted job can continue where it stopped. The position is
+           a BGZF virtual offset for bgzipped files and a line number for plain gzip
+           files. Checkpoints are written to a temporary file and atomically renamed.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import os
+import sys
+import gzip
+from time import strftime
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
+import bgzf
+
+
+def _vcf_id(vcf_file):
+    """Identify a VCF file by its name and size, to refuse resuming on a different file."""
+    return "{}:{}".format(os.path.basename(vcf_file), os.path.getsize(vcf_file))
+
+
+def save_checkpoint(checkpoint_file, vcf_file, offset, linenum, counters, settings=""):
+    """
+    Atomically save counters and the position of the next unread line of a VCF file.
+
+    :type offset: int
+    :param offset: BGZF virtual offset of the next unread line, or -1 for plain gzip.
+
+    :type linenum: int
+    :param linenum: Line number (0-based, including header lines) of the next unread line.
+
+    :type counters: dict
+    :param counters: Counter arrays to save, keyed by name.
+
+    :type settings: str
+    :param settings: Description of program options which affect the counters.
+    """
+    tmp_file = checkpoint_file + ".tmp"
+    with open(tmp_file, "wb") as outf:
+        np.savez(outf, _vcf_id=_vcf_id(vcf_file), _settings=settings, _offset=offset,
+                 _linenum=linenum, **counters)
+        outf.flush()
+        os.fsync(outf.fileno())
+    os.replace(tmp_file, checkpoint_file)
+
+
+def load_checkpoint(checkpoint_file, vcf_file, settings=""):
+    """
+    Load a checkpoint saved by save_checkpoint() for the same VCF file and settings.
+
+    :return: Tuple of (offset, linenum, dict of counter arrays)
+    """
+    with np.load(checkpoint_file) as data:
+        try:
+            assert str(data["_vcf_id"]) == _vcf_id(vcf_file)
+            assert str(data["_settings"]) == settings
+        except AssertionError:
+            sys.exit("Checkpoint {} was not created for {} with the same options.".
+                     format(checkpoint_file, vcf_file))
+        counters = {key: data[key] for key in data.files if not key.startswith("_")}
+        return int(data["_offset"]), int(data["_linenum"]), counters
+
+
+def iter_checkpointed_lines(vcf_file, counters, checkpoint_file=None, every=100000,
+                            resume=False, settings=""):
+    """
+    Yield data lines of a VCF file, saving a checkpoint of the counters every few lines.
+    Counters are created by the caller and must be read and updated through the counters
+    dict, since checkpointed values are loaded into it when the first line is read.
+
+    :type counters: dict
+    :param counters: Counter arrays, keyed by name. Replaced by the checkpointed values
+                     when resuming.
+
+    :type checkpoint_file: str
+    :param checkpoint_file: Save checkpoints to this file. No checkpoints are saved if
+                            None.
+
+    :type every: int
+    :param every: Number of lines read between checkpoints.
+
+    :type resume: bool
+    :param resume: Continue from checkpoint_file if it exists.
+
+    :type settings: str
+    :param settings: Description of program options which affect the counters, checked
+                     when resuming.
+
+    :return: Yields tuples of (line number, line) for all lines after the #CHROM line.
+    """
+    offset = linenum = None
+    if resume and checkpoint_file and os.path.exists(checkpoint_file):
+        offset, linenum, saved = load_checkpoint(checkpoint_file, vcf_file, settings)
+        counters.update(saved)
+        print("{}: Resuming from line {} of {}".format(strftime("%d %b %Y %H:%M:%S"),
+                                                       linenum, vcf_file))
+
+    def checkpoint(next_offset, next_linenum):
+        if checkpoint_file:
+            save_checkpoint(checkpoint_file, vcf_file, next_offset, next_linenum,
+                            counters, settings)
+
+    if bgzf.is_bgzf(vcf_file):
+        with open(vcf_file, "rb") as fh:
+            if offset is None:
+                lines = bgzf.iter_lines(fh)
+                linenum = 0
+                for line_offset, line in lines:
+                    linenum += 1
+                    if line.startswith(b"#CHROM"):
+                        break
+                else:
+                    sys.exit("No #CHROM header line found in VCF file.")
+            else:
+                lines = bgzf.iter_lines(fh, offset)
+            for i, (line_offset, line) in enumerate(lines):
+                if i % every == 0:
+                    checkpoint(line_offset, linenum)
+                yield linenum, line
+                linenum += 1
+            checkpoint(os.path.getsize(vcf_file) << 16, linenum)    # end of file
+    else:
+        with gzip.open(vcf_file, "rb") as vcff:
+            start = linenum
+            linenum = 0
+            for line in vcff:
+                linenum += 1
+                if line.startswith(b"#CHROM"):
+                    break
+            else:
+                sys.exit("No #CHROM header line found in VCF file.")
+            if start is not None:
+                for _ in range(start - linenum):
+                    next(vcff)
+                linenum = start
+            for i, line in enumerate(vcff):
+                if i % every == 0:
+                    checkpoint(-1, linenum)
+                yield linenum, line
+                linenum += 1
+            checkpoint(-1, linenum)
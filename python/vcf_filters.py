@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+:Abstract: Site and sample filters shared by scripts analyzing 1000 Genomes Project VCF
+           files: ChrX pseudo-autosomal regions (PAR), admixed populations left out of
+           PCA and selection of genomes by population and gender from the metadata file.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
+try:
+    import pandas as pd
+except ImportError:
+    sys.exit("Please install pandas")
+
+# ChrX pseudo-autosomal regions PAR1 and PAR2 (GRCh37), where males are diploid
+CHRX_PAR = ((60001, 2699520), (154931044, 155260560))
+
+# Admixed populations, discarded when running PCA on reference populations
+ADMIXED_POPULATIONS = ("GIH", "CEU", "PEL", "MXL", "CLM", "PUR", "ASW", "ACB")
+
+
+def in_par(positions):
+    """Return a boolean array marking ChrX coordinates that lie in PAR1 or PAR2."""
+    positions = np.asarray(positions)
+    par = np.zeros(positions.shape, dtype=bool)
+    for start, end in CHRX_PAR:
+        par |= (positions >= start) & (positions <= end)
+    return par
+
+
+def read_metadata(map_fp):
+    """
+    Read the metadata mapping file of 1000 Genomes Project genomes.
+
+    :return: pandas.DataFrame with sample, pop, super_pop and gender columns.
+    """
+    return pd.read_csv(map_fp, sep="\t", index_col=False, usecols=[0, 1, 2, 3])
+
+
+def select_samples(genome_order, md_data, populations=None, exclude_populations=None,
+                   gender=None):
+    """
+    Select genomes by population and gender.
+
+    :type genome_order: list
+    :param genome_order: Sample IDs in VCF column order.
+
+    :type md_data: pandas.DataFrame
+    :param md_data: Metadata as returned by read_metadata().
+
+    :type populations: list
+    :param populations: Keep only genomes of these populations.
+
+    :type exclude_populations: list
+    :param exclude_populations: Discard genomes of these populations.
+
+    :type gender: str
+    :param gender: Keep only genomes of this gender ('male' or 'female').
+
+    :return: Sorted list of column indices (0-based, among samples) of selected genomes.
+    """
+    md_data = md_data.set_index("sample")
+    keep = pd.Series(True, index=md_data.index)
+    if populations:
+        keep &= md_data["pop"].isin(populations)
+    if exclude_populations:
+        keep &= ~md_data["pop"].isin(exclude_populations)
+    if gender:
+        keep &= md_data["gender"] == gender
+    selected = set(keep.index[keep])
+    return [i for i, genome in enumerate(genome_order) if genome in selected]
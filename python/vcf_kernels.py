@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+"""
+:Abstract: Genotype decoding kernels for 1000 Genomes Project VCF files. Each VCF record
+           is scanned as a raw byte buffer and every sample's genotype is decoded into a
+           small integer code. Numba-compiled scanners are used when Numba is installed,
+           otherwise a pure NumPy implementation is used. Integer columns of many lines
+           are parsed from raw bytes at once. Run this file as a script to check that
+           both backends agree on a VCF file.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+import gzip
+import argparse
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
+try:
+    from numba import njit
+except ImportError:
+    njit = None    # numba is optional, NumPy kernels are used instead
+
+
+# Genotype codes returned by the decoders
+HOM_REF = 0     # 0|0
+HET = 1         # 0|1 or 1|0
+HOM_ALT = 2     # 1|1
+OTHER = 3       # missing (.), multiallelic (0|2, ...) or any other entry
+HAP_REF = 4     # 0 (haploid, e.g. male ChrX)
+HAP_ALT = 5     # 1 (haploid, e.g. male ChrX)
+
+BACKENDS = ("numba", "numpy") if njit is not None else ("numpy",)
+
+_TAB = 9
+_PIPE = 124
+_ZERO = 48
+
+
+def parse_digits(buf, starts, ends):
+    """Parse ASCII decimal integers buf[starts[i]:ends[i]] for all i at once."""
+    values = np.zeros(starts.size, dtype=np.int64)
+    width = ends - starts
+    for k in range(int(width.max()) if width.size else 0):
+        digit = k < width
+        values[digit] = values[digit] * 10 + \
+            (buf[starts[digit] + k].astype(np.int64) - 48)
+    return values
+
+
+def _line_end(line):
+    """Return the length of a VCF record without its trailing newline characters."""
+    end = len(line)
+    while end > 0 and line[end - 1] in (10, 13):
+        end -= 1
+    return end
+
+
+def numpy_decode_genotypes(line, n_samples):
+    """
+    Decode all genotype entries of a single VCF record with vectorized NumPy operations.
+
+    :type line: bytes
+    :param line: One raw (undecoded) VCF data line.
+
+    :type n_samples: int
+    :param n_samples: Number of sample columns listed in the #CHROM header line.
+
+    :return: numpy.int8 array of genotype codes, one per sample.
+    """
+    end = _line_end(line)
+    buf = np.frombuffer(line[:end] + b"\x00\x00\x00", dtype=np.uint8)
+    tabs = np.flatnonzero(buf[:end] == _TAB)
+    try:
+        assert tabs.size - 8 == n_samples
+    except AssertionError:
+        raise ValueError("VCF record has {} sample columns, expected {}".
+                         format(tabs.size - 8, n_samples))
+    starts = tabs[8:] + 1
+    width = np.append(tabs[9:], end) - starts
+    first = buf[starts] - _ZERO    # uint8, so '.' and other bytes wrap to values > 1
+    last = buf[starts + 2] - _ZERO
+    codes = np.full(n_samples, OTHER, dtype=np.int8)
+    diploid = (width == 3) & (buf[starts + 1] == _PIPE) & (first <= 1) & (last <= 1)
+    codes[diploid] = first[diploid] + last[diploid]
+    haploid = (width == 1) & (first <= 1)
+    codes[haploid] = HAP_REF + first[haploid]
+    return codes
+
+
+def decode_haplotype_alleles(line, n_samples):
+    """
+    Decode the allele carried by each haplotype of all samples of a single VCF record.
+    Only phased, biallelic entries (0|1, 1|1, ...) and haploid entries (0, 1) are
+    decoded, as in numpy_decode_genotypes().
+
+    :return: numpy.int8 array of shape (n_samples, 2) with alleles 0 (REF) or 1 (ALT) of
+             haplotypes A and B, and -1 for missing, unphased or other entries. Haploid
+             entries are stored in haplotype A.
+    """
+    end = _line_end(line)
+    buf = np.frombuffer(line[:end] + b"\x00\x00\x00", dtype=np.uint8)
+    tabs = np.flatnonzero(buf[:end] == _TAB)
+    try:
+        assert tabs.size - 8 == n_samples
+    except AssertionError:
+        raise ValueError("VCF record has {} sample columns, expected {}".
+                         format(tabs.size - 8, n_samples))
+    starts = tabs[8:] + 1
+    width = np.append(tabs[9:], end) - starts
+    first = buf[starts] - _ZERO
+    last = buf[starts + 2] - _ZERO
+    alleles = np.full((n_samples, 2), -1, dtype=np.int8)
+    diploid = (width == 3) & (buf[starts + 1] == _PIPE) & (first <= 1) & (last <= 1)
+    alleles[diploid, 0] = first[diploid]
+    alleles[diploid, 1] = last[diploid]
+    haploid = (width == 1) & (first <= 1)
+    alleles[haploid, 0] = first[haploid]
+    return alleles
+
+
+def _scan_genotypes(buf, end, out):
+    """Byte scanner compiled by Numba. Returns the number of sample columns decoded."""
+    n = out.shape[0]
+    i = 0
+    tabs = 0
+    while i < end and tabs < 9:
+        if buf[i] == 9:
+            tabs += 1
+        i += 1
+    k = 0
+    while k < n and i <= end:
+        s = i
+        while i < end and buf[i] != 9:
+            i += 1
+        width = i - s
+        code = 3
+        if width == 3:
+            a = buf[s] - 48
+            c = buf[s + 2] - 48
+            if buf[s + 1] == 124 and 0 <= a <= 1 and 0 <= c <= 1:
+                code = a + c
+        elif width == 1:
+            a = buf[s] - 48
+            if 0 <= a <= 1:
+                code = 4 + a
+        out[k] = code
+        k += 1
+        i += 1
+    if i <= end:    # more sample columns than expected
+        k += 1
+    return k
+
+
+if njit is not None:
+    _scan_genotypes = njit(cache=True, nogil=True)(_scan_genotypes)
+
+
+def numba_decode_genotypes(line, n_samples):
+    """
+    Decode all genotype entries of a single VCF record with the Numba-compiled scanner.
+    Parameters and return value are identical to numpy_decode_genotypes().
+    """
+    buf = np.frombuffer(line, dtype=np.uint8)
+    codes = np.empty(n_samples, dtype=np.int8)
+    decoded = _scan_genotypes(buf, _line_end(line), codes)
+    try:
+        assert decoded == n_samples
+    except AssertionError:
+        raise ValueError("VCF record has {} sample columns, expected {}".
+                         format(decoded, n_samples))
+    return codes
+
+
+def get_decoder(backend="auto"):
+    """
+    Return the genotype decoding function for the requested backend.
+
+    :type backend: str
+    :param backend: One of 'auto', 'numba' or 'numpy'. 'auto' picks Numba if installed.
+    """
+    if backend == "auto":
+        backend = BACKENDS[0]
+    try:
+        assert backend in BACKENDS
+    except AssertionError:
+        sys.exit("Genotype kernel backend '{}' is not available. Available backends: {}".
+                 format(backend, ", ".join(BACKENDS)))
+    return {"numba": numba_decode_genotypes, "numpy": numpy_decode_genotypes}[backend]
+
+
+def read_samples(vcff):
+    """
+    Read the meta-information lines of an open VCF file handle up to and including the
+    #CHROM header line, and return the list of sample IDs in column order.
+    """
+    for line in vcff:
+        if line.startswith(b"#CHROM"):
+            return line.decode().strip().split("\t")[9:]
+    sys.exit("No #CHROM header line found in VCF file.")
+
+
+def is_biallelic_snp(ref, alt):
+    """Check REF and ALT columns (bytes) for a single-nucleotide biallelic site."""
+    return ref in (b"A", b"T", b"C", b"G") and alt in (b"A", b"T", b"C", b"G")
+
+
+def iter_genotype_blocks(vcff, n_samples, decode, block_size=10000):
+    """
+    Decode biallelic SNP records of an open VCF file handle in blocks of sites. The file
+    handle must be positioned after the #CHROM header line (see read_samples()).
+
+    :type block_size: int
+    :param block_size: Maximum number of sites (rows) per block.
+
+    :return: Yields tuples of (positions, codes), where positions is an int64 array of
+             site coordinates and codes is an int8 array of shape (sites, n_samples).
+    """
+    positions = np.empty(block_size, dtype=np.int64)
+    codes = np.empty((block_size, n_samples), dtype=np.int8)
+    filled = 0
+    for line in vcff:
+        fields = line.split(b"\t", 5)
+        if not is_biallelic_snp(fields[3], fields[4]):
+            continue
+        positions[filled] = int(fields[1])
+        codes[filled] = decode(line, n_samples)
+        filled += 1
+        if filled == block_size:
+            yield positions.copy(), codes.copy()
+            filled = 0
+    if filled:
+        yield positions[:filled].copy(), codes[:filled].copy()
+
+
+def iter_allele_blocks(vcff, n_samples, block_size=10000):
+    """
+    Decode haplotype alleles of biallelic SNP records of an open VCF file handle in
+    blocks of sites, like iter_genotype_blocks().
+
+    :return: Yields tuples of (positions, alleles), where alleles is an int8 array of
+             shape (sites, n_samples, 2) as returned by decode_haplotype_alleles().
+    """
+    positions = np.empty(block_size, dtype=np.int64)
+    alleles = np.empty((block_size, n_samples, 2), dtype=np.int8)
+    filled = 0
+    for line in vcff:
+        fields = line.split(b"\t", 5)
+        if not is_biallelic_snp(fields[3], fields[4]):
+            continue
+        positions[filled] = int(fields[1])
+        alleles[filled] = decode_haplotype_alleles(line, n_samples)
+        filled += 1
+        if filled == block_size:
+            yield positions.copy(), alleles.copy()
+            filled = 0
+    if filled:
+        yield positions[:filled].copy(), alleles[:filled].copy()
+
+
+def check_backends(vcf_file, max_records=None):
+    """
+    Decode every record of a VCF file with all available backends and compare the
+    genotype codes. Returns a tuple of (records compared, records that differ).
+    """
+    decoders = [get_decoder(backend) for backend in BACKENDS]
+    compared = mismatched = 0
+    with gzip.open(vcf_file, "rb") as vcff:
+        for line in vcff:
+            if line.startswith(b"##"):
+                continue
+            if line.startswith(b"#CHROM"):
+                n_samples = len(line.rstrip(b"\r\n").split(b"\t")) - 9
+                continue
+            results = [decode(line, n_samples) for decode in decoders]
+            if any(not np.array_equal(results[0], res) for res in results[1:]):
+                mismatched += 1
+            compared += 1
+            if max_records is not None and compared >= max_records:
+                break
+    return compared, mismatched
+
+
+def handle_program_options():
+    parser = argparse.ArgumentParser(description="Check that all available genotype "
+                                     "decoding backends produce identical results on a "
+                                     "VCF file.")
+    parser.add_argument("vcf_file", help="Path to input gzipped VCF file.")
+    parser.add_argument("-n", "--max_records", type=int, default=None,
+                        help="Number of VCF records to compare. Default is all records.")
+    return parser.parse_args()
+
+
+def main():
+    args = handle_program_options()
+    print("Available backends: {}".format(", ".join(BACKENDS)))
+    compared, mismatched = check_backends(args.vcf_file, args.max_records)
+    print("Compared {} records, {} differ between backends.".format(compared, mismatched))
+    if mismatched:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+:Abstract: Approximate (preview) statistics for 1000 Genomes Project VCF files. A uniform
+           random subset of BGZF blocks is decompressed and decoded, so runtime is
+           proportional to the sampled fraction. Per-sample counts are scaled up to the
+           whole file and reported with standard errors. Plain gzip files fall back to
+           sampling individual sites, which still requires decompressing the whole file.
+:Date: 10/19/2026
+:Author: Akshay Paropkari
+"""
+
+import sys
+import gzip
+import random
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("Please install numpy")
+import bgzf
+
+
+def _line_starts_block(fh, offsets, k):
+    """Check if block k starts with a new line, i.e. block k - 1 ends with a newline."""
+    return k == 0 or bgzf.read_block(fh, offsets[k - 1]).endswith(b"\n")
+
+
+def iter_sampled_lines(vcf_file, fraction, seed=None, design=None):
+    """
+    Yield all header lines of a VCF file, followed by the data lines of a uniform random
+    sample of sampling units. For BGZF files a unit is a BGZF block and a line belongs to
+    the block its first byte is in. For plain gzip files a unit is a single line.
+
+    :type fraction: float
+    :param fraction: Fraction (0-1] of sampling units to read.
+
+    :type seed: int
+    :param seed: Random seed for reproducible sampling.
+
+    :type design: dict
+    :param design: Optional dict which is filled with the total number of units ('units')
+                   and the number of sampled units ('sampled') once all lines are read.
+
+    :return: Yields tuples of (unit index, line). Unit index is None for header lines.
+    """
+    try:
+        assert 0 < fraction <= 1
+    except AssertionError:
+        sys.exit("Sample fraction must be in the range (0, 1].")
+    rng = random.Random(seed)
+    design = design if design is not None else {}
+    if not bgzf.is_bgzf(vcf_file):
+        print("{} is not BGZF compressed, sampling individual sites.".format(vcf_file))
+        units = sampled = 0
+        with gzip.open(vcf_file, "rb") as vcff:
+            for line in vcff:
+                if line.startswith(b"#"):
+                    yield None, line
+                    continue
+                if rng.random() < fraction:
+                    yield units, line
+                    sampled += 1
+                units += 1
+        design.update(units=units, sampled=sampled)
+        return
+
+    with open(vcf_file, "rb") as fh:
+        offsets = bgzf.block_offsets(fh)
+        # Header lines are read in order, sampling starts at the block the header ends in
+        for voffset, line in bgzf.iter_lines(fh):
+            if not line.startswith(b"#"):
+                break
+            yield None, line
+        else:    # no data lines
+            design.update(units=0, sampled=0)
+            return
+        first_block = offsets.index(voffset >> 16)
+        n_units = len(offsets) - first_block
+        chosen = sorted(rng.sample(range(first_block, len(offsets)),
+                                   max(1, int(round(fraction * n_units)))))
+        for k in chosen:
+            start = 0
+            if not _line_starts_block(fh, offsets, k):
+                start = bgzf.read_block(fh, offsets[k]).find(b"\n") + 1
+                if start == 0:    # no line starts in this block
+                    continue
+            for voffset, line in bgzf.iter_lines(fh, (offsets[k] << 16) | start):
+                if voffset >> 16 != offsets[k]:
+                    break
+                if not line.startswith(b"#"):
+                    yield k, line
+        design.update(units=n_units, sampled=len(chosen))
+
+
+def scale_sampled_counts(totals, sum_squares, n_sampled, n_units):
+    """
+    Scale per-sample counts from sampled units up to the whole file, assuming simple
+    random sampling of units without replacement.
+
+    :type totals: numpy.ndarray
+    :param totals: Per-sample counts summed over sampled units.
+
+    :type sum_squares: numpy.ndarray
+    :param sum_squares: Per-sample sum of squared per-unit counts.
+
+    :return: Tuple of (estimated totals, standard errors)
+    """
+    estimate = totals * (float(n_units) / n_sampled)
+    if n_sampled < 2:
+        return estimate, np.full(totals.shape, np.nan)
+    variance = (sum_squares - totals ** 2 / float(n_sampled)) / (n_sampled - 1)
+    std_err = n_units * np.sqrt(np.maximum(variance, 0) *
+                                (1 - float(n_sampled) / n_units) / n_sampled)
+    return estimate, std_err
+
+
+def count_sampled(vcf_file, fraction, count_line, seed=None):
+    """
+    Estimate per-sample counts over a VCF file from a random sample of sites.
+
+    :type count_line: function
+    :param count_line: Called as count_line(line, linenum, n_samples) for every sampled
+                       data line. Must return an array of per-sample counts (or booleans)
+                       or None if the line is skipped.
+
+    :return: Tuple of (sample IDs, estimated counts, standard errors)
+    """
+    design = {}
+    genome_order = None
+    current_unit = None
+    for i, (unit, line) in enumerate(iter_sampled_lines(vcf_file, fraction, seed,
+                                                        design)):
+        if unit is None:
+            if line.startswith(b"#CHROM"):
+                genome_order = line.decode().strip().split("\t")[9:]
+                totals = np.zeros(len(genome_order))
+                sum_squares = np.zeros(len(genome_order))
+                unit_counts = np.zeros(len(genome_order))
+            continue
+        if unit != current_unit:
+            sum_squares += unit_counts ** 2
+            unit_counts[:] = 0
+            current_unit = unit
+        res = count_line(line, i, len(genome_order))
+        if res is not None:
+            totals += res
+            unit_counts += res
+    try:
+        assert genome_order is not None
+    except AssertionError:
+        sys.exit("No #CHROM header line found in VCF file.")
+    try:
+        assert design["sampled"] > 0
+    except AssertionError:
+        sys.exit("No sites were sampled, please increase the sample fraction.")
+    sum_squares += unit_counts ** 2
+    print("Sampled {} of {} units ({:.2%}).".format(design["sampled"], design["units"],
+                                                    design["sampled"] /
+                                                    float(design["units"])))
+    estimate, std_err = scale_sampled_counts(totals, sum_squares, design["sampled"],
+                                             design["units"])
+    return genome_order, estimate, std_err